@@ -0,0 +1,21 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# Synthetic AXBT/AXCTD/AXCP signals (synthetic.py) and DAS signal processing benchmarks (bench_DAS.py)
+# Run from the AXBPS directory, e.g. python -m benchmarks.bench_DAS --help
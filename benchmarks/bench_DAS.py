@@ -0,0 +1,482 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# Benchmarks for the DAS signal processing stages on synthetic AXBT/AXCTD/AXCP signals (see synthetic.py).
+# Each stage reports throughput as a multiple of realtime (seconds of audio processed per second),
+# peak memory allocated while it runs (tracemalloc), and an accuracy check against the known signal
+# contents so optimizations that change results are caught along with slowdowns.
+#
+# Examples (from the AXBPS directory):
+#   python -m benchmarks.bench_DAS                              #run all stages
+#   python -m benchmarks.bench_DAS --stages AXCTD --repeat 5    #AXCTD stages only
+#   python -m benchmarks.bench_DAS --save baseline.json         #save results as a baseline
+#   python -m benchmarks.bench_DAS --compare baseline.json      #exit 1 if any stage is slower/larger than the baseline (beyond tolerance) or inaccurate
+#
+# Baselines are machine specific- save and compare them on the same computer.
+
+
+import argparse
+import json
+import os
+import tempfile
+import shutil
+import tracemalloc
+import platform
+import datetime as dt
+import time as timemodule
+from sys import exit
+
+import numpy as np
+from scipy import signal
+
+import lib.DAS.DAS_outputs as das_out
+import lib.DAS.DAS_headless as headless
+import lib.DAS.demodulate as demodulate
+import lib.DAS.parseAXCTD as parse
+from lib.DAS.DAS_AXBT import AXBTEngine
+from lib.DAS.DAS_AXCTD import AXCTDEngine
+from lib.DAS.DAS_AXCP import AXCPEngine
+
+from benchmarks import synthetic
+
+
+#signal lengths (seconds) for full and quick runs- AXCTD is the profile length (the pulses/headers add ~33 sec)
+durations = {"full":{"AXBT":60, "AXCTD":60, "AXCP":60}, "quick":{"AXBT":20, "AXCTD":15, "AXCP":30}}
+
+
+
+
+# =============================================================================
+#   SYNTHETIC INPUTS
+# =============================================================================
+
+#generates each probe's synthetic signal and writes it to a WAV file in wavdir
+def make_inputs(wavdir, mode="full", seed=0):
+
+    inputs = {}
+    for (probetype, generator) in zip(["AXBT","AXCTD","AXCP"], [synthetic.axbt_signal, synthetic.axctd_signal, synthetic.axcp_signal]):
+        if probetype == "AXCTD":
+            pcm, truth = generator(profile_duration=durations[mode][probetype], seed=seed)
+        else:
+            pcm, truth = generator(duration=durations[mode][probetype], seed=seed)
+
+        wavfile = os.path.join(wavdir, f"{probetype}_synthetic.WAV")
+        synthetic.write_wav(wavfile, pcm, truth["fs"])
+        inputs[probetype] = {"wavfile":wavfile, "truth":truth}
+
+    return inputs
+
+
+
+#processor engine for a synthetic WAV file (the run loop isn't started- stages call engine methods directly)
+def make_engine(probetype, inputs, tempdir):
+
+    datasource = f"AA00000{inputs[probetype]['wavfile']}"
+    settings = das_out.get_processor_settings(das_out.default_processor_settings(), probetype)
+    starttime = dt.datetime.utcnow()
+
+    if probetype == "AXBT":
+        processor = AXBTEngine({}, datasource, 0, 0, starttime, False, -1, settings, tempdir)
+    elif probetype == "AXCTD":
+        processor = AXCTDEngine({}, datasource, 0, 0, starttime, 0, -1, -1, settings, tempdir)
+    else:
+        processor = AXCPEngine({}, datasource, 0, 0, starttime, lat=25, lon=-85, dropdate=starttime.date(), settings=settings, tempdir=tempdir)
+
+    processor.sigdata.close() #sigdata output isn't used
+    processor.audiostream = np.asarray(processor.audiostream, dtype=float)
+
+    return processor
+
+
+
+
+
+# =============================================================================
+#   STAGES
+# =============================================================================
+# Each stage function takes (inputs, tempdir) and does any setup (not timed), returning (audio_seconds, run, check):
+#   run() processes audio_seconds of audio with the stage being benchmarked and returns its output
+#   check(output) returns (accuracy, passed, description) comparing the output with the synthetic signal's truth
+
+#outputs of earlier stages reused as inputs to later stages (e.g. demodulated bits for parsing)
+_cache = {}
+
+
+
+#AXBT: FFT peak frequency (AXBTEngine.dofft) every 0.1 sec, as in the AXBT processor loop
+def stage_axbt_dofft(inputs, tempdir):
+
+    processor = make_engine("AXBT", inputs, tempdir)
+    truth = inputs["AXBT"]["truth"]
+    audiostream = processor.audiostream
+    f_s = processor.f_s
+
+    sampletimes = np.arange(0.1, len(audiostream)/f_s - 0.1, 0.1)
+    halfwindow = int(np.round(f_s*processor.settings["fftwindow"]/2))
+
+    def run():
+        fp = []
+        for ctime in sampletimes:
+            ctrind = int(np.round(ctime*f_s))
+            pmind = int(np.min([halfwindow, ctrind, len(audiostream)-ctrind-1]))
+            fp.append(processor.dofft(audiostream[ctrind-pmind:ctrind+pmind])[0])
+        return np.asarray(fp)
+
+    def check(fp):
+        good = sampletimes - processor.settings["fftwindow"]/2 > truth["tstart"]
+        error = np.max(np.abs(fp[good] - np.interp(sampletimes[good], truth["time"], truth["frequency"])))
+        return error, error <= 2/processor.settings["fftwindow"], f"max peak frequency error {error:.2f} Hz" #within 2 FFT frequency bins
+
+    return len(audiostream)/f_s, run, check
+
+
+
+#AXCTD: FSK demodulation (demodulate.demodulate_axctd) from the first 400 Hz pulse to the end of the file,
+#advancing through the PCM data in refreshrate chunks as in the AXCTD processor loop
+def stage_axctd_demodulate(inputs, tempdir):
+
+    processor = make_engine("AXCTD", inputs, tempdir)
+    truth = inputs["AXCTD"]["truth"]
+    audiostream = processor.audiostream
+    f_s = processor.f_s
+
+    firstind = int(truth["firstpulsetime"]*f_s)
+
+    def run():
+        bits = []
+        edges = []
+        s = firstind
+        while len(audiostream) - s >= 4*processor.N_power:
+            e = min(s + processor.minpointsperloop, len(audiostream)-1)
+            curbits, conf, bit_edges, next_demod_ind = demodulate.demodulate_axctd(audiostream[s:e], f_s, processor.demod_Npad, processor.sos_filter, processor.bitrate, processor.f1, processor.f2, processor.trig1, processor.trig2, processor.Npcm, processor.bit_inset, processor.phase_error, processor.high_bit_scale)
+            bits.extend(curbits)
+            edges.extend([be + s for be in bit_edges[:len(curbits)]])
+            s += next_demod_ind - processor.demod_Npad if next_demod_ind > processor.demod_Npad else int(f_s/processor.bitrate)
+        _cache["AXCTD bits"] = (bits, np.asarray(edges))
+        return bits, np.asarray(edges)
+
+    def check(output):
+        bits, edges = output
+        #demodulated bit nearest the start of each transmitted profile bit, after removing the filter delay
+        #(circular mean of the offsets from the nearest edges, modulo the bit length)
+        tbitstarts = truth["profilebitstarts"]
+        bitlength = f_s/processor.bitrate
+        offsets = edges[nearest_edges(edges, tbitstarts)] - tbitstarts
+        tbitstarts = tbitstarts + np.angle(np.mean(np.exp(2j*np.pi*offsets/bitlength)))*bitlength/(2*np.pi)
+        nearest = nearest_edges(edges, tbitstarts)
+        aligned = np.abs(edges[nearest] - tbitstarts) < bitlength/2
+        correct = aligned & (np.asarray(bits)[nearest] == np.asarray(truth["profilebits"]))
+        ber = 1 - np.sum(correct)/len(tbitstarts)
+        return ber, ber <= 0.01, f"profile bit error rate {100*ber:.3f}%"
+
+    return len(audiostream[firstind:])/f_s, run, check
+
+
+
+#index of the nearest (sorted) edge to each point in points
+def nearest_edges(edges, points):
+    nearest = np.clip(np.searchsorted(edges, points), 1, len(edges)-1)
+    return np.where(np.abs(edges[nearest-1] - points) < np.abs(edges[nearest] - points), nearest-1, nearest)
+
+
+
+#demodulated bits for the parsing stages (runs the demodulation stage if it hasn't been run yet)
+def get_demodulated_bits(inputs, tempdir):
+    if "AXCTD bits" not in _cache:
+        stage_axctd_demodulate(inputs, tempdir)[1]()
+    return _cache["AXCTD bits"]
+
+
+
+#AXCTD: parsing the demodulated profile bitstream to frames/T/C/S/z (parse.parse_bitstream_to_profile)
+def stage_axctd_parse_profile(inputs, tempdir):
+
+    processor = make_engine("AXCTD", inputs, tempdir)
+    truth = inputs["AXCTD"]["truth"]
+    f_s = processor.f_s
+
+    bits, edges = get_demodulated_bits(inputs, tempdir)
+    profstartind = int(truth["profilestarttime"]*f_s)
+    firstbit = np.where(edges >= profstartind - f_s/processor.bitrate/2)[0][0]
+    bitstream = bits[firstbit:]
+    times = (edges[firstbit:] - profstartind)/f_s
+    siglevs = [1] * len(bitstream) #R400/R7500 aren't needed to parse the bitstream
+
+    def run():
+        return parse.parse_bitstream_to_profile(bitstream, times, siglevs, siglevs, processor.tempLUT, processor.tcoeff, processor.ccoeff, processor.zcoeff)
+
+    def check(output):
+        hexframes, proftimes = output[0], output[1]
+        framenum = np.round(np.asarray(proftimes)*processor.bitrate/32).astype(int)
+        nmatch = sum([0 <= cnum < len(truth["frames"]) and truth["frames"][cnum] == cframe for (cnum,cframe) in zip(framenum, hexframes)])
+        recovered = nmatch/len(truth["frames"])
+        return recovered, recovered >= 0.98, f"{100*recovered:.2f}% of profile frames recovered ({len(hexframes)-nmatch} bad)"
+
+    return len(bitstream)/processor.bitrate, run, check
+
+
+
+#AXCTD: header parsing (parse.trim_header and parse.parse_header) for the second header, in the time window the AXCTD processor uses
+def stage_axctd_parse_header(inputs, tempdir):
+
+    processor = make_engine("AXCTD", inputs, tempdir)
+    truth = inputs["AXCTD"]["truth"]
+    f_s = processor.f_s
+
+    bits, edges = get_demodulated_bits(inputs, tempdir)
+    firstpulse = int(truth["firstpulsetime"]*f_s)
+    headerbits = [b for (b,e) in zip(bits,edges) if firstpulse + int(f_s*10) <= e <= firstpulse + int(f_s*15.3)]
+
+    def run():
+        return parse.parse_header(parse.trim_header(headerbits))
+
+    def check(header):
+        nvalid = 0
+        for coeff in ['t','c','z']:
+            nvalid += sum([cvalid and np.isclose(cval, tval, rtol=1E-7, atol=1E-12) for (cvalid, cval, tval) in zip(header[coeff+'coeff_valid'], header[coeff+'coeff'], truth["header"][coeff+'coeff'])])
+        ok = nvalid == 12 and header['serial_no'] == truth["header"]["serial_no"] and header['probe_code'] == truth["header"]["probe_code"]
+        return nvalid, ok, f"{nvalid}/12 coefficients decoded, {sum(header['counter_found'])}/72 frames"
+
+    return len(headerbits)/processor.bitrate, run, check
+
+
+
+#AXCP: input low pass and subsampling filter chain (first_subsample/second_subsample) through rotation rate detection,
+#run on refreshrate chunks as in iterate_AXCP_process
+def stage_axcp_filters(inputs, tempdir):
+
+    processor = make_engine("AXCP", inputs, tempdir)
+    truth = inputs["AXCP"]["truth"]
+    audiostream = processor.audiostream
+    f_s = processor.f_s
+
+    def run():
+        frotlp = []
+        for s in range(0, len(audiostream) - processor.minpointsperloop + 1, processor.minpointsperloop):
+            e = s + processor.minpointsperloop
+            processor.demod_buffer = audiostream[s:e]
+            processor.T = np.append(processor.T, np.round(e/f_s,2))
+            processor.PK = np.append(processor.PK, np.max(np.abs(processor.demod_buffer)))
+            xinlp, processor.zxinlp = signal.sosfilt(processor.sosxinlp, processor.demod_buffer, zi=processor.zxinlp)
+            envxcclp, fcclp, feflp, ftelp = processor.first_subsample(xinlp)
+            pklp = processor.PK[-1] * np.ones(len(envxcclp))
+            frotlp.append(processor.second_subsample(pklp, envxcclp, fcclp, feflp, ftelp)[7][-1])
+        return np.asarray(frotlp)
+
+    def check(frotlp):
+        good = processor.T > truth["tspinup"] + 5 #after the rotation detection filters settle
+        error = np.median(np.abs(frotlp[good] - np.interp(processor.T[good], truth["time"], truth["rotation"])))
+        return error, error <= 0.5, f"median rotation rate error {error:.3f} Hz"
+
+    return len(audiostream)/f_s, run, check
+
+
+
+#AXCP: overlapping short-time FFTs for temperature (calc_fft_temps/dofft) on refreshrate chunks
+def stage_axcp_fft_temps(inputs, tempdir):
+
+    processor = make_engine("AXCP", inputs, tempdir)
+    truth = inputs["AXCP"]["truth"]
+    audiostream = processor.audiostream
+    f_s = processor.f_s
+
+    def run():
+        for s in range(0, len(audiostream) - processor.minpointsperloop + 1, processor.minpointsperloop):
+            processor.demod_buffer = audiostream[s:s+processor.minpointsperloop]
+            processor.calc_fft_temps(s + processor.minpointsperloop)
+        return processor.TEMP_FFT
+
+    def check(temps):
+        #temperature error converted to frequency error with the local slope of the frequency to temperature conversion
+        ftemps = processor.calc_temp_from_freq(np.array([truth["fte"], truth["fte"]+1]), np.array([-999, -999]))
+        error = np.max(np.abs(temps - ftemps[0]))/np.abs(ftemps[1] - ftemps[0])
+        return error, error <= 1, f"max temperature peak frequency error {error:.2f} Hz ({len(temps)} FFTs)"
+
+    return len(audiostream)/f_s, run, check
+
+
+
+#full processor run on the synthetic WAV file (engine run loop, as when reprocessing an audio file without the GUI)
+def stage_processor(probetype):
+
+    def stage(inputs, tempdir):
+
+        truth = inputs[probetype]["truth"]
+
+        def run():
+            return headless.process_audio_file(inputs[probetype]["wavfile"], probetype, tempdir=tempdir, lat=25, lon=-85)
+
+        def check(output):
+            processor, collector = output
+            rawdata = collector.rawdata
+            npoints = len(rawdata["depth"])
+
+            if collector.errors:
+                return 0, False, f"processor failed with error code {collector.errors[0]}"
+
+            if probetype == "AXBT":
+                fftwindow = das_out.default_processor_settings()["fftwindow"]
+                good = np.isfinite(rawdata["temperature"]) & (rawdata["time"] - fftwindow/2 > truth["tstart"]) #good points with the FFT window entirely after the tone starts
+                error = np.max(np.abs(rawdata["frequency"][good] - np.interp(rawdata["time"][good], truth["time"], truth["frequency"]))) if np.any(good) else np.inf
+                return error, error <= 2/fftwindow, f"{np.sum(good)} points, max frequency error {error:.2f} Hz"
+
+            elif probetype == "AXCTD":
+                nvalid = sum(processor.metadata['tcoeff_valid'] + processor.metadata['ccoeff_valid'] + processor.metadata['zcoeff_valid'])
+                if not parse.USE_GSW: #without gsw salinities are NaN and every point is rejected, only the header can be checked
+                    return nvalid, nvalid == 12, f"{nvalid}/12 header coefficients decoded (gsw not installed- profile not checked)"
+                #frames sent before the 7500 Hz tone is detected, and frames with bit errors from the signal noise (more than in the
+                #AXCTD parse_bitstream_to_profile stage, which parses bits demodulated from the whole signal at once) are
+                #dropped, so ~87-98% of frames are recovered depending on the seed/signal length
+                recovered = sum([cframe in truth["frames"] for cframe in rawdata["frame"]])/len(truth["frames"])
+                return recovered, nvalid == 12 and recovered >= 0.8, f"{nvalid}/12 header coefficients decoded, {100*recovered:.1f}% of frames in profile"
+
+            else:
+                error = np.median(np.abs(rawdata["frequency"] - np.interp(rawdata["time"], truth["time"], truth["rotation"]))) if npoints else np.inf
+                return error, error <= 0.5, f"{npoints} points, median rotation rate error {error:.3f} Hz"
+
+        return truth["duration"], run, check
+
+    return stage
+
+
+
+stages = {"AXBT dofft":stage_axbt_dofft,
+          "AXBT processor":stage_processor("AXBT"),
+          "AXCTD demodulate_axctd":stage_axctd_demodulate,
+          "AXCTD parse_bitstream_to_profile":stage_axctd_parse_profile,
+          "AXCTD parse_header":stage_axctd_parse_header,
+          "AXCTD processor":stage_processor("AXCTD"),
+          "AXCP filter chain":stage_axcp_filters,
+          "AXCP calc_fft_temps":stage_axcp_fft_temps,
+          "AXCP processor":stage_processor("AXCP")}
+
+
+
+
+
+# =============================================================================
+#   RUNNING AND COMPARING BENCHMARKS
+# =============================================================================
+
+#runs a stage repeat times (fresh setup each time), returning the fastest time, peak memory (separate run
+#with tracemalloc, which slows python code), and accuracy check results
+def run_stage(stagefunction, inputs, tempdir, repeat=3):
+
+    times = []
+    for _ in range(repeat):
+        audioseconds, run, check = stagefunction(inputs, tempdir)
+        starttime = timemodule.perf_counter()
+        output = run()
+        times.append(timemodule.perf_counter() - starttime)
+
+    accuracy, passed, description = check(output)
+
+    audioseconds, run, check = stagefunction(inputs, tempdir)
+    tracemalloc.start()
+    run()
+    peakmemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"audio_seconds":audioseconds, "seconds":min(times), "xrealtime":audioseconds/min(times), "peak_MB":peakmemory/1E6,
+        "accuracy":float(accuracy), "passed":bool(passed), "description":description}
+
+
+
+#compares results with a baseline, returning a list of regressions (stage, problem) for stages in both
+#slower = throughput dropped by more than tolerance (fraction), larger = peak memory grew by more than memtolerance (and 1 MB)
+def compare_results(results, baseline, tolerance=0.25, memtolerance=0.25):
+
+    regressions = []
+    for (stage, cresult) in results.items():
+        if stage not in baseline:
+            continue
+        bresult = baseline[stage]
+        if cresult["xrealtime"] < bresult["xrealtime"]*(1 - tolerance):
+            regressions.append((stage, f"throughput {cresult['xrealtime']:.1f}x realtime, baseline {bresult['xrealtime']:.1f}x"))
+        if cresult["peak_MB"] > bresult["peak_MB"]*(1 + memtolerance) + 1:
+            regressions.append((stage, f"peak memory {cresult['peak_MB']:.1f} MB, baseline {bresult['peak_MB']:.1f} MB"))
+
+    return regressions
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark AXBPS DAS signal processing stages on synthetic AXBT/AXCTD/AXCP signals")
+    parser.add_argument("--stages", nargs="+", default=None, help="run stages starting with these names (e.g. AXCTD, 'AXCP filter'), default is all stages")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per stage (fastest is reported)")
+    parser.add_argument("--quick", action="store_true", help="shorter synthetic signals")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for synthetic signal noise")
+    parser.add_argument("--save", default=None, help="save results (JSON) for use as a baseline")
+    parser.add_argument("--compare", default=None, help="baseline results (JSON) to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional drop in throughput from the baseline")
+    parser.add_argument("--memtolerance", type=float, default=0.25, help="allowed fractional increase in peak memory from the baseline")
+    parser.add_argument("--wavdir", default=None, help="directory to write (and keep) the synthetic WAV files")
+    args = parser.parse_args()
+
+    config = {"mode":"quick" if args.quick else "full", "seed":args.seed}
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f_in:
+            baseline = json.load(f_in)
+        if baseline["config"] != config:
+            parser.error(f"Baseline {args.compare} was run with {baseline['config']}, current run is {config}")
+
+    runstages = [stage for stage in stages.keys() if args.stages is None or any([stage.lower().startswith(cstage.lower()) for cstage in args.stages])]
+    if not runstages:
+        parser.error(f"No stages match {args.stages}, options are: {', '.join(stages.keys())}")
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        wavdir = tempdir
+        if args.wavdir is not None:
+            os.makedirs(args.wavdir, exist_ok=True)
+            wavdir = args.wavdir
+        inputs = make_inputs(wavdir, config["mode"], args.seed)
+
+        results = {}
+        print(f"{'stage':<36}{'x realtime':>12}{'time (s)':>10}{'peak MB':>10}  accuracy")
+        for stage in runstages:
+            results[stage] = run_stage(stages[stage], inputs, tempdir, args.repeat)
+            cresult = results[stage]
+            print(f"{stage:<36}{cresult['xrealtime']:>12.1f}{cresult['seconds']:>10.3f}{cresult['peak_MB']:>10.1f}  {'ok' if cresult['passed'] else 'FAILED'}: {cresult['description']}")
+
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    if args.save is not None:
+        with open(args.save, 'w') as f_out:
+            json.dump({"config":config, "platform":platform.platform(), "numpy":np.__version__, "date":dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M"), "results":results}, f_out, indent=2)
+
+    failed = [stage for (stage, cresult) in results.items() if not cresult["passed"]]
+    regressions = compare_results(results, baseline["results"], args.tolerance, args.memtolerance) if baseline is not None else []
+
+    for stage in failed:
+        print(f"ACCURACY FAILURE: {stage}: {results[stage]['description']}")
+    for (stage, problem) in regressions:
+        print(f"REGRESSION: {stage}: {problem}")
+
+    return 1 if failed or regressions else 0
+
+
+
+if __name__ == "__main__":
+    exit(main())
+
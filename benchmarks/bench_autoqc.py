@@ -0,0 +1,449 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# Benchmark and equivalence check for the profile editor quality control functions (lib/PE/autoqc.py, and the climatology
+# comparison in lib/PE/ocean_climatology_interaction.py). Each stage runs
+# the current implementation and the original (reference) implementation below on seeded synthetic profiles, reports
+# both run times, and checks that the outputs match, so optimizations are only accepted if they don't change results.
+#
+# Examples (from the AXBPS directory):
+#   python -m benchmarks.bench_autoqc                       #run all stages
+#   python -m benchmarks.bench_autoqc --stages despiker     #despiker only
+#   python -m benchmarks.bench_autoqc --sizes 1000 50000    #profile lengths (points) to time
+#   python -m benchmarks.bench_autoqc --stages autoqc       #full autoqc pipeline (all steps)
+
+
+import argparse
+import time as timemodule
+from sys import exit
+
+import numpy as np
+
+import lib.PE.autoqc as qc
+
+
+
+
+# =============================================================================
+#   SYNTHETIC PROFILES
+# =============================================================================
+
+#10 Hz AXBT-like temperature profile with npoints points: mixed layer, thermocline, noise, spikes, and temperatures
+#rounded to 0.01 C as the processor rounds them (so some windows have no variation)
+def synthetic_profile(npoints, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(npoints)/10
+    depth = np.round(1.5926*times - 0.00018*times**2, 2)
+    maxdepth = depth[-1] if npoints > 0 else 1
+    mld = rng.uniform(0.05, 0.3)*maxdepth
+    temperature = 26 - 8*np.clip((depth - mld)/(maxdepth - mld), 0, 1)**0.7 + rng.normal(0, 0.03, npoints)*(depth > mld)
+    spikes = rng.random(npoints) < 0.01
+    temperature[spikes] += rng.normal(0, 3, np.sum(spikes))
+    return depth, np.round(temperature, 2)
+
+
+
+
+# =============================================================================
+#   REFERENCE (ORIGINAL) IMPLEMENTATIONS
+# =============================================================================
+
+def reference_rundespiker(rawdepth,rawdata,maxdev):
+    data_despike = np.array([])
+    depth_despike = np.array([])
+
+    depthwin = 30
+    maxdepth = np.max(rawdepth)
+
+    for n,cdepth in enumerate(rawdepth):
+        if cdepth <= depthwin:
+            goodindex = np.less_equal(rawdepth,depthwin)
+        elif cdepth >= maxdepth - depthwin:
+            goodindex = np.greater_equal(rawdepth, maxdepth-depthwin)
+        else:
+            ge = np.greater_equal(rawdepth, cdepth - depthwin)
+            le = np.less_equal(rawdepth, cdepth + depthwin)
+            goodindex = np.all([ge,le],axis=0)
+
+        dataspike = rawdata[goodindex]
+        curmean = np.mean(dataspike)
+        curstd = np.std(dataspike)
+
+        if abs(rawdata[n]-curmean) <= maxdev*curstd or rawdepth[n] < 10:
+            depth_despike = np.append(depth_despike,rawdepth[n])
+            data_despike = np.append(data_despike,rawdata[n])
+
+    return depth_despike,data_despike
+
+
+
+def reference_runsmoother(depth_despike,data_despike,smoothlev):
+    data_smooth = np.array([])
+    depth_smooth = depth_despike.copy()
+    mindepth = np.min(depth_despike)
+    maxdepth = np.max(depth_despike)
+
+    for n,cdepth in enumerate(depth_despike):
+        if cdepth == mindepth or cdepth == maxdepth:
+            data_smooth = np.append(data_smooth,data_despike[n])
+
+        else:
+            if cdepth <= smoothlev/2:
+                cursmoothlev = 2*cdepth
+            elif cdepth >= maxdepth - smoothlev/2:
+                cursmoothlev = 2*(maxdepth - cdepth)
+            else:
+                cursmoothlev = smoothlev
+
+            ge = np.greater_equal(depth_despike, cdepth - cursmoothlev/2)
+            le = np.less_equal(depth_despike,cdepth + cursmoothlev/2)
+            goodindex = np.all([ge,le],axis=0)
+
+            data_smooth = np.append(data_smooth,np.mean(data_despike[goodindex]))
+
+    return depth_smooth,data_smooth
+
+
+
+def reference_removegaps(rawdepth,rawdata):
+    donegapcheck = False
+    while not donegapcheck:
+        maxcheckdepth = 50 #only checks the upper 50m of the profile
+        maxgapdiff = 10 #if gap is larger than this range (m), correct profile
+        isgap = [0]
+        for i in range(1,len(rawdepth)):
+            if (rawdepth[i] >= rawdepth[i-1]+ maxgapdiff) and (rawdepth[i-1] <= maxcheckdepth): #if there is a gap of sufficient size to correct
+                isgap.append(1) #NOTE: the logical 1 is placed at the first depth AFTER the gap
+            else:
+                isgap.append(0)
+        
+        #if there are gaps, find the deepest one and correct t/d profile with that depth as the surface (only works with linear fall rate equation)
+        if np.sum(isgap) > 0:
+            lastgap = np.max(np.argwhere(isgap))
+            realstartdepth = rawdepth[lastgap]
+            rawdata = rawdata[lastgap:]
+            rawdepth = rawdepth[lastgap:]-realstartdepth
+        else: #otherwise, exit loop
+            donegapcheck = True
+        
+    return rawdepth,rawdata
+
+
+
+def reference_subsample_profile(depth_smooth,data_smooth,profres):
+    
+    dtdz = [] #calculating profile slope (append 0 at start and end so length matches that of depth_smooth)
+    dtdz.append(0)
+    for i in range(1,len(data_smooth)-1): #need to use range here because we are only interested in a subset of indices
+        #dtdz = (t3 - t1)/(z3 - z1): centered on z2
+        dtdz.append(((data_smooth[i+1] - data_smooth[i-1])/ 
+              (depth_smooth[i+1]-depth_smooth[i-1])))
+    dtdz.append(0)
+
+    depth = []
+    dataerature = []
+    lastdepth = -100000 #large enough value so subsampler will always grab first datapoint
+    for i,cdepth in enumerate(depth_smooth):
+        #constraint on first derivative of data with depth (no unrealistic spikes), if the point is a critical value given the selected resolution level, append to output profile
+        if dtdz[i] <= 0.5 and cdepth-lastdepth >= profres:
+            depth.append(cdepth)
+            dataerature.append(data_smooth[i])
+            lastdepth = cdepth
+    
+    return depth,dataerature
+
+
+
+#full autoqc pipeline with the reference implementations
+def reference_autoqc(rawdata,rawdepth,smoothlev,profres,maxdev,checkforgaps):
+    isgood = [False if (np.isnan(rd*rz)) else True for rd,rz in zip(rawdata,rawdepth)]
+    rawdepth = rawdepth[isgood]
+    rawdata = rawdata[isgood]
+    if checkforgaps and len(rawdepth) > 0:
+        rawdepth,rawdata = reference_removegaps(rawdepth,rawdata)
+    depth_despike,data_despike = reference_rundespiker(rawdepth,rawdata,maxdev)
+    depth_smooth,data_smooth = reference_runsmoother(depth_despike,data_despike,smoothlev)
+    depth,data = reference_subsample_profile(depth_smooth,data_smooth,profres)
+    if depth[0] != 0:
+        depth.insert(0,0)
+        data.insert(0,data[0])
+    return [np.array(data),np.array(depth)]
+
+
+
+def reference_runningsmooth(data,halfwindow): 
+    if halfwindow*2+1 >= len(data): 
+        smoothdata = np.ones(len(data))*np.mean(data)
+    else:
+        smoothdata = np.array([])
+        for i in range(len(data)):
+            if i <= halfwindow:
+                smoothdata = np.append(smoothdata,np.mean(data[:i+halfwindow]))
+            elif i >= len(data) - halfwindow:
+                smoothdata = np.append(smoothdata,np.mean(data[i-halfwindow:]))
+            else:
+                smoothdata = np.append(smoothdata,np.mean(data[i-halfwindow:i+halfwindow]))
+    return smoothdata
+
+
+
+#shapely is imported when the climatology comparison references are first run
+def reference_isinclimofill(data,depth,climodatafill,climodepthfill):
+    from shapely.geometry import Point
+    from shapely.geometry.polygon import Polygon
+    climopolylist = []
+    for i in range(len(climodatafill)):
+        climopolylist.append([climodatafill[i],climodepthfill[i]])
+    climopolygon = Polygon(climopolylist)
+    return np.array([climopolygon.contains(Point(data[i], depth[i])) for i in range(len(data))], dtype=bool)
+
+
+
+def reference_comparetoclimo(data,depth,climodatas,climodepths,climodatafill,climodepthfill):
+    from shapely.geometry import Point
+    from shapely.geometry.polygon import Polygon
+    
+    climodatas[np.less_equal(climodatas,-8)] = np.nan
+    intclimodata = np.interp(depth,climodepths,climodatas)
+    isnandata = np.isnan(intclimodata*data)
+    
+    if sum(isnandata) != len(isnandata):
+        data = data[isnandata == 0]
+        intclimodata = intclimodata[isnandata == 0]
+        depth = depth[isnandata == 0]
+        
+        climoslope = np.diff(intclimodata)/np.diff(depth)
+        profslope = np.diff(data)/np.diff(depth)
+        slopedepths = 0.5*depth[1:] + 0.5*depth[:-1]
+        
+        threshold = 0.1
+        ismismatch = abs(reference_runningsmooth(climoslope-profslope, 50)) >= threshold
+        
+        if sum(ismismatch) != 0:
+            climobottomcutoff = np.max(slopedepths[ismismatch])
+            isabovecutoff = np.less_equal(depth,climobottomcutoff)
+            data = data[isabovecutoff == 1]
+            depth = depth[isabovecutoff == 1]
+        else:
+            climobottomcutoff = np.nan
+
+        if np.isnan(climobottomcutoff):
+            maxd = 1E10
+        else:
+            maxd = climobottomcutoff
+        
+        isinclimo = []
+        climopolylist = []
+        for i in range(len(climodatafill)):
+            climopolylist.append([climodatafill[i],climodepthfill[i]])
+        climopolygon = Polygon(climopolylist)    
+        
+        depth[0] = 0.1
+        for i in range(len(data)):
+            if depth[i] <= maxd:
+                curpoint = Point(data[i], depth[i])
+                isinclimo.append(int(climopolygon.contains(curpoint)))
+            
+        minpctmatch = 0.5
+        if sum(isinclimo)/len(isinclimo) >= minpctmatch: 
+            matchclimo = 1
+        else:
+            matchclimo = 0
+    
+    else:
+        matchclimo = 1
+        climobottomcutoff = np.nan
+        
+    return matchclimo,climobottomcutoff
+
+
+
+
+# =============================================================================
+#   STAGES
+# =============================================================================
+
+#each stage: (reference function, current function, arguments from a synthetic profile, output comparison)
+
+def equal_outputs(ref, new):
+    return all([np.array_equal(np.asarray(cref), np.asarray(cnew), equal_nan=True) for (cref, cnew) in zip(ref, new)])
+
+#equal to within floating point roundoff (for outputs computed from sums in a different order)
+def close_outputs(ref, new):
+    return all([np.shape(cref) == np.shape(cnew) and np.allclose(cref, cnew, rtol=1E-12, atol=1E-12, equal_nan=True) for (cref, cnew) in zip(ref, new)])
+
+
+#short profiles with data rounded to 0-2 decimals: windows with few distinct values often have points exactly maxdev
+#standard deviations from the mean, which the despiker has to keep/reject as the original does
+def quantized_args(depth, temperature):
+    rng = np.random.default_rng(len(depth))
+    npoints = 5 + len(depth) % 400
+    return (np.sort(rng.uniform(0, 200, npoints)), np.round(rng.normal(10, 1, npoints), len(depth) % 3), [0.5, 1., 1.5, 2., 3.][len(depth) % 5])
+
+
+#smoothing T and a second variable (e.g. S) in one call must match smoothing each separately
+def reference_runsmoother_batch(depth, data, smoothlev):
+    return [depth, np.array([reference_runsmoother(depth, cdata, smoothlev)[1] for cdata in data])]
+
+def batch_args(depth, temperature):
+    return (depth, np.array([temperature, 35 + 0.1*np.sin(depth/10)]), 8.)
+
+
+#profile with false starts (interference starting the profile early): the first points are shifted up by gaps of 10 m
+#or more within the top 50 m
+def gap_args(depth, temperature):
+    depth = depth.copy()
+    npoints = len(depth)
+    for cstart in sorted(set([npoints//50, npoints//20]))[::-1]:
+        depth[:cstart] -= 12.
+    depth[npoints//5] = np.nan #NaN removed before the gap check
+    return (depth, temperature)
+
+def subsample_args(depth, temperature):
+    return (*qc.runsmoother(depth, temperature, 8.), 1.)
+
+def autoqc_args(depth, temperature):
+    depth, temperature = gap_args(depth, temperature)
+    return (temperature, depth, 8., 1., 1.5, True)
+
+def reference_removegaps_nonan(depth, temperature):
+    isgood = ~np.isnan(depth)
+    return reference_removegaps(depth[isgood], temperature[isgood])
+
+def removegaps_nonan(depth, temperature):
+    isgood = ~np.isnan(depth)
+    return qc.removegaps(depth[isgood], temperature[isgood])
+
+#climatology comparison functions are imported when first run (the module requires the climatology dependencies)
+def current_runningsmooth(data, halfwindow):
+    from lib.PE.ocean_climatology_interaction import runningsmooth
+    return runningsmooth(data, halfwindow)
+
+#slope differences between the profile and a smooth "climatology" profile, as smoothed in comparetoclimo
+def slope_args(depth, temperature):
+    climo = 26 - 8*depth/max(depth[-1], 1)
+    return (np.diff(climo)/np.diff(depth) - np.diff(temperature)/np.diff(depth), 50)
+
+def current_isinclimofill(data, depth, climodatafill, climodepthfill):
+    from lib.PE.ocean_climatology_interaction import isinclimofill
+    return isinclimofill(data, depth, climodatafill, climodepthfill)
+
+def current_comparetoclimo(data, depth, climodatas, climodepths, climodatafill, climodepthfill):
+    from lib.PE.ocean_climatology_interaction import comparetoclimo
+    return comparetoclimo(data, depth, climodatas, climodepths, climodatafill, climodepthfill)
+
+#climatology profile on standard depth levels (+/- 1 standard deviation fill as made in getclimatologyprofile) that
+#roughly matches the synthetic profile, or not (random offset), some with a repeated fill depth (non-monotonic fill)
+def climo_args(depth, temperature):
+    rng = np.random.default_rng(len(depth))
+    climodepths = np.array([0, 10, 20, 30, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 600, 700, 800, 900, 1000, 1100, 1200], dtype=float)
+    climodepths = climodepths[climodepths <= max(depth[-1], 100) + 200]
+    climotemps = np.interp(climodepths, depth, temperature) + rng.normal(0, 1.5)
+    climoerrors = rng.uniform(0.2, 1.5, len(climodepths))
+    if len(depth) % 4 == 1:
+        climodepths[len(climodepths)//2] = climodepths[len(climodepths)//2 - 1]
+    climodatafill = np.append(climotemps-climoerrors,np.flip(climotemps+climoerrors))
+    climodepthfill = np.append(climodepths,np.flip(climodepths))
+    return (temperature, depth, climotemps, climodepths, climodatafill, climodepthfill)
+
+def climofill_args(depth, temperature):
+    temperature, depth, _, _, climodatafill, climodepthfill = climo_args(depth, temperature)
+    depth = depth.copy()
+    depth[0] = 0.1
+    return (temperature, depth, climodatafill, climodepthfill)
+
+
+stages = {"despiker":(reference_rundespiker, qc.rundespiker, lambda depth, temperature: (depth, temperature, 1.5), equal_outputs),
+          "despiker (quantized)":(reference_rundespiker, qc.rundespiker, quantized_args, equal_outputs),
+          "smoother":(reference_runsmoother, qc.runsmoother, lambda depth, temperature: (depth, temperature, 8.), close_outputs),
+          "smoother (T+S)":(reference_runsmoother_batch, qc.runsmoother, batch_args, close_outputs),
+          "gaps":(reference_removegaps_nonan, removegaps_nonan, gap_args, equal_outputs),
+          "subsample":(reference_subsample_profile, qc.subsample_profile, subsample_args, equal_outputs),
+          "autoqc":(reference_autoqc, qc.autoqc, autoqc_args, close_outputs),
+          "runningsmooth":(reference_runningsmooth, current_runningsmooth, slope_args, close_outputs),
+          "climo fill":(reference_isinclimofill, current_isinclimofill, climofill_args, equal_outputs),
+          "comparetoclimo":(reference_comparetoclimo, current_comparetoclimo, climo_args, equal_outputs)}
+
+
+
+
+def time_function(function, args, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = timemodule.perf_counter()
+        output = function(*args)
+        times.append(timemodule.perf_counter() - t0)
+    return min(times), output
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark the AXBPS profile editor quality control functions against their original implementations")
+    parser.add_argument("--stages", nargs="+", default=None, help="run stages starting with these names, default is all stages")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 4000, 16000], help="profile lengths (points) to time")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per stage (fastest is reported)")
+    parser.add_argument("--nchecks", type=int, default=50, help="number of random profiles for the equivalence check")
+    args = parser.parse_args()
+
+    runstages = [stage for stage in stages.keys() if args.stages is None or any([stage.lower().startswith(cstage.lower()) for cstage in args.stages])]
+    if not runstages:
+        parser.error(f"No stages match {args.stages}, options are: {', '.join(stages.keys())}")
+
+    failed = []
+    print(f"{'stage':<22}{'points':>8}{'reference (s)':>15}{'current (s)':>13}{'speedup':>9}  outputs")
+    for stage in runstages:
+        reference, current, makeargs, compare = stages[stage]
+        try:
+            for cfunction in [reference, current]:
+                cfunction(*makeargs(*synthetic_profile(20)))
+        except ImportError as e:
+            print(f"{stage:<22}{'--':>8}  unavailable: {e}")
+            continue
+
+        #equivalence on random profiles of varying length
+        rng = np.random.default_rng(0)
+        mismatches = 0
+        for seed in range(args.nchecks):
+            cargs = makeargs(*synthetic_profile(int(rng.integers(20, 3000)), seed=seed))
+            if not compare(reference(*cargs), current(*cargs)):
+                mismatches += 1
+        if mismatches:
+            failed.append(stage)
+
+        for npoints in args.sizes:
+            cargs = makeargs(*synthetic_profile(npoints, seed=npoints))
+            reftime, refoutput = time_function(reference, cargs, args.repeat)
+            curtime, curoutput = time_function(current, cargs, args.repeat)
+            same = compare(refoutput, curoutput)
+            if not same and stage not in failed:
+                failed.append(stage)
+            print(f"{stage:<22}{npoints:>8}{reftime:>15.4f}{curtime:>13.4f}{reftime/curtime:>9.1f}  {'match' if same else 'MISMATCH'}")
+
+        print(f"{stage:<22}{'':>8}  {args.nchecks - mismatches}/{args.nchecks} random profiles match")
+
+    for stage in failed:
+        print(f"EQUIVALENCE FAILURE: {stage}")
+
+    return 1 if failed else 0
+
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,145 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# Import time benchmark for AXBPS startup. Each target is imported in a fresh Python interpreter (so nothing is already
+# imported) and the fastest of several runs is reported. "gui" is what main.py imports before the main window opens-
+# the processor and profile editor modules (gui/_lazyimport.py) are imported after the window opens, and are timed
+# separately in "gui + preload".
+#
+# Examples (from the AXBPS directory):
+#   python -m benchmarks.bench_imports                          #time all targets
+#   python -m benchmarks.bench_imports --detail gui             #also list the slowest modules imported by gui
+#   python -m benchmarks.bench_imports --save baseline.json     #save results as a baseline
+#   python -m benchmarks.bench_imports --compare baseline.json  #exit 1 if any target is slower than the baseline (beyond tolerance)
+#
+# Targets that can't be imported (e.g. PyQt5 not installed) are reported and skipped.
+
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import datetime as dt
+from sys import exit
+
+
+
+#code run for each target (after the timer starts)
+targets = {"gui":"import gui",
+           "gui + preload":"import gui\nfrom gui._lazyimport import qtproc, oci, profplot, qc\nfor m in [qtproc, oci, profplot, qc]: m.load()",
+           "DAS receivers/files":"import lib.DAS.common_DAS_functions",
+           "DAS processors":"import lib.DAS.DAS_AXBT, lib.DAS.DAS_AXCTD, lib.DAS.DAS_AXCP",
+           "profile editor":"import lib.PE.autoqc, lib.PE.ocean_climatology_interaction, lib.PE.make_profile_plots"}
+
+timer = """import time
+_t0 = time.perf_counter()
+{code}
+print('IMPORTTIME', time.perf_counter() - _t0)
+"""
+
+repodir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+
+
+#imports the target in a fresh interpreter, returns the time (sec) or raises RuntimeError with the error message
+def time_import(code, pythonargs=[]):
+    output = subprocess.run([sys.executable] + pythonargs + ["-c", timer.format(code=code)], cwd=repodir, capture_output=True, text=True)
+    for line in output.stdout.splitlines():
+        if line.startswith("IMPORTTIME"):
+            return float(line.split()[1]), output.stderr
+    raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else f"exit code {output.returncode}")
+
+
+
+#slowest modules (cumulative import time) for the target from python -X importtime
+def import_detail(code, ntop=15):
+    _, stderr = time_import(code, ["-X", "importtime"])
+    modules = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            fields = [cf.strip() for cf in line[len("import time:"):].split("|")]
+            if fields[1].isdigit():
+                modules.append((int(fields[1])/1E6, fields[2].strip()))
+    return sorted(modules, reverse=True)[:ntop]
+
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    regressions = []
+    for (target, cresult) in results.items():
+        if target in baseline and cresult["seconds"] is not None and baseline[target]["seconds"] is not None:
+            if cresult["seconds"] > baseline[target]["seconds"] * (1 + tolerance):
+                regressions.append((target, f"{cresult['seconds']:.3f} s vs. baseline {baseline[target]['seconds']:.3f} s"))
+    return regressions
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark AXBPS import (startup) times")
+    parser.add_argument("--targets", nargs="+", default=None, help="time targets starting with these names (e.g. gui, DAS), default is all targets")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed imports per target (fastest is reported)")
+    parser.add_argument("--detail", nargs="+", default=[], help="list the slowest modules imported by these targets")
+    parser.add_argument("--save", default=None, help="save results (JSON) for use as a baseline")
+    parser.add_argument("--compare", default=None, help="baseline results (JSON) to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional increase in import time from the baseline")
+    args = parser.parse_args()
+
+    runtargets = [target for target in targets.keys() if args.targets is None or any([target.lower().startswith(ctarget.lower()) for ctarget in args.targets])]
+    if not runtargets:
+        parser.error(f"No targets match {args.targets}, options are: {', '.join(targets.keys())}")
+
+    results = {}
+    print(f"{'target':<24}{'time (s)':>10}")
+    for target in runtargets:
+        try:
+            seconds = min([time_import(targets[target])[0] for _ in range(args.repeat)])
+            results[target] = {"seconds":seconds, "error":None}
+            print(f"{target:<24}{seconds:>10.3f}")
+        except RuntimeError as e:
+            results[target] = {"seconds":None, "error":str(e)}
+            print(f"{target:<24}{'--':>10}  unavailable: {e}")
+
+    for target in [ctarget for ctarget in runtargets if any([ctarget.lower().startswith(cdetail.lower()) for cdetail in args.detail])]:
+        if results[target]["seconds"] is None:
+            continue
+        print(f"\nslowest modules imported by {target} (cumulative, s):")
+        for (seconds, module) in import_detail(targets[target]):
+            print(f"  {seconds:8.3f}  {module}")
+
+    if args.save is not None:
+        with open(args.save, 'w') as f_out:
+            json.dump({"platform":platform.platform(), "python":platform.python_version(), "date":dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M"), "results":results}, f_out, indent=2)
+
+    regressions = []
+    if args.compare is not None:
+        with open(args.compare) as f_in:
+            regressions = compare_results(results, json.load(f_in)["results"], args.tolerance)
+    for (target, problem) in regressions:
+        print(f"REGRESSION: {target}: {problem}")
+
+    return 1 if regressions else 0
+
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,255 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# Seeded synthetic AXBT, AXCTD and AXCP signals with known contents, used to benchmark and
+# regression test the DAS signal processing without recorded audio. Each generator returns
+# (pcm, truth): pcm is a float array of 16-bit PCM amplitudes sampled at f_s, and truth is a
+# dict describing what the processor should recover from it (see each generator).
+#
+# Example:
+#   pcm, truth = axbt_signal(duration=60, seed=1)
+#   write_wav("axbt_synthetic.WAV", pcm, truth["fs"])
+
+
+import numpy as np
+from scipy.io import wavfile
+
+import lib.DAS.common_DAS_functions as cdf
+import lib.DAS.parseAXCTD as parse
+
+
+fs_default = 44100
+
+#AXCTD transmission format (see lib/DAS/parseAXCTD.py and DAS_AXCTD.iterate_AXCTD_process)
+crc_divisor = [1,1,0,0,1,0,1]
+axctd_pulse_length = 1.8 #seconds of 400 Hz (continuous 1 bits) before each header
+axctd_cycle_length = 9.68 #seconds between the start of each 400 Hz pulse
+axctd_num_headers = 3
+
+#default AXCTD header contents (coefficients match the AXBPS default settings)
+axctd_header_default = {"serial_no":"00012345", "max_depth":"1000", "probe_code":"a000",
+    "zcoeff":[0.72, 2.76124, -0.000238007, 0], "tcoeff":[-0.053328, 0.994372, 0, 0], "ccoeff":[-0.0622192, 1.04584, 0, 0]}
+
+
+
+
+# =============================================================================
+#   COMMON FUNCTIONS
+# =============================================================================
+
+#writes a synthetic signal to a 16-bit mono WAV file
+def write_wav(filename, pcm, f_s=fs_default):
+    wavfile.write(filename, f_s, np.clip(np.round(pcm), -32768, 32767).astype(np.int16))
+
+
+
+#phase-continuous sinusoid with instantaneous frequency freq (Hz, one value per PCM point)
+def fm_tone(freq, f_s=fs_default):
+    return np.sin(2*np.pi*np.cumsum(freq)/f_s)
+
+
+
+
+
+# =============================================================================
+#   AXBT
+# =============================================================================
+
+#AXBT tone: noise only for tstart seconds, then a tone sweeping linearly from f0 to f1 Hz at the end of the signal
+#truth: time and frequency every 0.01 sec (frequency is 0 before the tone starts) and tstart
+def axbt_signal(duration=60, f_s=fs_default, tstart=5, f0=1405, f1=2450, amplitude=20000, noise=300, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    t = np.arange(int(duration*f_s))/f_s
+    freq = np.where(t < tstart, 0, f0 + (f1 - f0)*(t - tstart)/(duration - tstart))
+
+    pcm = np.where(t < tstart, 0, amplitude*fm_tone(freq, f_s)) + rng.normal(0, noise, len(t))
+
+    ds = int(f_s/100)
+    truth = {"probetype":"AXBT", "fs":f_s, "duration":duration, "tstart":tstart, "time":t[::ds], "frequency":freq[::ds]}
+
+    return pcm, truth
+
+
+
+
+
+# =============================================================================
+#   AXCTD
+# =============================================================================
+
+#appends the 6 bit CRC to a 26 bit frame (remainder of polynomial division, see parseAXCTD.check_crc)
+def add_crc(bits):
+
+    result = list(bits) + [0]*6
+    for k in range(26):
+        if result[k]:
+            for i in range(7):
+                result[i+k] = int(result[i+k] != crc_divisor[i])
+
+    return list(bits) + result[26:]
+
+
+
+#32 bit profile frame: 10, conductivity (12 bits), temperature (12 bits), CRC
+def axctd_profile_frame(Tint, Cint):
+    return add_crc([1,0] + parse.intToBinList(int(Cint),12) + parse.intToBinList(int(Tint),12))
+
+
+
+#12 character header representation of a coefficient (mantissa and exponent, B = +, D = -)
+def axctd_coeff_hex(coeff):
+
+    if coeff == 0:
+        mantissa, exponent = 0, 0
+    else:
+        exponent = int(np.floor(np.log10(abs(coeff))))
+        mantissa = int(np.round(coeff/10**exponent*1E7))
+        if abs(mantissa) >= 1E8: #rounding carried into the next digit
+            exponent += 1
+            mantissa = int(np.round(coeff/10**exponent*1E7))
+
+    return ('B' if mantissa >= 0 else 'D') + f"{abs(mantissa):08d}" + ('B' if exponent >= 0 else 'D') + f"{abs(exponent):02d}"
+
+
+
+#72 frame (2304 bit) AXCTD header: 10, counter (8 bits), data (16 bits, 4 hex characters), CRC
+def axctd_header_bits(header=axctd_header_default):
+
+    frame_data = ['0000'] * 72
+    frame_data[4] = header["serial_no"][:4]
+    frame_data[5] = header["serial_no"][4:8]
+    frame_data[6] = header["max_depth"]
+    frame_data[7] = header["probe_code"]
+
+    #coefficients 0-3 in 3 frame groups starting at frame 21, 18, 15, 12 (depth), +12 (temperature), +24 (conductivity)
+    for (coeff, firstframe) in zip(['z','t','c'], [21,33,45]):
+        for (i,cf) in enumerate(range(firstframe,firstframe-10,-3)):
+            chex = axctd_coeff_hex(header[coeff + 'coeff'][i])
+            frame_data[cf:cf+3] = [chex[:4], chex[4:8], chex[8:]]
+
+    bits = []
+    for (counter, cdata) in enumerate(frame_data):
+        counter_bits = parse.intToBinList(counter,8) if counter < 64 else [1,1,1,1,1] + parse.intToBinList(counter-64,3)
+        data_bits = [b for c in cdata for b in parse.intToBinList(int(c,16),4)]
+        bits.extend(add_crc([1,0] + counter_bits + data_bits))
+
+    return bits
+
+
+
+#FSK modulated bitstream (1 = f1 Hz, 0 = f2 Hz), phase continuous so every bit edge is a zero crossing
+#returns PCM and the index of the first PCM point of each bit
+def axctd_fsk(bits, f_s=fs_default, bitrate=800, f1=400, f2=800):
+
+    bits = np.asarray(bits)
+    npoints = int(np.ceil(len(bits)*f_s/bitrate))
+    t = np.arange(npoints)/f_s
+    bitind = np.minimum((t*bitrate).astype(int), len(bits)-1)
+    freq = np.where(bits == 1, f1, f2)
+
+    #phase at the start of each bit is exact (not accumulated over PCM points) so it doesn't drift with the bit pattern
+    bitphase = 2*np.pi*np.append(0, np.cumsum(freq[:-1]))/bitrate
+    phase = bitphase[bitind] + 2*np.pi*freq[bitind]*(t - bitind/bitrate)
+    bitstarts = np.ceil(np.arange(len(bits))*f_s/bitrate).astype(int)
+
+    return np.sin(phase), bitstarts
+
+
+
+#complete AXCTD transmission: tstart seconds of noise, three 400 Hz pulse + header cycles (9.68 sec each),
+#then a profile of profile_duration seconds starting profile_start seconds after the first pulse with a 7500 Hz tone
+#NOTE: keep some noise- with a nearly noiseless signal demodulate.adjust_scale_factor (run on the first header) picks a scale factor that garbles later bits
+#truth: first pulse and profile start times, header contents, bitstream (header/profile bits with the PCM index of each bit),
+#and the profile frames (time after profile start, depth, encoded temperature/conductivity, 12 bit integers and hex frame)
+def axctd_signal(profile_duration=60, f_s=fs_default, tstart=2, profile_start=31, header=axctd_header_default, amplitude=10000, tone7500=2000, noise=3000, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    npoints = int((tstart + profile_start + profile_duration + 1)*f_s)
+    pcm = rng.normal(0, noise, npoints)
+
+    #400 Hz pulses and headers
+    headerbits = axctd_header_bits(header)
+    pulsebits = [1] * int(axctd_pulse_length*800)
+    header_starts = []
+    for cycle in range(axctd_num_headers):
+        s = int((tstart + cycle*axctd_cycle_length)*f_s)
+        cpcm, bitstarts = axctd_fsk(pulsebits + headerbits, f_s)
+        pcm[s:s+len(cpcm)] += amplitude*cpcm
+        header_starts.append(s + bitstarts[len(pulsebits)])
+
+    #profile: temperature/conductivity decreasing with depth (depth from the header depth coefficients)
+    tempLUT = np.asarray(parse.read_temp_LUT(cdf.resource_path('lib','DAS','temp_LUT.txt')))
+    nframes = int(profile_duration*800/32)
+    frametimes = np.arange(nframes)*32/800
+    depth = np.polyval(header["zcoeff"][::-1], frametimes)
+    temperature = 8 + 17*np.exp(-depth/200)
+    conductivity = 33.4 + 0.985*(temperature - 5) #salinity ~35 PSU
+
+    #12 bit integers for temperature (lookup table index) and conductivity (60 mS/cm full scale) before calibration
+    Tcal = np.polyval(header["tcoeff"][::-1], tempLUT[1:-2]) #first and last two entries of the table are invalid (-99)
+    Tint = 1 + np.round(np.interp(temperature, Tcal, np.arange(len(Tcal)))).astype(int)
+    Ccal = np.polyval(header["ccoeff"][::-1], np.arange(4096)*60/4096)
+    Cint = np.round(np.interp(conductivity, Ccal, np.arange(4096))).astype(int)
+
+    profilebits = [b for (cT,cC) in zip(Tint,Cint) for b in axctd_profile_frame(cT,cC)]
+    s = int((tstart + profile_start)*f_s)
+    cpcm, bitstarts = axctd_fsk(profilebits, f_s)
+    pcm[s:s+len(cpcm)] += amplitude*cpcm + tone7500*np.sin(2*np.pi*7500*np.arange(len(cpcm))/f_s)
+
+    truth = {"probetype":"AXCTD", "fs":f_s, "duration":npoints/f_s, "firstpulsetime":tstart, "profilestarttime":tstart + profile_start,
+        "header":header, "headerbits":headerbits, "headerstarts":header_starts, "profilebits":profilebits, "profilebitstarts":bitstarts + s,
+        "time":frametimes, "depth":depth, "temperature":np.polyval(header["tcoeff"][::-1], tempLUT[Tint]), "conductivity":np.polyval(header["ccoeff"][::-1], Cint*60/4096),
+        "Tint":Tint, "Cint":Cint, "frames":[parse.binListToHex(profilebits[i:i+32]) for i in range(0,len(profilebits),32)]}
+
+    return pcm, truth
+
+
+
+
+
+# =============================================================================
+#   AXCP
+# =============================================================================
+
+#AXCP transmission: compass coil (fcc Hz), EF/velocity (fef Hz) and temperature (fte Hz) FM carriers. The probe
+#spins up at tspinup seconds, after which the compass coil and EF carriers are modulated at the rotation rate frot Hz
+#(deviations ccdev and efdev Hz, EF phase lagging the compass coil by efphase radians)
+#truth: time and rotation rate every 0.01 sec, spinup time, carrier frequencies
+def axcp_signal(duration=60, f_s=fs_default, tspinup=6, frot=16, fcc=2250, fef=1250, fte=380, ccdev=60, efdev=3, efphase=0.5, amplitude=8000, noise=100, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    t = np.arange(int(duration*f_s))/f_s
+    rotation = np.where(t < tspinup, 0, frot)
+    rphase = 2*np.pi*np.cumsum(rotation)/f_s
+
+    compass = fm_tone(fcc + np.where(t < tspinup, 0, ccdev*np.cos(rphase)), f_s)
+    ef = fm_tone(fef + np.where(t < tspinup, 0, efdev*np.cos(rphase + efphase)), f_s)
+    temp = fm_tone(fte*np.ones(len(t)), f_s)
+
+    pcm = amplitude*(compass + ef + temp) + rng.normal(0, noise, len(t))
+
+    ds = int(f_s/100)
+    truth = {"probetype":"AXCP", "fs":f_s, "duration":duration, "tspinup":tspinup, "time":t[::ds], "rotation":rotation[::ds], "fcc":fcc, "fef":fef, "fte":fte}
+
+    return pcm, truth
+
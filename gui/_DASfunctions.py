@@ -23,9 +23,8 @@ from platform import system as cursys
 import os
 from traceback import print_exc as trace_error
 
-from PyQt5.QtWidgets import (QLineEdit, QLabel, QSpinBox, QPushButton, QWidget, QFileDialog, QComboBox, QGridLayout, QDoubleSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QProgressBar, QApplication, QMessageBox, QVBoxLayout)
+from PyQt5.QtWidgets import (QLineEdit, QLabel, QSpinBox, QPushButton, QWidget, QFileDialog, QComboBox, QGridLayout, QDoubleSpinBox, QTableView, QAbstractItemView, QHeaderView, QProgressBar, QApplication, QMessageBox, QVBoxLayout)
 from PyQt5.QtCore import QObjectCleanupHandler, Qt, pyqtSlot, pyqtSignal, QObject
-from PyQt5.QtGui import QColor
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
@@ -39,16 +38,18 @@ import wave
 import pyaudio
 import importlib #to refresh pyaudio import for updated connections
 
-from gsw import SP_from_C #conductivity-to-salinity conversion
-
-import lib.DAS.DAS_AXBT as das_axbt 
-import lib.DAS.DAS_AXCTD as das_axctd
-import lib.DAS.DAS_AXCP as das_axcp
+import lib.DAS.DAS_outputs as das_out
 from lib.DAS.common_DAS_functions import channelandfrequencylookup, list_receivers
 import lib.GPS_COM_interaction as gps
 
 from ._globalfunctions import (addnewtab, whatTab, renametab, setnewtabcolor, closecurrenttab, savedataincurtab, postwarning, posterror, postwarning_option, closeEvent, parsestringinputs)
 from ._PEfunctions import continuetoqc
+from ._DAStable import DASTableModel, NODATA, PULSE, GOOD
+from ._DASplot import LiveProfilePlot
+from ._lazyimport import qtproc #processors are imported when the first one is started
+
+
+plotrefreshinterval = 0.5 #minimum seconds between live profile plot updates in DAS tabs
 
             
 # =============================================================================
@@ -65,7 +66,7 @@ def makenewprocessortab(self):
         self.setnewtabcolor(self.alltabdata[opentab]["tab"])
         
         #initializing raw data storage
-        self.alltabdata[opentab]["rawdata"] = {"temperature":np.array([]), "depth":np.array([]), "conductivity":np.array([]), "salinity":np.array([]), "Umag":np.array([]), "Vmag":np.array([]), "Utrue":np.array([]), "Vtrue":np.array([]), "frequency":np.array([]), "frotdev":np.array([]), "time":np.array([]), "frame":[], "starttime":0, "istriggered":False, "firstpointtime":-1, "firstpulsetime":-1}
+        self.alltabdata[opentab]["rawdata"] = das_out.new_rawdata()
         
         self.alltabdata[opentab]["tablayout"].setSpacing(10)
 
@@ -85,6 +86,7 @@ def makenewprocessortab(self):
         #making profile processing result plots
         self.alltabdata[opentab]["ProcAxes"] = [plt.axes()]
         self.alltabdata[opentab]["ProcAxes"].append(self.alltabdata[opentab]["ProcAxes"][0].twiny())
+        self.alltabdata[opentab]["liveplot"] = LiveProfilePlot(self.alltabdata[opentab]["ProcessorCanvas"], self.alltabdata[opentab]["ProcAxes"]) #profile lines (see _DASplot.py)
         
         #and add new buttons and other widgets
         self.alltabdata[opentab]["tabwidgets"] = {}
@@ -176,7 +178,9 @@ def makenewprocessortab(self):
             self.alltabdata[opentab]["tablayout"].addWidget(self.alltabdata[opentab]["tabwidgets"][i],r,c,re,ce)
         
         #adding table widget after all other buttons populated
-        self.alltabdata[opentab]["tabwidgets"]["table"] = QTableWidget() #19
+        self.alltabdata[opentab]["tabwidgets"]["table"] = QTableView() #19
+        self.alltabdata[opentab]["tablemodel"] = DASTableModel() #table data (see _DAStable.py)
+        self.alltabdata[opentab]["tabwidgets"]["table"].setModel(self.alltabdata[opentab]["tablemodel"])
         self.alltabdata[opentab]["tablayout"].addWidget(self.alltabdata[opentab]["tabwidgets"]["table"],9,2,2,7)
         self.alltabdata[opentab]["tabwidgets"]["tableheader"] = self.alltabdata[opentab]["tabwidgets"]["table"].horizontalHeader() 
         self.alltabdata[opentab]["tabwidgets"]["tableheader"].setFont(self.labelfont)
@@ -235,6 +239,7 @@ def prep_graph_and_table(self, probetype, plottabnum):
         self.alltabdata[plottabnum]["ProcAxes"][1].set_visible(False)
         linecolors = ['k']
         linenames = ['Temperature']
+        lineaxes = [0]
         
     else:
     
@@ -243,11 +248,13 @@ def prep_graph_and_table(self, probetype, plottabnum):
             xcolor = "blue"
             linecolors = ['r','b']
             linenames = ['Temperature','Salinity']
+            lineaxes = [0,1]
         elif probetype.upper() == "AXCP":
             self.alltabdata[plottabnum]["ProcAxes"][1].set_xlabel('Current (m/s)', fontsize=12)
             xcolor = "black"
             linecolors = ['r','b','g']
             linenames = ['Temperature','U','V']
+            lineaxes = [0,1,1]
             
         self.alltabdata[plottabnum]["ProcAxes"][1].set_visible(True)
         self.alltabdata[plottabnum]["ProcAxes"][0].xaxis.label.set_color("red") #temperature axis red
@@ -259,37 +266,49 @@ def prep_graph_and_table(self, probetype, plottabnum):
     custom_lines = [Line2D([0], [0], color=curcolor, lw=2) for curcolor in linecolors]
     l = self.alltabdata[plottabnum]["ProcAxes"][0].legend(custom_lines, linenames, loc='lower right')
     l.set_zorder(90)
+    
+    #persistent profile lines, updated as data is received
+    self.alltabdata[plottabnum]["liveplot"].set_lines(lineaxes, linecolors, overlays=[l])
         
     self.config_graph_ticks_lims(plottabnum, probetype)
     self.alltabdata[plottabnum]["ProcessorFig"].set_tight_layout(True)
     self.alltabdata[plottabnum]["ProcessorCanvas"].draw() #refresh plots on window
         
     
-    self.alltabdata[plottabnum]["tabwidgets"]["table"].setColumnCount(6)
-    self.alltabdata[plottabnum]["tabwidgets"]["table"].setRowCount(0) 
+    self.alltabdata[plottabnum]["tablemodel"].set_probetype(probetype) #clears the table, sets columns for probe type
     self.alltabdata[plottabnum]["tabwidgets"]["table"].setFont(self.labelfont)
     self.alltabdata[plottabnum]["tabwidgets"]["table"].verticalHeader().setVisible(False)
     self.alltabdata[plottabnum]["tabwidgets"]["table"].setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff) #removes scroll bars
     
-    #table columns
-    if probetype == "AXBT":
-        self.alltabdata[plottabnum]["tabwidgets"]["table"].setHorizontalHeaderLabels(('Time (s)', 'Fp (Hz)', 'Sp (dB)', 'Rp (%)' ,'Depth (m)','Temp (C)'))
-    elif probetype == "AXCTD":
-        self.alltabdata[plottabnum]["tabwidgets"]["table"].setHorizontalHeaderLabels(('Time (s)', 'R-400 Hz', 'R-7500 Hz', 'Depth (m)','Temp. (C)', 'Sal. (PSU)'))
-    elif probetype == "AXCP":
-        self.alltabdata[plottabnum]["tabwidgets"]["table"].setHorizontalHeaderLabels(('Time (s)', 'Rotation (Hz/σ)',  'Depth (m)','Temp. (C)', 'U (m/s)', 'V (m/s)'))
-        
-    
     for ii in range(0,6): #building table
         self.alltabdata[plottabnum]["tabwidgets"]["tableheader"].setSectionResizeMode(ii, QHeaderView.Stretch)  
-        self.alltabdata[plottabnum]["tabwidgets"]["table"].setEditTriggers(QTableWidget.NoEditTriggers)
+        self.alltabdata[plottabnum]["tabwidgets"]["table"].setEditTriggers(QAbstractItemView.NoEditTriggers)
         
     if probetype.upper() == "AXCP":
         #don't push warnings for bad lat/lon/date, just attempt to update title
         self.pull_drop_coords_update(False) 
         
+
+
+#updates the profile lines with the current data (only redraws the full figure if the axis limits changed)
+def update_DAS_plot(self, plottabnum, probetype):
+    
+    rawdata = self.alltabdata[plottabnum]["rawdata"]
+    if probetype == "AXBT":
+        xdata = [rawdata["temperature"]]
+    elif probetype == "AXCTD":
+        xdata = [rawdata["temperature"], rawdata["salinity"]]
+    elif probetype == "AXCP":
+        xdata = [rawdata["temperature"], rawdata["Umag"], rawdata["Vmag"]]
         
-#determining ideal axis limits and configuring limits/grids for data
+    self.alltabdata[plottabnum]["liveplot"].set_data(xdata, rawdata["depth"])
+    limschanged = self.config_graph_ticks_lims(plottabnum, probetype)
+    self.alltabdata[plottabnum]["liveplot"].refresh(redraw=limschanged)
+    self.alltabdata[plottabnum]["date_plot_updated"] = dt.datetime.utcnow()
+    
+    
+        
+#determining ideal axis limits and configuring limits/grids for data, returns True if any axis limits were changed
 def config_graph_ticks_lims(self, plottabnum, probetype):
     
     #hard-coded graph settings
@@ -330,13 +349,16 @@ def config_graph_ticks_lims(self, plottabnum, probetype):
     if np.max(ctemps) > templims[1]:
         templims[1] = np.ceil(np.max(ctemps)/tsint)*tsint
     
-    #setting axis limits for temperature, depth
+    #setting axis limits for temperature, depth (depth axis inverted)
+    limschanged = False
+    depthlims = depthlims[::-1]
     if not np.all(cTlims == templims):
         self.alltabdata[plottabnum]["ProcAxes"][0].set_xlim(templims)
+        limschanged = True
     if not np.all(cDlims == depthlims):
         self.alltabdata[plottabnum]["ProcAxes"][0].set_ylim(depthlims)
+        limschanged = True
     self.alltabdata[plottabnum]["ProcAxes"][0].grid(visible=True, which='major', axis='both')
-    self.alltabdata[plottabnum]["ProcAxes"][0].invert_yaxis() 
     
     if probetype != "AXBT": #other two probes share some common plot setup code
         if probetype == "AXCTD": #determining/setting axis limits for salinity as well for AXCTDs only
@@ -346,6 +368,7 @@ def config_graph_ticks_lims(self, plottabnum, probetype):
                 psallims[1] = np.ceil(np.max(cpsal)/tsint)*tsint
             if not np.all(psallims == cSlims):
                 self.alltabdata[plottabnum]["ProcAxes"][1].set_xlim(psallims)
+                limschanged = True
         
         elif probetype == "AXCP": #axis limits for current- equal on both sides and fxn of total velocity
             if np.max(cvel) > currentlims[1]:
@@ -354,14 +377,17 @@ def config_graph_ticks_lims(self, plottabnum, probetype):
                 currentlims = np.array([-2,2])
             if not np.all(currentlims == cClims):
                 self.alltabdata[plottabnum]["ProcAxes"][1].set_xlim(currentlims)
+                limschanged = True
         
-        if not np.all(cDlims == depthlims):
+        if not np.all(self.alltabdata[plottabnum]["ProcAxes"][1].get_ylim() == depthlims):
             self.alltabdata[plottabnum]["ProcAxes"][1].set_ylim(depthlims)
-        self.alltabdata[plottabnum]["ProcAxes"][1].invert_yaxis()
+            limschanged = True
         
         self.alltabdata[plottabnum]["ProcAxes"][1].grid(visible=False, which='major', axis='both')
         self.alltabdata[plottabnum]["ProcAxes"][0].grid(visible=True, which='major', axis='both')
         
+    return limschanged
+        
         
     
     
@@ -625,26 +651,16 @@ def updateDASsettings(self):
     try:
         
         #pulling settings from settingsdict into specialized dicts to be passed to DAS threads
-        newaxbtsettings = {}
-        axbtsettingstopull = ["fftwindow", "minfftratio", "minsiglev", "triggerfftratio", "triggersiglev", "tcoeff_axbt", "zcoeff_axbt", "flims_axbt"]
-        newaxctdsettings = {}
-        axctdsettingstopull = ["minr400", "mindr7500", "deadfreq", "refreshrate", "mark_space_freqs", "usebandpass", "zcoeff_axctd", "tcoeff_axctd", "ccoeff_axctd", "tlims_axctd", "slims_axctd"]
-        newaxcpsettings = {}
-        axcpsettingstopull = ['cprefreshrate', 'axcpquality', 'spindowndetectrt', 'cptempmode', 'cpfftwindow', 'revcoil', "spinupfrotmax", "spindownfrotmax"]
-        
-        for csetting in axbtsettingstopull:
-            newaxbtsettings[csetting] = self.settingsdict[csetting]
-        for csetting in axctdsettingstopull:
-            newaxctdsettings[csetting] = self.settingsdict[csetting]
-        for csetting in axcpsettingstopull:
-            newaxcpsettings[csetting] = self.settingsdict[csetting]
+        newaxbtsettings = das_out.get_processor_settings(self.settingsdict, 'AXBT')
+        newaxctdsettings = das_out.get_processor_settings(self.settingsdict, 'AXCTD')
+        newaxcpsettings = das_out.get_processor_settings(self.settingsdict, 'AXCP')
             
         
         #updates DAS settings for any active tabs
         for ctab in range(len(self.alltabdata)): #dont want to iterate over tabs, need to edit alltabdata list
             if self.alltabdata[ctab]["isprocessing"]: 
-                if self.alltabdata[ctab]['probetype'] == 'AXBT':
-                    self.alltabdata[ctab]["processor"].changethresholds(newaxbtsettings)
+                if self.alltabdata[ctab]['probetype'] == 'AXBT': #regenerates the profile if thresholds/coefficients changed
+                    self.alltabdata[ctab]["processor"].reevaluate_profile(newaxbtsettings)
                 elif self.alltabdata[ctab]['probetype'] == 'AXCTD':
                     self.alltabdata[ctab]["processor"].changethresholds(newaxctdsettings)
                 elif self.alltabdata[ctab]['probetype'] == 'AXCP':
@@ -793,6 +809,10 @@ def runprocessor(self, opentab, datasource, sourcetype):
             self.alltabdata[opentab]["tabwidgets"]["audioprogressbar"], 8, 2, 1, 7)
         self.alltabdata[opentab]["tabwidgets"]["audioprogressbar"].setValue(0)
         QApplication.processEvents()
+    elif "processorlag" not in self.alltabdata[opentab]["tabwidgets"]: #build processing lag label (realtime/test)
+        self.alltabdata[opentab]["tabwidgets"]["processorlag"] = QLabel('')
+        self.alltabdata[opentab]["tablayout"].addWidget(
+            self.alltabdata[opentab]["tabwidgets"]["processorlag"], 8, 2, 1, 7)
         
     if sourcetype == 'AA' or probetype.upper() != 'AXBT':
         #disable start button (once you stop reprocessing from audio file you can't restart)
@@ -816,33 +836,39 @@ def runprocessor(self, opentab, datasource, sourcetype):
         datasource_toThread = sourcetype + datasource #append receiver ID (2 characters) and serial number
         
     
-    settings = {} #pulling settings required for processor thread, dependent on probe type
-    if probetype == 'AXBT':
-        settingstopull = ["fftwindow", "minfftratio", "minsiglev", "triggerfftratio", "triggersiglev", "tcoeff_axbt", "zcoeff_axbt", "flims_axbt"]
-    elif probetype == 'AXCTD':
-        settingstopull = ["minr400", "mindr7500", "deadfreq", "refreshrate", "mark_space_freqs", "usebandpass", "zcoeff_axctd", "tcoeff_axctd", "ccoeff_axctd", "tlims_axctd", "slims_axctd"]
-    elif probetype == 'AXCP':
-        settingstopull = ['cprefreshrate', 'axcpquality', 'spindowndetectrt', 'cptempmode', 'cpfftwindow', 'revcoil', "spinupfrotmax", "spindownfrotmax"]
-        
-    for csetting in settingstopull:
-        settings[csetting] = self.settingsdict[csetting]
+    #pulling settings required for processor thread, dependent on probe type
+    settings = das_out.get_processor_settings(self.settingsdict, probetype)
     
     #initializing processor, connecting signals/slots to GUI thread
+    #processor arguments after the datasource/receiver info, by probe type
     if probetype == "AXBT":
-        self.alltabdata[opentab]["processor"] = das_axbt.AXBTProcessor(self.dll, datasource_toThread, vhffreq, tabID,  starttime, self.alltabdata[opentab]["rawdata"]["istriggered"], self.alltabdata[opentab]["rawdata"]["firstpointtime"], settings, self.tempdir)
+        procargs = [starttime, self.alltabdata[opentab]["rawdata"]["istriggered"], self.alltabdata[opentab]["rawdata"]["firstpointtime"], settings, self.tempdir]
+        prockwargs = {}
     elif probetype == "AXCTD":
-        self.alltabdata[opentab]["processor"] = das_axctd.AXCTDProcessor(self.dll, datasource_toThread, vhffreq, tabID,  starttime, self.alltabdata[opentab]["rawdata"]["istriggered"], self.alltabdata[opentab]["rawdata"]["firstpointtime"], self.alltabdata[opentab]["rawdata"]["firstpulsetime"], settings, self.tempdir)
+        procargs = [starttime, self.alltabdata[opentab]["rawdata"]["istriggered"], self.alltabdata[opentab]["rawdata"]["firstpointtime"], self.alltabdata[opentab]["rawdata"]["firstpulsetime"], settings, self.tempdir]
+        prockwargs = {}
     elif probetype == "AXCP": 
         latsend,lonsend,datesend = self.pull_drop_coords_update(False) #for AXCP only, update lat/lon/date
-        self.alltabdata[opentab]["processor"] = das_axcp.AXCPProcessor(self.dll, datasource_toThread, vhffreq, tabID,  starttime, status=self.alltabdata[opentab]["rawdata"]["istriggered"], triggertime=self.alltabdata[opentab]["rawdata"]["firstpointtime"], lat=latsend, lon=lonsend, dropdate=datesend, settings=settings, tempdir=self.tempdir)
+        procargs = [starttime]
+        prockwargs = {"status":self.alltabdata[opentab]["rawdata"]["istriggered"], "triggertime":self.alltabdata[opentab]["rawdata"]["firstpointtime"], "lat":latsend, "lon":lonsend, "dropdate":datesend, "settings":settings, "tempdir":self.tempdir}
+        
+    if self.settingsdict["useprocesses"]: #processor runs in its own process (receiver audio is passed through shared memory)
+        self.alltabdata[opentab]["processor"] = qtproc.RemoteProcessor(probetype, self.dll, datasource_toThread, vhffreq, tabID, *procargs, **prockwargs)
+    else:
+        self.alltabdata[opentab]["processor"] = qtproc.processors[probetype](self.dll, datasource_toThread, vhffreq, tabID, *procargs, **prockwargs)
+    
+    self.alltabdata[opentab]["reevaluations"] = 0 #AXBT profile reevaluations received (see replace_AXBT_profile)
     
     #connecting signals to GUI functions (e.g. updating the graph and table with new data)
     self.alltabdata[opentab]["processor"].signals.failed.connect(self.failedWRmessage) #this signal only for actual processing tabs (not example tabs)
     self.alltabdata[opentab]["processor"].signals.iterated.connect(self.updateUIinfo)
     self.alltabdata[opentab]["processor"].signals.triggered.connect(self.triggerUI)
     self.alltabdata[opentab]["processor"].signals.terminated.connect(self.updateUIfinal)
+    self.alltabdata[opentab]["processor"].signals.updatestats.connect(self.updateprocessorstats)
     
-    if probetype == "AXCP": #connecting AXCP specific signals to slots in GUI code
+    if probetype == "AXBT": #connecting AXBT specific signal to slot in GUI code
+        self.alltabdata[opentab]["processor"].signals.reevaluated.connect(self.replace_AXBT_profile)
+    elif probetype == "AXCP": #connecting AXCP specific signals to slots in GUI code
         self.alltabdata[opentab]["processor"].signals.emit_profile_update.connect(self.replace_AXCP_profiles)
         self.alltabdata[opentab]["processor"].signals.update_spindown_index.connect(self.truncate_AXCP_profiles)
     
@@ -1008,9 +1034,10 @@ def triggerUI(self,tabID,event,eventtime):
 
         
         
-#slot to pass AXBT data from thread to main GUI
+#slot to pass data from thread to main GUI
+#batch: list of the data emitted by the processor since the last update (see CoalescingSignals in qt_processors.py)
 @pyqtSlot(int,list)
-def updateUIinfo(self,tabID,data):
+def updateUIinfo(self,tabID,batch):
     try:        
         
         plottabnum = self.gettabnumfromID(tabID)
@@ -1020,29 +1047,25 @@ def updateUIinfo(self,tabID,data):
             probetype = self.alltabdata[plottabnum]["probetype"]
             
             #appending data to current tab's list, plotting, generating table entries (probe type dependent)
-            if probetype == "AXBT":
-                curcolors, table_data = self.update_AXBT_DAS(plottabnum, data, False)
-            elif probetype == "AXCTD":
-                curcolors, table_data = self.update_AXCTD_DAS(plottabnum, data, False)
-            elif probetype == "AXCP":
-                curcolors, table_data = self.update_AXCP_DAS(plottabnum, data, False)
+            rowstatus = []
+            table_data = []
+            for data in batch:
+                if probetype == "AXBT":
+                    if data[6] < self.alltabdata[plottabnum]["reevaluations"]: #sent before the profile was reevaluated (and included in it)
+                        continue
+                    crowstatus, ctable_data = self.update_AXBT_DAS(plottabnum, data, False)
+                elif probetype == "AXCTD":
+                    crowstatus, ctable_data = self.update_AXCTD_DAS(plottabnum, data, False)
+                elif probetype == "AXCP":
+                    crowstatus, ctable_data = self.update_AXCP_DAS(plottabnum, data, False)
+                rowstatus.extend(crowstatus)
+                table_data.extend(ctable_data)
                 
                 
-            #updating table
-            table = self.alltabdata[plottabnum]["tabwidgets"]["table"]
-            
-            for curcolor,current_row_data in zip(curcolors,table_data):
-                crow = table.rowCount()
-                table.insertRow(crow)
-                
-                for cind,cdata in enumerate(current_row_data):
-                    curtableobject = QTableWidgetItem(str(cdata))
-                    curtableobject.setBackground(curcolor)
-                    table.setItem(crow, cind, curtableobject)
-                    
-            table.scrollToBottom()
-            #        if crow > 20: #uncomment to remove old rows
-            #            table.removeRow(0)
+            #updating table once per batch (rows are formatted by the table model when they are displayed)
+            if len(table_data) > 0:
+                self.alltabdata[plottabnum]["tablemodel"].append_rows(table_data, rowstatus)
+                self.alltabdata[plottabnum]["tabwidgets"]["table"].scrollToBottom()
             
     except Exception:
         trace_error()
@@ -1051,7 +1074,7 @@ def updateUIinfo(self,tabID,data):
         
 def update_AXBT_DAS(self, plottabnum, data, interval_override):
     
-    #pulling data from list- organized as [temperature, depth, frequency, Sp, Rp, time]
+    #pulling data from list- organized as [temperature, depth, frequency, Sp, Rp, time, reevaluations]
     ctemp = data[0]
     cdepth = data[1]
     cfreq = data[2]
@@ -1066,50 +1089,27 @@ def update_AXBT_DAS(self, plottabnum, data, interval_override):
         
     
     #initialize in case depths match
-    curcolor = []
+    rowstatus = []
     table_data = []
         
     #only appending a datapoint if depths are different
     if cdepth != lastdepth or interval_override:
         #writing data to tab dictionary
-        self.alltabdata[plottabnum]["rawdata"]["time"] = np.append(self.alltabdata[plottabnum]["rawdata"]["time"],ctime)
-        self.alltabdata[plottabnum]["rawdata"]["depth"] = np.append(self.alltabdata[plottabnum]["rawdata"]["depth"],cdepth)
-        self.alltabdata[plottabnum]["rawdata"]["frequency"] = np.append(self.alltabdata[plottabnum]["rawdata"]["frequency"],cfreq)
-        self.alltabdata[plottabnum]["rawdata"]["temperature"] = np.append(self.alltabdata[plottabnum]["rawdata"]["temperature"],ctemp)
+        self.alltabdata[plottabnum]["rawdata"].append({"time":ctime, "depth":cdepth, "frequency":cfreq, "temperature":ctemp})
 
         #plot the most recent point
         cdt = dt.datetime.utcnow()
-        if self.alltabdata[plottabnum]["rawdata"]["istriggered"] and ((cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= 5 or interval_override):
-            try:
-                del self.alltabdata[plottabnum]["ProcAxes"][0].lines[-1]
-            except IndexError:
-                pass
-                
-            self.alltabdata[plottabnum]["ProcAxes"][0].plot(self.alltabdata[plottabnum]["rawdata"]["temperature"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='k')
-            self.alltabdata[plottabnum]["ProcessorCanvas"].draw()
-            self.config_graph_ticks_lims(plottabnum, "AXBT")
-            self.alltabdata[plottabnum]["date_plot_updated"] = cdt
+        if self.alltabdata[plottabnum]["rawdata"]["istriggered"] and ((cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= plotrefreshinterval or interval_override):
+            self.update_DAS_plot(plottabnum, "AXBT")
             
             
         #coloring new cell based on whether or not it has good data
-        if np.isnan(ctemp):
-            ctemp = '------'
-            if np.isnan(cdepth):
-                cdepth = ctemp
-            curcolor.append(QColor(200, 200, 200)) #light gray
-        else:
-            curcolor.append(QColor(204, 255, 220)) #light green
-            if type(ctime) != list: #updateUIfinal sends empty lists for each value
-                cfreq = f'{cfreq:7.2f}'
-                cdepth = f'{cdepth:4.2f}'
-                ctemp = f'{ctemp:4.2f}'
-            
-        # table_data.append([ctime,cfreq, cact, cratio, cdepth, ctemp])
         if type(ctime) != list: #updateUIfinal sends empty lists for each value
-            table_data.append([f'{ctime:4.2f}', cfreq, f'{cact:4.1f}', f'{cratio:4.1f}', cdepth, ctemp])
+            rowstatus.append(NODATA if np.isnan(ctemp) else GOOD) #light gray or light green
+            table_data.append([ctime, cfreq, cact, cratio, cdepth, ctemp])
         
         
-    return curcolor, table_data
+    return rowstatus, table_data
     
     
     
@@ -1139,51 +1139,30 @@ def update_AXCTD_DAS(self, plottabnum, data, interval_override):
     #only appending a datapoint if depths are different
     if self.alltabdata[plottabnum]["rawdata"]["istriggered"] == 2:
         #writing data to tab dictionary
-        self.alltabdata[plottabnum]["rawdata"]["time"] = np.append(self.alltabdata[plottabnum]["rawdata"]["time"], newtime)
-        self.alltabdata[plottabnum]["rawdata"]["depth"] = np.append(self.alltabdata[plottabnum]["rawdata"]["depth"], newdepth)
-        self.alltabdata[plottabnum]["rawdata"]["temperature"] = np.append(self.alltabdata[plottabnum]["rawdata"]["temperature"], newtemp)
-        self.alltabdata[plottabnum]["rawdata"]["conductivity"] = np.append(self.alltabdata[plottabnum]["rawdata"]["conductivity"], newcond)
-        self.alltabdata[plottabnum]["rawdata"]["salinity"] = np.append(self.alltabdata[plottabnum]["rawdata"]["salinity"], newpsal)
-        self.alltabdata[plottabnum]["rawdata"]["frame"].extend(newframe)
+        self.alltabdata[plottabnum]["rawdata"].append({"time":newtime, "depth":newdepth, "temperature":newtemp, "conductivity":newcond, "salinity":newpsal, "frame":newframe})
         
 
         #plot the most recent point
         cdt = dt.datetime.utcnow()
-        if (cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= 5 or interval_override:
-            try:
-                del self.alltabdata[plottabnum]["ProcAxes"][0].lines[-1]
-                del self.alltabdata[plottabnum]["ProcAxes"][1].lines[-1]
-            except IndexError: #if nothing has been plotted, trying to delete the lines from the plot raises IndexError
-                pass
-                
-            #plotting and updating
-            self.alltabdata[plottabnum]["ProcAxes"][0].plot(self.alltabdata[plottabnum]["rawdata"]["temperature"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='r')
-            self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["salinity"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='b')
-            self.alltabdata[plottabnum]["ProcessorCanvas"].draw()
-            self.config_graph_ticks_lims(plottabnum, "AXCTD")
-            self.alltabdata[plottabnum]["date_plot_updated"] = cdt
+        if (cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= plotrefreshinterval or interval_override:
+            self.update_DAS_plot(plottabnum, "AXCTD")
             
 
     #coloring new cells based on whether or not it has good data, prepping data to append to table
-    curcolor = []
+    rowstatus = []
     table_data = []
     for (ctime, cr400, cr7500, cdepth, ctemp, cpsal) in zip(newtime, newr400, newr7500, newdepth, newtemp, newpsal):
         if triggerstatus <= 1 or np.isnan(ctemp*cpsal):
-            ctemp = cpsal = cdepth = '------'
             if triggerstatus == 1: #must = 1, therefore in 400 Hz pulse detection phase
-                curcolor.append(QColor(204, 220, 255)) #light blue
+                rowstatus.append(PULSE) #light blue
             else: #nothing detected yet
-                curcolor.append(QColor(200, 200, 200)) #light gray (less than 1 or greater than 1 with interference)
+                rowstatus.append(NODATA) #light gray (less than 1 or greater than 1 with interference)
         else: #active profile collection
-            curcolor.append(QColor(204, 255, 220)) #light green
-            cdepth = f'{cdepth:4.2f}'
-            ctemp = f'{ctemp:4.2f}'
-            cpsal = f'{cpsal:4.2f}'
+            rowstatus.append(GOOD) #light green
         
-        # table_data.append([ctime, cr400, cr7500, cdepth, ctemp, cpsal])
-        table_data.append([f'{ctime:4.2f}', f'{cr400:4.2f}', f'{cr7500:4.2f}', cdepth, ctemp, cpsal])
+        table_data.append([ctime, cr400, cr7500, cdepth, ctemp, cpsal])
     
-    return curcolor, table_data
+    return rowstatus, table_data
   
         
         
@@ -1213,62 +1192,63 @@ def update_AXCP_DAS(self, plottabnum, data, interval_override):
     #only appending a datapoint if depths are different
     if status:
         #writing data to tab dictionary
-        self.alltabdata[plottabnum]["rawdata"]["time"] = np.append(self.alltabdata[plottabnum]["rawdata"]["time"], newtime)
-        self.alltabdata[plottabnum]["rawdata"]["frequency"] = np.append(self.alltabdata[plottabnum]["rawdata"]["frequency"], newfrot)
-        self.alltabdata[plottabnum]["rawdata"]["frotdev"] = np.append(self.alltabdata[plottabnum]["rawdata"]["frotdev"], newfrotrms)
-        self.alltabdata[plottabnum]["rawdata"]["depth"] = np.append(self.alltabdata[plottabnum]["rawdata"]["depth"], newdepth)
-        self.alltabdata[plottabnum]["rawdata"]["temperature"] = np.append(self.alltabdata[plottabnum]["rawdata"]["temperature"], newtemp)
-        self.alltabdata[plottabnum]["rawdata"]["Umag"] = np.append(self.alltabdata[plottabnum]["rawdata"]["Umag"], newUmag)
-        self.alltabdata[plottabnum]["rawdata"]["Vmag"] = np.append(self.alltabdata[plottabnum]["rawdata"]["Vmag"], newVmag)
-        self.alltabdata[plottabnum]["rawdata"]["Utrue"] = np.append(self.alltabdata[plottabnum]["rawdata"]["Utrue"], newUtrue)
-        self.alltabdata[plottabnum]["rawdata"]["Vtrue"] = np.append(self.alltabdata[plottabnum]["rawdata"]["Vtrue"], newVtrue)
+        self.alltabdata[plottabnum]["rawdata"].append({"time":newtime, "frequency":newfrot, "frotdev":newfrotrms, "depth":newdepth, "temperature":newtemp, "Umag":newUmag, "Vmag":newVmag, "Utrue":newUtrue, "Vtrue":newVtrue})
         
 
         #plot the most recent point
         cdt = dt.datetime.utcnow()
-        if (cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= 5 or interval_override:
-            try:
-                del self.alltabdata[plottabnum]["ProcAxes"][0].lines[-1]
-                del self.alltabdata[plottabnum]["ProcAxes"][1].lines[-2:]
-            except IndexError: #if nothing has been plotted, trying to delete the lines from the plot raises IndexError
-                pass
-                
-            #plotting and updating
-            self.alltabdata[plottabnum]["ProcAxes"][0].plot(self.alltabdata[plottabnum]["rawdata"]["temperature"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='r')
-            self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Umag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='b')
-            self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Vmag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='g')
-            self.config_graph_ticks_lims(plottabnum, "AXCP")
-            self.alltabdata[plottabnum]["ProcessorCanvas"].draw()
-            self.alltabdata[plottabnum]["date_plot_updated"] = cdt
+        if (cdt - self.alltabdata[plottabnum]["date_plot_updated"]).total_seconds() >= plotrefreshinterval or interval_override:
+            self.update_DAS_plot(plottabnum, "AXCP")
             
 
     #coloring new cells based on whether or not it has good data, prepping data to append to table
-    curcolor = []
+    rowstatus = []
     table_data = []
     for (ctime, cfrot, cfrotrms, cdepth, ctemp, cUmag, cVmag) in zip(newtime, newfrot, newfrotrms, newdepth, newtemp, newUmag, newVmag):
             
-        if np.isnan(cdepth):
-            ctemp = cUmag = cVmag = cdepth = '------'
-        else:
-            cdepth = f'{cdepth:4.2f}'
-            ctemp = f'{ctemp:4.2f}'
-            cUmag = f'{cUmag:5.3f}'
-            cVmag = f'{cVmag:5.3f}'
-            
         if status: 
-            curcolor.append(QColor(204, 255, 220)) #light green
+            rowstatus.append(GOOD) #light green
         else: #nothing detected yet
-            curcolor.append(QColor(200, 200, 200)) #light gray 
+            rowstatus.append(NODATA) #light gray 
 
-        # table_data.append([ctime, str(cfrot)+' / '+str(cfrotrms), cdepth, ctemp, cUmag, cVmag])
-        table_data.append([f'{ctime:4.2f}', f'{cfrot:5.2f}/{cfrotrms:5.2f}', cdepth, ctemp, cUmag, cVmag])
+        table_data.append([ctime, cfrot, cfrotrms, cdepth, ctemp, cUmag, cVmag])
     
-    return curcolor, table_data
+    return rowstatus, table_data
     
     
     
     
     
+#replacing the AXBT profile, table, and plot after the DAS reevaluates it with new settings
+#data: [istriggered, firstpointtime, temperatures, depths, frequencies, Sps, Rps, times, reevaluations]
+#points sent before the reevaluation that are still queued for updateUIinfo are dropped (they are part of the new profile)
+@pyqtSlot(int, list)
+def replace_AXBT_profile(self, tabID, data):
+    try:
+        plottabnum = self.gettabnumfromID(tabID)
+        
+        self.alltabdata[plottabnum]["rawdata"]["istriggered"] = data[0]
+        self.alltabdata[plottabnum]["rawdata"]["firstpointtime"] = data[1]
+        self.alltabdata[plottabnum]["reevaluations"] = data[8]
+        self.alltabdata[plottabnum]["rawdata"].truncate(0, keys=["time", "depth", "frequency", "temperature"])
+            
+        #rebuilding the table and profile from each point (same as when each point was received)
+        table = self.alltabdata[plottabnum]["tabwidgets"]["table"]
+        table.setUpdatesEnabled(False)
+        self.alltabdata[plottabnum]["tablemodel"].clear()
+        self.updateUIinfo(tabID, [list(cdata) + [data[8]] for cdata in zip(*data[2:8])])
+        table.setUpdatesEnabled(True)
+        table.scrollToBottom()
+        
+        #replotting the profile
+        self.update_DAS_plot(plottabnum, "AXBT")
+        
+    except Exception:
+        self.posterror("Failed to replace AXBT profile")
+        trace_error()
+        
+        
+        
 #replacing and replotting U and V data after the AXCP DAS recalculates them
 @pyqtSlot(int, list)
 def replace_AXCP_profiles(self, tabID, data):
@@ -1280,17 +1260,9 @@ def replace_AXCP_profiles(self, tabID, data):
         self.alltabdata[plottabnum]["rawdata"]["Utrue"] = data[2]
         self.alltabdata[plottabnum]["rawdata"]["Vtrue"] = data[3]
         
-        try:
-            del self.alltabdata[plottabnum]["ProcAxes"][1].lines[-2:]
-        except IndexError: #if nothing has been plotted, trying to delete the lines from the plot raises IndexError
-            pass
-            
         #plotting and updating
         if len(data[0]) > 0:
-            self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Umag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='b')
-            self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Vmag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='g')
-            self.config_graph_ticks_lims(plottabnum, "AXCP")
-            self.alltabdata[plottabnum]["ProcessorCanvas"].draw()
+            self.update_DAS_plot(plottabnum, "AXCP")
             
     
     except Exception:
@@ -1308,33 +1280,11 @@ def truncate_AXCP_profiles(self, tabID, nffspindown):
         Npts = len(self.alltabdata[plottabnum]["rawdata"]["time"])
         
         if Npts > 0:
-            inds_to_delete = np.arange(nffspindown, Npts)
-            
             #updating stored profile data
-            self.alltabdata[plottabnum]["rawdata"]["time"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["time"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["depth"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["depth"] ,inds_to_delete) 
-            self.alltabdata[plottabnum]["rawdata"]["frequency"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["frequency"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["frotdev"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["frotdev"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["temperature"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["temperature"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["Umag"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["Umag"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["Vmag"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["Vmag"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["Utrue"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["Utrue"] ,inds_to_delete)
-            self.alltabdata[plottabnum]["rawdata"]["Vtrue"] = np.delete(self.alltabdata[plottabnum]["rawdata"]["Vtrue"] ,inds_to_delete)
+            self.alltabdata[plottabnum]["rawdata"].truncate(nffspindown)
             
-            #removing previous lines from plots
-            try:
-                del self.alltabdata[plottabnum]["ProcAxes"][0].lines[-1:]
-                del self.alltabdata[plottabnum]["ProcAxes"][1].lines[-2:]
-            except IndexError: #if nothing has been plotted, trying to delete the lines from the plot raises IndexError
-                pass
-                
             #updating plots
-            if len(self.alltabdata[plottabnum]["rawdata"]["time"]) > 0:
-                self.alltabdata[plottabnum]["ProcAxes"][0].plot(self.alltabdata[plottabnum]["rawdata"]["temperature"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='r')
-                self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Umag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='b')
-                self.alltabdata[plottabnum]["ProcAxes"][1].plot(self.alltabdata[plottabnum]["rawdata"]["Vmag"],self.alltabdata[plottabnum]["rawdata"]["depth"],color='g')
-                self.config_graph_ticks_lims(plottabnum, "AXCP")
-                self.alltabdata[plottabnum]["ProcessorCanvas"].draw()
+            self.update_DAS_plot(plottabnum, "AXCP")
             
     
     except Exception:
@@ -1402,6 +1352,8 @@ def failedWRmessage(self,tabID,messagenum):
             self.posterror("Failed to initialize the signal processor thread")
         elif messagenum == 13:
             self.postwarning("ARES has stopped audio recording as the WAV file has exceeded maximum allowed length. Please start a new processing tab to continue recording AXBT signal to a WAV file.")
+        elif messagenum == 14:
+            self.postwarning("Signal processing has fallen too far behind realtime- the oldest unprocessed audio is being skipped, leaving gaps in the profile. The full signal is still recorded to the WAV file and can be reprocessed.")
             
         #reset data source if signal processor failed to start
         if messagenum in [1,2,3,4,5,6,7,9,11,12]:
@@ -1422,6 +1374,24 @@ def updateaudioprogressbar(self,tabID,newprogress):
     except Exception:
         trace_error()
 
+        
+        
+#shows how far processing is behind the receiver audio (realtime and test tabs only)
+@pyqtSlot(int,dict)
+def updateprocessorstats(self,tabID,stats):
+    try:
+        plottabnum = self.gettabnumfromID(tabID)
+        self.alltabdata[plottabnum]["processorstats"] = stats
+        if "processorlag" in self.alltabdata[plottabnum]["tabwidgets"]:
+            lagstr = f"Processing lag: {stats['lag']:.1f} sec (max {stats['maxlag']:.1f} sec)"
+            if stats['level'] > 0: #reduced processing to catch up with realtime
+                lagstr += f", reduced processing level {stats['level']}"
+            if len(stats['gaps']) > 0:
+                lagstr += f", {sum([cgap[1] for cgap in stats['gaps']]):.1f} sec of audio skipped"
+            self.alltabdata[plottabnum]["tabwidgets"]["processorlag"].setText(lagstr)
+    except Exception:
+        trace_error()
+
 
         
 # =============================================================================
@@ -0,0 +1,73 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the live profile plot for DAS tabs. Each profile (e.g. temperature, salinity, U/V) is one
+# persistent line that is updated in place with the received data. The lines are animated (excluded from full figure
+# draws): after every full draw (e.g. resizing, axis limit changes) the rest of the figure is saved as a background, and
+# updates only restore the background, draw the lines, and blit the result to the canvas.
+
+
+
+class LiveProfilePlot:
+
+    def __init__(self, canvas, axes):
+        self.canvas = canvas
+        self.axes = axes
+        self.lines = []
+        self.overlays = [] #artists drawn on top of the lines (e.g. legend), also animated
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+
+    #replaces the plotted lines: lineaxes = index of the axes for each line, linecolors = color of each line
+    def set_lines(self, lineaxes, linecolors, overlays=[]):
+        for cline in self.lines:
+            cline.remove()
+        self.lines = [self.axes[cax].plot([], [], color=ccolor, animated=True)[0] for (cax,ccolor) in zip(lineaxes, linecolors)]
+        self.overlays = overlays
+        for cartist in overlays:
+            cartist.set_animated(True) #drawn once, after the lines
+
+
+    #xdata = list of x values for each line, all plotted against depth
+    def set_data(self, xdata, depth):
+        for (cline, cx) in zip(self.lines, xdata):
+            cline.set_data(cx, depth)
+
+
+    #redraws the lines, or the full figure if redraw is True (e.g. if axis limits changed)
+    def refresh(self, redraw=False):
+        if redraw or self.background is None:
+            self.canvas.draw() #on_draw saves the background and draws the lines
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.canvas.figure.bbox)
+
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.draw_lines()
+
+
+    def draw_lines(self):
+        for cartist in self.lines + self.overlays:
+            if cartist.axes is None or cartist.axes.get_visible():
+                self.canvas.figure.draw_artist(cartist)
+
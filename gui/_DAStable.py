@@ -0,0 +1,153 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the table model for the data table in DAS tabs. Each row received from the processor is stored as
+# numbers (one column per value) with a status code for the row color, and is only formatted as text when the table
+# view draws it, so the cost of adding rows doesn't depend on how many rows the table already has.
+#
+# Row values by probe type (see update_AXBT_DAS/update_AXCTD_DAS/update_AXCP_DAS in _DASfunctions.py):
+#   AXBT:  [time, frequency, Sp, Rp, depth, temperature]
+#   AXCTD: [time, r400, r7500, depth, temperature, salinity]
+#   AXCP:  [time, rotation frequency, rotation frequency stdev, depth, temperature, U, V]
+
+
+import numpy as np
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor, QBrush
+
+
+
+#row status codes and their colors
+NODATA = 0 #light gray- no data/data outside limits
+PULSE = 1 #light blue- AXCTD 400 Hz pulse detection phase
+GOOD = 2 #light green- profile data
+rowcolors = {NODATA:QColor(200, 200, 200), PULSE:QColor(204, 220, 255), GOOD:QColor(204, 255, 220)}
+
+headers = {"AXBT":('Time (s)', 'Fp (Hz)', 'Sp (dB)', 'Rp (%)' ,'Depth (m)','Temp (C)'),
+           "AXCTD":('Time (s)', 'R-400 Hz', 'R-7500 Hz', 'Depth (m)','Temp. (C)', 'Sal. (PSU)'),
+           "AXCP":('Time (s)', 'Rotation (Hz/σ)',  'Depth (m)','Temp. (C)', 'U (m/s)', 'V (m/s)')}
+nvalues = {"AXBT":6, "AXCTD":6, "AXCP":7}
+
+blank = '------' #displayed for missing data
+
+
+
+
+#formats a stored row as table text by probe type
+def format_AXBT_row(row, status):
+    ctime, cfreq, cact, cratio, cdepth, ctemp = row
+    return [f'{ctime:4.2f}', fmt(cfreq, '7.2f'), f'{cact:4.1f}', f'{cratio:4.1f}', fmt(cdepth, '4.2f'), fmt(ctemp, '4.2f')]
+
+def format_AXCTD_row(row, status):
+    ctime, cr400, cr7500, cdepth, ctemp, cpsal = row
+    if status == GOOD:
+        return [f'{ctime:4.2f}', f'{cr400:4.2f}', f'{cr7500:4.2f}', f'{cdepth:4.2f}', f'{ctemp:4.2f}', f'{cpsal:4.2f}']
+    return [f'{ctime:4.2f}', f'{cr400:4.2f}', f'{cr7500:4.2f}', blank, blank, blank]
+
+def format_AXCP_row(row, status):
+    ctime, cfrot, cfrotrms, cdepth, ctemp, cUmag, cVmag = row
+    if np.isnan(cdepth):
+        return [f'{ctime:4.2f}', f'{cfrot:5.2f}/{cfrotrms:5.2f}', blank, blank, blank, blank]
+    return [f'{ctime:4.2f}', f'{cfrot:5.2f}/{cfrotrms:5.2f}', f'{cdepth:4.2f}', f'{ctemp:4.2f}', f'{cUmag:5.3f}', f'{cVmag:5.3f}']
+
+def fmt(value, spec):
+    return blank if np.isnan(value) else format(value, spec)
+
+rowformatters = {"AXBT":format_AXBT_row, "AXCTD":format_AXCTD_row, "AXCP":format_AXCP_row}
+
+
+
+
+class DASTableModel(QAbstractTableModel):
+
+    def __init__(self, probetype="AXBT", parent=None):
+        super().__init__(parent)
+        self.brushes = {cstatus:QBrush(ccolor) for (cstatus,ccolor) in rowcolors.items()}
+        self.set_probetype(probetype)
+
+
+    #clears the table and switches the columns/formatting to the specified probe type
+    def set_probetype(self, probetype):
+        self.beginResetModel()
+        self.probetype = probetype.upper() if probetype.upper() in headers.keys() else "AXBT"
+        self.formatrow = rowformatters[self.probetype]
+        self.nrows = 0
+        self.values = np.zeros((256, nvalues[self.probetype])) #grown (doubled) as rows are added
+        self.status = np.zeros(256, dtype=np.int8)
+        self.formattedrow = (-1, None) #the view requests each cell of a row in turn, so the last formatted row is kept
+        self.endResetModel()
+
+
+    def clear(self):
+        self.set_probetype(self.probetype)
+
+
+    #appends rows of values (see top of file) with one status code per row
+    def append_rows(self, rows, statuses):
+        nnew = len(rows)
+        if nnew == 0:
+            return
+
+        if self.nrows + nnew > len(self.status):
+            capacity = len(self.status)
+            while capacity < self.nrows + nnew:
+                capacity *= 2
+            self.values = np.concatenate((self.values, np.zeros((capacity - len(self.status), self.values.shape[1]))))
+            self.status = np.concatenate((self.status, np.zeros(capacity - len(self.status), dtype=np.int8)))
+
+        self.beginInsertRows(QModelIndex(), self.nrows, self.nrows + nnew - 1)
+        self.values[self.nrows:self.nrows+nnew] = rows
+        self.status[self.nrows:self.nrows+nnew] = statuses
+        self.nrows += nnew
+        self.endInsertRows()
+
+
+
+    # =============================================================================
+    #         QAbstractTableModel methods called by the table view
+    # =============================================================================
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.nrows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 6
+
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.nrows:
+            return None
+
+        if role == Qt.DisplayRole:
+            crow = index.row()
+            if self.formattedrow[0] != crow:
+                self.formattedrow = (crow, self.formatrow(self.values[crow].tolist(), self.status[crow]))
+            return self.formattedrow[1][index.column()]
+        elif role == Qt.BackgroundRole:
+            return self.brushes[int(self.status[index.row()])]
+
+        return None
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return headers[self.probetype][section]
+        return None
+
@@ -38,8 +38,6 @@ from PyQt5.QtGui import QIcon, QFont, QColor
 from PyQt5.Qt import QThreadPool
 
 import numpy as np
-import scipy.io as sio
-from cartopy.io import shapereader
 
 import lib.GPS_COM_interaction as gps
 import gui._settingswindow as swin
@@ -221,12 +219,6 @@ def loaddata(self):
         self.bathymetrydata["vals"] = np.array([float(i) for i in open('data/bathy/vals.txt').read().strip().split(',') if i != ''])
     except:
         self.posterror("Unable to find/load bathymetry data")  
-    
-    #loading regions shape file to identify name of ocean/sea/water where a profile was collected (for location plots)      
-    try: 
-        self.landshp = shapereader.Reader('data/regions/GSHHS_i_L1.shp')
-    except:
-        self.posterror("Unable to read land area shape file (GSHHS_i_L1.shp)")
         
         
     
@@ -35,9 +35,7 @@ from datetime import datetime
 
 #autoQC-specific modules
 import lib.fileinteraction as io
-import lib.PE.make_profile_plots as profplot
-import lib.PE.autoqc as qc
-import lib.PE.ocean_climatology_interaction as oci
+from ._lazyimport import profplot, qc, oci #imported when the first profile editor tab is opened
 
 from ._globalfunctions import (addnewtab, whatTab, renametab, setnewtabcolor, closecurrenttab, savedataincurtab, postwarning, posterror, postwarning_option, closeEvent, parsestringinputs, CustomToolbar)
 
@@ -19,12 +19,15 @@
 
 
 from PyQt5.QtWidgets import QMainWindow
+from PyQt5.QtCore import QTimer
 from traceback import print_exc as trace_error
 
+from ._lazyimport import preload
+
 class RunProgram(QMainWindow):
     
     #importing methods from other files
-    from ._DASfunctions import (makenewprocessortab, prep_graph_and_table, config_graph_ticks_lims, datasourcerefresh, enableVHFoptionsbydatasource, probetypechange, datasourcechange, changefrequencytomatchchannel, changechanneltomatchfrequency, changechannelandfrequency, updateDASsettings, updatedropposition, pull_drop_coords_update, startprocessor, prepprocessor, runprocessor, stopprocessor, gettabnumfromID, triggerUI, updateUIinfo, update_AXBT_DAS, update_AXCTD_DAS, update_AXCP_DAS, replace_AXCP_profiles, truncate_AXCP_profiles, updateUIfinal, failedWRmessage, updateaudioprogressbar, AudioWindow, AudioWindowSignals, audioWindowClosed, processprofile)
+    from ._DASfunctions import (makenewprocessortab, prep_graph_and_table, config_graph_ticks_lims, datasourcerefresh, enableVHFoptionsbydatasource, probetypechange, datasourcechange, changefrequencytomatchchannel, changechanneltomatchfrequency, changechannelandfrequency, updateDASsettings, updatedropposition, pull_drop_coords_update, startprocessor, prepprocessor, runprocessor, stopprocessor, gettabnumfromID, triggerUI, updateUIinfo, update_AXBT_DAS, update_AXCTD_DAS, update_AXCP_DAS, update_DAS_plot, replace_AXBT_profile, replace_AXCP_profiles, truncate_AXCP_profiles, updateUIfinal, failedWRmessage, updateaudioprogressbar, updateprocessorstats, AudioWindow, AudioWindowSignals, audioWindowClosed, processprofile)
     from ._PEfunctions import (makenewproftab, selectdatafile, checkdatainputs_editorinput, continuetoqc, runqc, applychanges, updateprofeditplots, generateprofiledescription, get_open_subfigure, addpoint, removepoint, removerange, on_press_spike, on_release, toggleclimooverlay, CustomToolbar)
     from ._GUIfunctions import (initUI, loaddata, buildmenu, configureGuiFont, changeGuiFont, openpreferencesthread, updatesettings, settingsclosed, updateGPSdata, updateGPSsettings)
     from ._globalfunctions import (addnewtab, whatTab, renametab, add_asterisk, remove_asterisk, setnewtabcolor, closecurrenttab, postwarning, posterror, postwarning_option, closeEvent, parsestringinputs, savedataincurtab, check_filename, saveDASfiles, savePEfiles)
@@ -39,6 +42,7 @@ class RunProgram(QMainWindow):
             self.buildmenu() #Creates interactive menu, options to create tabs and run ARES systems
             self.loaddata() #loads climo and bathy data into program first if using the full datasets
             self.makenewprocessortab() # opens a data acquisition tab on startup
+            QTimer.singleShot(1000, preload) #imports processor/profile editor modules in the background once the window is open
             
         except Exception:
             trace_error()
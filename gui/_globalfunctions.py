@@ -42,8 +42,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 import lib.fileinteraction as io
-import lib.PE.make_profile_plots as profplot
-import lib.PE.ocean_climatology_interaction as oci
+import lib.DAS.DAS_outputs as das_out
+from lib.DAS.DAS_sigdata import export_text as export_sigdata_text
+from lib.DAS.DAS_multiprocess import ProcessorHost
+from ._lazyimport import profplot, oci
 
 
 
@@ -149,6 +151,9 @@ def closecurrenttab(self):
                     return
                 else:
                     self.alltabdata[opentab]["processor"].abort()
+                    
+            elif isinstance(self.alltabdata[opentab].get("processor"), ProcessorHost): #AXCP processor processes stay open for position updates
+                self.alltabdata[opentab]["processor"].close()
 
             #explicitly closing open figures in tab to prevent memory leak
             if self.alltabdata[opentab]["tabtype"] == "PE_p":
@@ -552,87 +557,8 @@ def check_filename(self,original_file_header):
 #save files from DAS in specified tab
 def saveDASfiles(self,opentab,outfileheader,probetype):
     
-    if probetype.upper() == 'AXCTD':
-        hasSal = True
-        hasCurrent = False
-        rawdata = {'depth':self.alltabdata[opentab]["rawdata"]["depth"], 'temperature': self.alltabdata[opentab]["rawdata"]["temperature"], 'salinity':self.alltabdata[opentab]["rawdata"]["salinity"], 'time':self.alltabdata[opentab]["rawdata"]["time"], 'frequency':[999] * len(self.alltabdata[opentab]["rawdata"]["depth"]), 'U':None, 'V':None}
-        edf_data = {'Time (s)': self.alltabdata[opentab]["rawdata"]["time"], 'Frame (hex)': self.alltabdata[opentab]["rawdata"]["frame"], 'Depth (m)':self.alltabdata[opentab]["rawdata"]["depth"],'Temperature (degC)':self.alltabdata[opentab]["rawdata"]["temperature"],'Conductivity (mS/cm)':self.alltabdata[opentab]["rawdata"]["conductivity"], 'Salinity (PSU)':self.alltabdata[opentab]["rawdata"]["salinity"]}
-        
-        if self.alltabdata[opentab]["rawdata"]["firstpulsetime"] >= 0:
-            metadata = self.alltabdata[opentab]["processor"].metadata
-            
-        else: #default comments to use if no profile detected
-            metadata = {'zcoeff_default':self.settingsdict["zcoeff_axctd"],'zcoeff_valid':4*[False], 'tcoeff_default':self.settingsdict["tcoeff_axctd"],'tcoeff_valid':4*[False], 'ccoeff_default':self.settingsdict["ccoeff_axctd"],'ccoeff_valid':4*[False], 'serial_no':None, 'max_depth':None}
-            
-        coeffs = {}
-        coeffops = ['z','t','c']
-        for c in coeffops:
-            if sum(metadata[c + 'coeff_valid']) == 4:
-                coeffs[c] = metadata[c+'coeff']
-            else:
-                coeffs[c] = metadata[c+'coeff_default']
-        
-        zcoeff = self.settingsdict["zcoeff_axctd"]
-        tcoeff = self.settingsdict["tcoeff_axctd"]
-        ccoeff = self.settingsdict["ccoeff_axctd"]
-        edf_comments = f"""Probe Type       :  AXCTD
-    Serial Number      :  {metadata['serial_no'] if metadata['serial_no'] is not None else 'Not Provided'}
-    Terminal Depth (m) :  {metadata['max_depth'] if metadata['max_depth'] is not None else 'Not Provided'}
-    Depth Coeff. 1     :  {coeffs['z'][0]}
-    Depth Coeff. 2     :  {coeffs['z'][1]}
-    Depth Coeff. 3     :  {coeffs['z'][2]}
-    Depth Coeff. 4     :  {coeffs['z'][3]}
-    Pressure Pt Correction:  N/A
-    Temp. Coeff. 1     :  {coeffs['t'][0]}
-    Temp. Coeff. 2     :  {coeffs['t'][1]}
-    Temp. Coeff. 3     :  {coeffs['t'][2]}
-    Temp. Coeff. 4     :  {coeffs['t'][3]}
-    Cond. Coeff. 1     :  {coeffs['c'][0]}
-    Cond. Coeff. 2     :  {coeffs['c'][1]}
-    Cond. Coeff. 3     :  {coeffs['c'][2]}
-    Cond. Coeff. 4     :  {coeffs['c'][3]}"""
-    
-    elif probetype.upper() == 'AXCP':
-        hasSal = False
-        hasCurrent = True
-        rawdata = {'depth':self.alltabdata[opentab]["rawdata"]["depth"], 'temperature': self.alltabdata[opentab]["rawdata"]["temperature"], 'salinity':None, 'U':self.alltabdata[opentab]["rawdata"]["Utrue"], 'V':self.alltabdata[opentab]["rawdata"]["Vtrue"], 'time':self.alltabdata[opentab]["rawdata"]["time"], 'frequency':[999] * len(self.alltabdata[opentab]["rawdata"]["depth"])}
-        
-        edf_data = {'Time (s)': self.alltabdata[opentab]["rawdata"]["time"], 'Rotation Rate (Hz)': self.alltabdata[opentab]["rawdata"]["frequency"], 'Rotation Deviation (Hz)': self.alltabdata[opentab]["rawdata"]["frotdev"], 'Depth (m)':self.alltabdata[opentab]["rawdata"]["depth"],'Temperature (degC)':self.alltabdata[opentab]["rawdata"]["temperature"],'Zonal Current (m/s)':self.alltabdata[opentab]["rawdata"]["Utrue"], 'Meridional Current (m/s)':self.alltabdata[opentab]["rawdata"]["Vtrue"]}
-        
-        qualities = ['High','Moderate','Low']
-        cproc = self.alltabdata[opentab]["processor"]
-        edf_comments = f"""Probe Type       :  AXCP
-    Temperature Mode   :  {'FFT' if cproc.temp_mode >= 2 else 'Zero Crossing'}
-    Reverse Coil       :  {'Yes' if cproc.revcoil else 'No'}
-    Process Quality    :  {qualities[cproc.quality-1]}
-    MagVar Latitude    :  {cproc.lat:8.3f} {'N' if cproc.lat >= 0 else 'S'}
-    MagVar Longitude   :  {cproc.lon:9.3f} {'E' if cproc.lon >= 0 else 'W'}
-    F_h                :  {np.round(cproc.fh)} nT
-    F_z                :  {np.round(cproc.fz)} nT
-    Declination        :  {cproc.dec:5.1f} degrees
-//NOTE: Currents are provided in degrees True
-    """
-    
-    
-    else: #AXBT
-        hasSal = False
-        hasCurrent = False
-        rawdata = {'depth':self.alltabdata[opentab]["rawdata"]["depth"], 'temperature':self.alltabdata[opentab]["rawdata"]["temperature"], 'salinity':None, 'time':self.alltabdata[opentab]["rawdata"]["time"], 'frequency': self.alltabdata[opentab]["rawdata"]["frequency"], 'U':None, 'V':None}
-        edf_data = {'Time (s)': self.alltabdata[opentab]["rawdata"]["time"], 'Frequency (Hz):': self.alltabdata[opentab]["rawdata"]["frequency"], 'Depth (m)':self.alltabdata[opentab]["rawdata"]["depth"],'Temperature (degC)':self.alltabdata[opentab]["rawdata"]["temperature"]}
-        zcoeff = self.settingsdict["zcoeff_axbt"]
-        tcoeff = self.settingsdict["tcoeff_axbt"]
-        edf_comments = f"""Probe Type       :  AXBT
-    Terminal Depth   :  850 m
-    Depth Coeff. 1   :  {zcoeff[0]}
-    Depth Coeff. 2   :  {zcoeff[1]}
-    Depth Coeff. 3   :  {zcoeff[2]}
-    Depth Coeff. 4   :  {zcoeff[3]}
-    Pressure Pt Correction:  N/A
-    Temp. Coeff. 1   :  {tcoeff[0]}
-    Temp. Coeff. 2   :  {tcoeff[1]}
-    Temp. Coeff. 3   :  {tcoeff[2]}
-    Temp. Coeff. 4   :  {tcoeff[3]}"""
-
+    #building profile, EDF fields and EDF comments from raw data (shared with the command line processor)
+    rawdata, edf_data, edf_comments = das_out.build_DAS_output(probetype, self.alltabdata[opentab]["rawdata"], self.alltabdata[opentab]["processor"], self.settingsdict)
 
     # pulling date/time/position data from inputs to save
     latstr = self.alltabdata[opentab]["tabwidgets"]["latedit"].text()
@@ -712,6 +638,11 @@ def saveDASfiles(self,opentab,outfileheader,probetype):
                 self.postwarning(f'Unable to save WAV file: {oldfile} not found')
             if copyfile:
                 shcopy(oldfile,newfile)
+                
+            #AXCTD demodulated bitstream (for reparsing the profile without the audio) is saved with the WAV file
+            bitstreamfile = self.tempdir + slash + 'bitstream_' + str(self.alltabdata[opentab]["tabnum"]) + '.npz'
+            if copyfile and path.exists(bitstreamfile):
+                shcopy(bitstreamfile, filename + '.bits.npz')
             
         except Exception:
             trace_error()
@@ -719,7 +650,7 @@ def saveDASfiles(self,opentab,outfileheader,probetype):
 
     if self.settingsdict["savesig_raw"]: #save signal data file
         try:
-            oldfile = self.tempdir + slash + 'sigdata_' + str(self.alltabdata[opentab]["tabnum"]) + '.txt'
+            oldfile = self.tempdir + slash + 'sigdata_' + str(self.alltabdata[opentab]["tabnum"]) + '.bin'
             newfile = filename + '.sigdata'
             
             copyfile = True
@@ -734,10 +665,27 @@ def saveDASfiles(self,opentab,outfileheader,probetype):
                 self.postwarning(f'Unable to save signal data file: {oldfile} not found')
             if copyfile:
                 shcopy(oldfile,newfile)
+                
+            #processor statistics log is saved with the signal data if it was recorded (statslog setting)
+            statsfile = self.tempdir + slash + 'stats_' + str(self.alltabdata[opentab]["tabnum"]) + '.txt'
+            if copyfile and path.exists(statsfile):
+                shcopy(statsfile, filename + '.stats')
 
         except Exception:
             trace_error()
             self.posterror("Failed to save signal data file")
+            
+    if self.settingsdict["savesigtxt_raw"]: #save signal data as text
+        try:
+            sigdatafile = self.tempdir + slash + 'sigdata_' + str(self.alltabdata[opentab]["tabnum"]) + '.bin'
+            if path.exists(sigdatafile):
+                export_sigdata_text(sigdatafile, filename + '.sigdata.txt')
+            else:
+                self.postwarning(f'Unable to save signal data text file: {sigdatafile} not found')
+                
+        except Exception:
+            trace_error()
+            self.posterror("Failed to save signal data text file")
         
         
         
@@ -0,0 +1,68 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains lazily imported modules for the GUI. Modules that are slow to import (the DAS processors with
+# scipy.signal, and the profile editor/climatology modules with scipy, shapely and pyshp) aren't needed to show the
+# main window, so the GUI files refer to them through a LazyModule, which imports the module the first time one of
+# its attributes is used (e.g. when the first processor is started or the first profile editor tab is opened).
+# preload imports them in a background thread once the window is open, so they are usually loaded before they are
+# needed.
+
+
+import importlib
+import threading
+from traceback import print_exc as trace_error
+
+
+
+class LazyModule:
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    #imports the module if it hasn't been imported yet (imports are thread safe, so this can be called from any thread)
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+
+#modules used by the GUI that are imported on first use
+qtproc = LazyModule("lib.DAS.qt_processors")
+oci = LazyModule("lib.PE.ocean_climatology_interaction")
+profplot = LazyModule("lib.PE.make_profile_plots")
+qc = LazyModule("lib.PE.autoqc")
+
+
+
+#imports all lazily imported modules in a background thread
+def preload():
+    def load_all():
+        for cmodule in [qtproc, oci, profplot, qc]:
+            try:
+                cmodule.load()
+            except Exception:
+                trace_error()
+
+    threading.Thread(target=load_all, daemon=True, name="AXBPS preload").start()
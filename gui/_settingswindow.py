@@ -32,6 +32,7 @@ from PyQt5.QtGui import QIcon, QColor, QPalette, QBrush, QLinearGradient, QFont
 
 import lib.GPS_COM_interaction as gps
 import lib.DAS.common_DAS_functions as cdf #for temperature conversion for flims_axbt
+import lib.DAS.DAS_outputs as das_out #default processor settings
 
 from platform import system as cursys
 if cursys() == 'Windows':
@@ -57,6 +58,7 @@ def setdefaultsettings():
     settingsdict["platformid"] = 'NNNNN'
     settingsdict["missionid"] = 'UNKNOWN1'
     settingsdict["inc_audio_devices"] = False
+    settingsdict["useprocesses"] = False #run each processor in its own process (lib/DAS/DAS_multiprocess.py)
     
     settingsdict["savedta_raw"] = False
     settingsdict["savedat_raw"] = True
@@ -64,55 +66,14 @@ def setdefaultsettings():
     settingsdict["saveedf_raw"] = True
     settingsdict["savewav_raw"] = True
     settingsdict["savesig_raw"] = False
+    settingsdict["savesigtxt_raw"] = False
     
     settingsdict["dtgwarn"] = True  # warn user if entered dtg is more than 12 hours old or after current system time (in future)
     settingsdict["renametabstodtg"] = True  # auto rename tab to dtg when loading profile editor
     settingsdict["autosave"] = False  # automatically save raw data before opening profile editor (otherwise brings up prompt asking if want to save)
     
-    #AXBT data acquisition
-    settingsdict["fftwindow"] = 0.3  # window to run FFT (in seconds)
-    settingsdict["minfftratio"] = 0.5  # minimum signal to noise ratio to ID data
-    settingsdict["minsiglev"] = 63.  # minimum total signal level to receive data
-    settingsdict["triggerfftratio"] = 0.95  # minimum signal to noise ratio to ID data
-    settingsdict["triggersiglev"] = 70.  # minimum total signal level to receive data
-    
-    #AXCTD data acquisition
-    settingsdict["minr400"] = 2.0  #minimum 400 Hz signal ratio to detect AXCTD pulse
-    settingsdict["mindr7500"] = 1.5  #minimum 7500 Hz signal ratio to detect AXCTD profile tone
-    settingsdict["deadfreq"] = 3000 #quiet frequency used to calculate AXCTD signal ratios
-    settingsdict["mark_space_freqs"] = [400, 800] #bit 1/0 freqs (respectively) used for AXCTD demod
-    settingsdict['refreshrate'] = 2 #iterate AXCTD processer every X sec
-    settingsdict['usebandpass'] = False #use a 100-1200 Hz bandpasss filter instead of 1200 Hz lowpass filter
-    
-    #AXCP data acquisition
-    settingsdict['cprefreshrate'] = 1.0 #AXCP refresh rate (seconds)
-    settingsdict['axcpquality'] = 1 #processing quality-> 1=best, 3=worst
-    settingsdict['spindowndetectrt'] = 1 #realtime spindown detection and profile termination (1 or 0)
-    settingsdict['cptempmode'] = 2 #whether or not to use FFT for AXCP temperature calculation
-    settingsdict['cpfftwindow'] = 1 #FFT window length for AXCP (must be <= refreshrateaxcp)
-    settingsdict['revcoil'] = 0 #whether coil is reversed on AXCP
-    settingsdict['maglat'] = 20 #default latitude for AXCP Fh/Fz/declination calculations
-    settingsdict['maglon'] = -80 #default longitude for AXCP Fh/Fz/declination calculations
-    settingsdict["spinupfrotmax"] = 0.5 #maximum RMS deviation of probe rotation rate for spinup to be ID'ed
-    settingsdict["spindownfrotmax"] = 0.5 #max RMS deviation of probe rotation rate at spindown
-    
-    #AXBT conversions
-    # #standard navy equations
-    # settingsdict["tcoeff_axbt"] = [-40,0.02778,0,0] #temperature conversion coefficients
-    # settingsdict["zcoeff_axbt"] = [0,1.524,0,0] #depth conversion coefficients
-    
-    #updated equations similar to Mk-21 output
-    settingsdict['tcoeff_axbt'] = [-67.8339, 0.0713, -2.2001e-05, 3.6060e-09]
-    settingsdict['zcoeff_axbt'] = [0, 1.5926, -0.00018, 0]
-    
-    settingsdict["flims_axbt"] = [1300, 2800] #valid frequency range limits
-    
-    #AXCTD conversions (default coefficients replaced by header)
-    settingsdict["zcoeff_axctd"] = [0.72, 2.76124, -0.000238007, 0]
-    settingsdict["tcoeff_axctd"] = [-0.053328, 0.994372, 0.0, 0.0]
-    settingsdict["ccoeff_axctd"] = [-0.0622192, 1.04584, 0.0, 0.0]
-    settingsdict["tlims_axctd"] = [-4,35]
-    settingsdict["slims_axctd"] = [25,45]
+    #AXBT/AXCTD/AXCP data acquisition settings and conversions
+    settingsdict.update(das_out.default_processor_settings())
     
     #Profile Editor preferences
     settingsdict["useclimobottom"] = True  # use climatology to ID bottom strikes
@@ -147,9 +108,9 @@ def setdefaultsettings():
 #lists of settings broken down by data type (for settings file reading/writing)
 strsettings = ["platformid", "missionid", "comport"] #settings saved as strings
 listsettings = ["mark_space_freqs", "tcoeff_axbt", "zcoeff_axbt", "flims_axbt", "zcoeff_axctd", "tcoeff_axctd", "ccoeff_axctd","tlims_axctd","slims_axctd"] #saved as lists of coefficients/parameters (each element is a float)
-floatsettings = ["fftwindow", "minsiglev", "minfftratio", "triggersiglev", "triggerfftratio", "minr400", "mindr7500", "smoothlev", "profres", "maxstdev", "refreshrate", 'cprefreshrate', 'cpfftwindow', 'maglat', 'maglon', 'spinupfrotmax', 'spindownfrotmax'] #saved as floats
+floatsettings = ["fftwindow", "minsiglev", "minfftratio", "triggersiglev", "triggerfftratio", "minr400", "mindr7500", "smoothlev", "profres", "maxstdev", "refreshrate", 'cprefreshrate', 'cpfftwindow', 'cpffthop', 'maglat', 'maglon', 'spinupfrotmax', 'spindownfrotmax'] #saved as floats
 intsettings = ["deadfreq", 'axcpquality', 'cptempmode', "originatingcenter", "gpsbaud", "fontsize"] #saved as ints
-boolsettings = ["autodtg", "autolocation", "autoid", "savedta_raw", "savedat_raw", "savenvo_raw", "saveedf_raw", "savewav_raw", "savesig_raw", "inc_audio_devices", "dtgwarn", "renametabstodtg", "autosave",  "usebandpass", 'spindowndetectrt', 'revcoil', "useclimobottom", "overlayclimo", "comparetoclimo", "savefin_qc", "savejjvv_qc", "savedat_qc", "saveedf_qc", "savebufr_qc", "saveprof_qc", "saveloc_qc", "useoceanbottom", "checkforgaps", ] #saved as boolean
+boolsettings = ["autodtg", "autolocation", "autoid", "savedta_raw", "savedat_raw", "savenvo_raw", "saveedf_raw", "savewav_raw", "savesig_raw", "savesigtxt_raw", "inc_audio_devices", "statslog", "useprocesses", "dtgwarn", "renametabstodtg", "autosave",  "usebandpass", 'spindowndetectrt', 'revcoil', "useclimobottom", "overlayclimo", "comparetoclimo", "savefin_qc", "savejjvv_qc", "savedat_qc", "saveedf_qc", "savebufr_qc", "saveprof_qc", "saveloc_qc", "useoceanbottom", "checkforgaps", ] #saved as boolean
 
 
 class SettingNotRecognized(Exception):
@@ -374,11 +335,14 @@ class RunSettings(QMainWindow):
         self.processortabwidgets["saveedf_raw"].setChecked(self.settingsdict["saveedf_raw"])
         self.processortabwidgets["savewav_raw"].setChecked(self.settingsdict["savewav_raw"])
         self.processortabwidgets["savesig_raw"].setChecked(self.settingsdict["savesig_raw"])
+        self.processortabwidgets["savesigtxt_raw"].setChecked(self.settingsdict["savesigtxt_raw"])
 
         self.processortabwidgets["dtgwarn"].setChecked(self.settingsdict["dtgwarn"])
         self.processortabwidgets["renametab"].setChecked(self.settingsdict["renametabstodtg"])
         self.processortabwidgets["autosave"].setChecked(self.settingsdict["autosave"])
         self.processortabwidgets["inc_audio_devices"].setChecked(self.settingsdict["inc_audio_devices"])
+        self.processortabwidgets["statslog"].setChecked(self.settingsdict["statslog"])
+        self.processortabwidgets["useprocesses"].setChecked(self.settingsdict["useprocesses"])
         
         self.sigsettingstabwidgets["fftwindowlabel"].setText(self.label_fftwindow + str(self.settingsdict["fftwindow"]))  # 15
         self.sigsettingstabwidgets["fftwindow"].setValue(int(self.settingsdict["fftwindow"] * 100))
@@ -418,6 +382,7 @@ class RunSettings(QMainWindow):
         self.sigsettingstabwidgets['spindowndetectrt'].setChecked(self.settingsdict['spindowndetectrt'])
         self.sigsettingstabwidgets['cptempmode'].setChecked(self.settingsdict['cptempmode']-1)
         self.sigsettingstabwidgets['cpfftwindow'].setValue(self.settingsdict['cpfftwindow'])
+        self.sigsettingstabwidgets['cpffthop'].setValue(self.settingsdict['cpffthop'])
         self.sigsettingstabwidgets['revcoil'].setChecked(self.settingsdict['revcoil'])
         self.sigsettingstabwidgets['maglat'].setValue(self.settingsdict['maglat'])
         self.sigsettingstabwidgets['maglon'].setValue(self.settingsdict['maglon'])
@@ -510,11 +475,14 @@ class RunSettings(QMainWindow):
         self.settingsdict["saveedf_raw"] = self.processortabwidgets["saveedf_raw"].isChecked()
         self.settingsdict["savewav_raw"] = self.processortabwidgets["savewav_raw"].isChecked()
         self.settingsdict["savesig_raw"] = self.processortabwidgets["savesig_raw"].isChecked()
+        self.settingsdict["savesigtxt_raw"] = self.processortabwidgets["savesigtxt_raw"].isChecked()
 
         self.settingsdict["dtgwarn"] = self.processortabwidgets["dtgwarn"].isChecked()
         self.settingsdict["renametabstodtg"] = self.processortabwidgets["renametab"].isChecked()
         self.settingsdict["autosave"] = self.processortabwidgets["autosave"].isChecked()
         self.settingsdict["inc_audio_devices"] = self.processortabwidgets["inc_audio_devices"].isChecked()
+        self.settingsdict["statslog"] = self.processortabwidgets["statslog"].isChecked()
+        self.settingsdict["useprocesses"] = self.processortabwidgets["useprocesses"].isChecked()
         
 
         self.settingsdict["fftwindow"] = float(self.sigsettingstabwidgets["fftwindow"].value())/100
@@ -536,6 +504,7 @@ class RunSettings(QMainWindow):
         self.settingsdict['spindowndetectrt'] = self.sigsettingstabwidgets['spindowndetectrt'].isChecked()
         self.settingsdict['cptempmode'] = self.sigsettingstabwidgets['cptempmode'].isChecked() + 1
         self.settingsdict['cpfftwindow'] = float(self.sigsettingstabwidgets['cpfftwindow'].value())
+        self.settingsdict['cpffthop'] = float(self.sigsettingstabwidgets['cpffthop'].value())
         self.settingsdict['revcoil'] = self.sigsettingstabwidgets['revcoil'].isChecked()
         self.settingsdict['maglat'] = float(self.sigsettingstabwidgets['maglat'].value())
         self.settingsdict['maglon'] = float(self.sigsettingstabwidgets['maglon'].value()) 
@@ -619,6 +588,8 @@ class RunSettings(QMainWindow):
             self.processortabwidgets["savewav_raw"].setChecked(self.settingsdict["savewav_raw"])
             self.processortabwidgets["savesig_raw"] = QCheckBox('Signal Data') #13
             self.processortabwidgets["savesig_raw"].setChecked(self.settingsdict["savesig_raw"])
+            self.processortabwidgets["savesigtxt_raw"] = QCheckBox('Signal Data (Text)') #13
+            self.processortabwidgets["savesigtxt_raw"].setChecked(self.settingsdict["savesigtxt_raw"])
 
             self.processortabwidgets["dtgwarn"] = QCheckBox('Warn if DTG is not within past 12 hours') #14
             self.processortabwidgets["dtgwarn"].setChecked(self.settingsdict["dtgwarn"])
@@ -631,18 +602,24 @@ class RunSettings(QMainWindow):
             self.processortabwidgets["inc_audio_devices"] = QCheckBox('Include computer audio devices as available data sources') #16
             self.processortabwidgets["inc_audio_devices"].setChecked(self.settingsdict["inc_audio_devices"])
             
+            self.processortabwidgets["statslog"] = QCheckBox('Log processor timing and lag statistics (saved with signal data)') #17
+            self.processortabwidgets["statslog"].setChecked(self.settingsdict["statslog"])
+            
+            self.processortabwidgets["useprocesses"] = QCheckBox('Run each processor in a separate process (uses multiple CPU cores for concurrent drops)') #18
+            self.processortabwidgets["useprocesses"].setChecked(self.settingsdict["useprocesses"])
+            
                         
             # formatting widgets
             self.processortabwidgets["IDlabel"].setAlignment(Qt.AlignCenter | Qt.AlignVCenter)
 
             # should be 24 entries
-            widgetorder = ["autopopulatetitle", "autodtg", "autolocation", "autoID", "IDlabel", "IDedit", "missionlabel", "missionid", "filesavetypes", "savedta_raw", "savedat_raw", "savenvo_raw", "saveedf_raw","savewav_raw", "savesig_raw", "dtgwarn", "renametab", "autosave", "inc_audio_devices"]
+            widgetorder = ["autopopulatetitle", "autodtg", "autolocation", "autoID", "IDlabel", "IDedit", "missionlabel", "missionid", "filesavetypes", "savedta_raw", "savedat_raw", "savenvo_raw", "saveedf_raw","savewav_raw", "savesig_raw", "savesigtxt_raw", "dtgwarn", "renametab", "autosave", "inc_audio_devices", "statslog", "useprocesses"]
 
             #assigning column/row/column extension/row extension for each widget
-            wcols   = [1,1,1,1,1,2,1,2,4,4,4,4,4,4,4,1, 1, 1, 1]
-            wrows   = [1,2,3,4,5,5,6,6,1,2,3,4,5,6,7,9,10,11,12]
-            wrext   = [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1, 1, 1, 1]
-            wcolext = [2,2,2,2,1,1,1,1,1,1,1,1,1,1,1,4, 4, 4, 4]
+            wcols   = [1,1,1,1,1,2,1,2,4,4,4,4,4,4,4,4,1, 1, 1, 1, 1, 1]
+            wrows   = [1,2,3,4,5,5,6,6,1,2,3,4,5,6,7,8,9,10,11,12,13,14]
+            wrext   = [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1, 1, 1, 1, 1, 1]
+            wcolext = [2,2,2,2,1,1,1,1,1,1,1,1,1,1,1,1,4, 4, 4, 4, 4, 4]
             
 
             #adding widgets to assigned locations
@@ -653,9 +630,9 @@ class RunSettings(QMainWindow):
             colstretch = [5,1,1,2,5]
             for i,s in enumerate(colstretch):
                 self.processortablayout.setColumnStretch(i, s)
-            for i in range(0,12):
+            for i in range(0,15):
                 self.processortablayout.setRowStretch(i, 1)
-            self.processortablayout.setRowStretch(13, 4)
+            self.processortablayout.setRowStretch(15, 4)
             
 
             # applying the current layout for the tab
@@ -811,6 +788,13 @@ class RunSettings(QMainWindow):
             self.sigsettingstabwidgets["cpfftwindow"].setSingleStep(0.05)
             self.sigsettingstabwidgets["cpfftwindow"].setValue(np.round(self.settingsdict['cpfftwindow']*20)/20)
             
+            self.sigsettingstabwidgets["cpffthoplabel"] = QLabel("AXCP FFT Step (sec): ")
+            self.sigsettingstabwidgets["cpffthop"] = QDoubleSpinBox()  #39
+            self.sigsettingstabwidgets["cpffthop"].setMinimum(0.05)
+            self.sigsettingstabwidgets["cpffthop"].setMaximum(5)
+            self.sigsettingstabwidgets["cpffthop"].setSingleStep(0.05)
+            self.sigsettingstabwidgets["cpffthop"].setValue(np.round(self.settingsdict['cpffthop']*20)/20)
+            
             self.sigsettingstabwidgets["revcoil"] = QCheckBox('Reversed AXCP Coil') #40
             self.sigsettingstabwidgets["revcoil"].setChecked(self.settingsdict["revcoil"])
             
@@ -848,14 +832,14 @@ class RunSettings(QMainWindow):
             
 
             # should be 24 entries
-            widgetorder = ["axbtsiglabel", "fftwindowlabel", "fftwindow", "fftsiglevlabel", "fftsiglev", "fftratiolabel","fftratio", "triggersiglevlabel", "triggersiglev","triggerratiolabel","triggerratio", "axctdsiglabel", "minr400label", "minr400", "mindr7500label", "mindr7500", "deadfreqlabel", "deadfreq", "markfreqlabel", "markfreq", "spacefreqlabel", "spacefreq", "refreshratelabel", "refreshrate", "usebandpass", "axcpsiglabel", "cprefreshratelabel", "cprefreshrate", "axcpqualitylabel", "axcpquality", "spindowndetectrt", "cptempmode", "cpfftwindowlabel", "cpfftwindow", "revcoil", "spinupfrotmaxlabel", "spinupfrotmax", "spindownfrotmaxlabel", "spindownfrotmax", "maglatlabel", "maglat", "maglonlabel", "maglon"]
+            widgetorder = ["axbtsiglabel", "fftwindowlabel", "fftwindow", "fftsiglevlabel", "fftsiglev", "fftratiolabel","fftratio", "triggersiglevlabel", "triggersiglev","triggerratiolabel","triggerratio", "axctdsiglabel", "minr400label", "minr400", "mindr7500label", "mindr7500", "deadfreqlabel", "deadfreq", "markfreqlabel", "markfreq", "spacefreqlabel", "spacefreq", "refreshratelabel", "refreshrate", "usebandpass", "axcpsiglabel", "cprefreshratelabel", "cprefreshrate", "axcpqualitylabel", "axcpquality", "spindowndetectrt", "cptempmode", "cpfftwindowlabel", "cpfftwindow", "revcoil", "spinupfrotmaxlabel", "spinupfrotmax", "spindownfrotmaxlabel", "spindownfrotmax", "maglatlabel", "maglat", "maglonlabel", "maglon", "cpffthoplabel", "cpffthop"]
 
             #assigning column/row/column extension/row extension for each widget
             # wcols   = [5,5,5,5,5,5,5,5,5, 5, 5, 7,7,7,7,7,7,8,7,8,7,8, 7, 8, 7,10,10,11,10,11,10,10,10,11,10,10,11,10,11,10,11,10,11]
-            wcols = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 3, 3, 3, 3, 3, 3, 4, 3, 4, 3, 4, 3, 4, 3, 6, 6, 7, 6, 7, 6, 6, 6, 7, 6, 6, 7, 6, 7, 6, 7, 6, 7]
-            wrows   = [1,2,3,4,5,6,7,8,9,10,11, 1,2,3,4,5,7,7,8,8,9,9,10,10,11, 1, 2, 2, 3, 3, 4, 5, 6, 6, 7, 8, 8, 9, 9,10,10,11,11]
-            wrext   = [1,1,1,1,1,1,1,1,1, 1, 1, 1,1,1,1,1,1,1,1,1,1,1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-            wcolext = [1,1,1,1,1,1,1,1,1, 1, 1, 2,2,2,2,2,1,1,1,1,1,1, 1, 1, 2, 2, 1, 1, 1, 1, 2, 2, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 1]
+            wcols = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 3, 3, 3, 3, 3, 3, 4, 3, 4, 3, 4, 3, 4, 3, 6, 6, 7, 6, 7, 6, 6, 6, 7, 6, 6, 7, 6, 7, 6, 7, 6, 7, 6, 7]
+            wrows   = [1,2,3,4,5,6,7,8,9,10,11, 1,2,3,4,5,7,7,8,8,9,9,10,10,11, 1, 2, 2, 3, 3, 4, 5, 6, 6, 7, 8, 8, 9, 9,10,10,11,11,12,12]
+            wrext   = [1,1,1,1,1,1,1,1,1, 1, 1, 1,1,1,1,1,1,1,1,1,1,1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+            wcolext = [1,1,1,1,1,1,1,1,1, 1, 1, 2,2,2,2,2,1,1,1,1,1,1, 1, 1, 2, 2, 1, 1, 1, 1, 2, 2, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
             
 
             #adding widgets to assigned locations
@@ -866,7 +850,7 @@ class RunSettings(QMainWindow):
             colstretch = [5,3,5,2,1,5,2,1,5]
             for i,s in enumerate(colstretch):
                 self.sigsettingstablayout.setColumnStretch(i, s)
-            for i in range(0,12):
+            for i in range(0,13):
                 self.sigsettingstablayout.setRowStretch(i, 1)
             self.sigsettingstablayout.setRowStretch(13, 4)
             
@@ -0,0 +1,228 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file runs a parameter sweep over AXCP processing settings for a single recording.
+# Each combination of settings is processed with the AXCPEngine signal processing
+# methods in a separate worker process, all of which memory map the same copy of the audio.
+#
+# Example:
+#   grid = {"axcpquality":[1,2,3], "spinupfrotmax":[0.3,0.5,1.0]}
+#   results = run_AXCP_sweep("drop.WAV", grid, lat=25, lon=-85, dropdate=dt.date(2022,2,12))
+#   write_sweep_table(results, "drop_sweep.txt")
+
+
+import numpy as np
+import datetime as dt
+import os
+import wave
+import itertools
+import tempfile
+import time as timemodule
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from traceback import print_exc as trace_error
+
+import lib.DAS.common_DAS_functions as cdf
+from lib.DAS.DAS_AXCP import AXCPEngine
+
+
+#settings that can be varied by the sweep
+sweepsettings = ["axcpquality", "cptempmode", "cpfftwindow", "cpffthop", "spinupfrotmax", "spindownfrotmax"]
+
+
+
+
+# =============================================================================
+#   OFFLINE PROCESSOR FOR A SINGLE SWEEP CASE
+# =============================================================================
+
+#uses all AXCPEngine signal processing methods, but processes a preloaded (memory mapped) audio array
+#as fast as possible without receivers, temporary WAV copies, or GUI signal connections
+class AXCPSweepProcessor(AXCPEngine):
+
+    def __init__(self, audiostream, f_s, caseID=0, lat=20, lon=-80, dropdate=None, settings=None, sigdatafile=os.devnull):
+
+        if dropdate is None:
+            dropdate = dt.date.today()
+        if settings is None:
+            settings = {}
+
+        #skips AXCPEngine.__init__ (receiver/audio file setup) but runs the same source-independent initialization
+        self.status = 0
+        self.isfromaudio = True
+        self.isfromtest = False
+        self.audiostream = audiostream
+        self.f_s = f_s
+
+        self.initialize_processor_state(caseID, settings, "AXCP", sigdatafile) #stage timing (no stats log), full processing (no realtime backpressure)
+        self.initialize_AXCP_state(lat, lon, dropdate, settings)
+
+        self.signals = cdf.EngineSignals()
+
+
+    #processes the recording until spindown or the end of the audio, then refines the spindown point
+    def process(self):
+
+        startind = 0
+        while self.keepgoing and self.numpoints - startind >= self.minpointsperloop:
+            e = startind + self.minpointsperloop
+            self.demod_buffer = self.audiostream[startind:e]
+
+            oldstatus = self.status
+            self.iterate_AXCP_process(e)
+            startind = e
+
+            if oldstatus and not self.status: #spindown detected
+                self.keepgoing = False
+
+        self.on_axcp_terminate()
+        self.sigdata.close()
+
+
+
+
+# =============================================================================
+#   SWEEP FUNCTIONS
+# =============================================================================
+
+#builds a list of settings dicts from every combination of the values in grid (dict of setting name: list of values)
+def parameter_grid(grid):
+
+    for csetting in grid:
+        if csetting not in sweepsettings:
+            raise ValueError(f"Sweep setting {csetting} not recognized, must be one of {sweepsettings}")
+
+    names = list(grid.keys())
+    return [dict(zip(names, cvalues)) for cvalues in itertools.product(*[grid[cname] for cname in names])]
+
+
+
+#runs a single sweep case in a worker process- source is a WAV file (memory mapped with channel chselect) or .npy file
+def run_sweep_case(caseID, source, chselect, f_s, settings, lat, lon, dropdate):
+
+    result = {"case":caseID, "settings":settings, "status":0, "error":""}
+
+    try:
+        starttime = timemodule.perf_counter()
+
+        if source.lower().endswith('.npy'):
+            audiostream = np.load(source, mmap_mode='r')
+        else:
+            audiostream, f_s, result["status"] = cdf.read_audio_file(source, chselect, np.inf, mmap=True)
+            if result["status"]:
+                return result
+
+        processor = AXCPSweepProcessor(audiostream, f_s, caseID=caseID, lat=lat, lon=lon, dropdate=dropdate, settings=settings)
+        processor.process()
+
+        result["tspinup"] = processor.tspinup
+        result["tspindown"] = processor.tspindown
+        result["time"] = processor.TIME
+        result["depth"] = processor.DEPTH
+        result["temperature"] = processor.TEMP
+        result["Umag"] = processor.U_MAG
+        result["Vmag"] = processor.V_MAG
+        result["Utrue"] = processor.U_TRUE
+        result["Vtrue"] = processor.V_TRUE
+        result["rotf"] = processor.ROTF
+        result["proctime"] = timemodule.perf_counter() - starttime
+
+    except Exception:
+        trace_error()
+        result["status"] = 10
+        result["error"] = f"Sweep case {caseID} failed"
+
+    return result
+
+
+
+#processes audiofile once for every combination of settings in grid (see parameter_grid) in a process pool
+#basesettings are applied to every case (overwritten by grid values), progress(ncomplete, ntotal) is called as cases finish
+#returns a list of result dicts (in grid order) with the settings, spinup/spindown times, and profiles for each case
+def run_AXCP_sweep(audiofile, grid, chselect=0, lat=20, lon=-80, dropdate=None, basesettings=None, maxworkers=None, progress=None):
+
+    if dropdate is None:
+        dropdate = dt.date.today()
+    if basesettings is None:
+        basesettings = {}
+
+    allsettings = []
+    for csettings in parameter_grid(grid):
+        casesettings = basesettings.copy()
+        casesettings.update(csettings)
+        allsettings.append(casesettings)
+
+    #memory mapping the audio once to check it, workers map the same file
+    audiostream, f_s, status = cdf.read_audio_file(audiofile, chselect, np.inf, mmap=True)
+    if status:
+        raise ValueError(f"Unable to read audio file {audiofile} (error code {status})")
+
+    #summed multichannel audio can't be memory mapped from the WAV, so it is written once to a shared temporary file
+    tempdir = None
+    source = audiofile
+    with wave.open(audiofile) as file_info:
+        nchannels = file_info.getnchannels()
+    if nchannels > 1 and chselect < 1:
+        tempdir = tempfile.mkdtemp()
+        source = os.path.join(tempdir, 'sweepaudio.npy')
+        np.save(source, audiostream)
+    del audiostream
+
+    results = [None]*len(allsettings)
+    try:
+        with ProcessPoolExecutor(max_workers=maxworkers) as executor:
+            futures = {executor.submit(run_sweep_case, i, source, chselect, f_s, csettings, lat, lon, dropdate):i for (i,csettings) in enumerate(allsettings)}
+
+            for (n,future) in enumerate(as_completed(futures)):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception: #worker process died
+                    trace_error()
+                    results[i] = {"case":i, "settings":allsettings[i], "status":10, "error":f"Sweep case {i} failed"}
+                if progress is not None:
+                    progress(n+1, len(allsettings))
+
+    finally:
+        if tempdir is not None:
+            os.remove(source)
+            os.rmdir(tempdir)
+
+    return results
+
+
+
+#writes a comparison table (one row per case) of sweep settings, spinup/spindown times, and profile statistics
+def write_sweep_table(results, filename):
+
+    names = []
+    for result in results:
+        for cname in result["settings"]:
+            if cname not in names:
+                names.append(cname)
+
+    with open(filename,'w') as f_out:
+        f_out.write("case," + ",".join(names) + ",status,tspinup,tspindown,npoints,maxdepth,meantemp,meanUtrue,meanVtrue,proctime\n")
+
+        for result in results:
+            csettings = ",".join([str(result["settings"].get(cname,'')) for cname in names])
+
+            if result["status"] or len(result.get("depth",[])) == 0:
+                f_out.write(f"{result['case']},{csettings},{result['status']},{result.get('tspinup',np.NaN)},{result.get('tspindown',np.NaN)},0,NaN,NaN,NaN,NaN,{result.get('proctime',np.NaN)}\n")
+            else:
+                f_out.write(f"{result['case']},{csettings},{result['status']},{result['tspinup']:.2f},{result['tspindown']:.2f},{len(result['depth'])},{np.nanmax(result['depth']):.1f},{np.nanmean(result['temperature']):.3f},{np.nanmean(result['Utrue']):.3f},{np.nanmean(result['Vtrue']):.3f},{result['proctime']:.2f}\n")
+
@@ -20,11 +20,8 @@
 import numpy as np
 from scipy.signal import tukey #taper generation (AXBT-specific)
 
-from PyQt5.QtCore import pyqtSlot #run slot
-from PyQt5.Qt import QRunnable #base for Processor class
-
-import time as timemodule
 import datetime as dt
+import threading
 
 from traceback import print_exc as trace_error
 
@@ -32,26 +29,69 @@ import lib.DAS.common_DAS_functions as cdf
 
 
 
+#settings that change the profile generated from each point's peak frequency/signal level/signal ratio (see reevaluate_profile)
+reevaluatesettings = ["triggersiglev", "triggerfftratio", "minsiglev", "minfftratio", "tcoeff_axbt", "zcoeff_axbt"]
+
 
-class AXBTProcessor(QRunnable):
+
+#AXBT temperature/depth profile from the peak frequency (fp, Hz), signal level (Sp, dB) and signal ratio (Rp, 0-1) at each
+#time (sec), with the same trigger/point validity/conversion logic as the processor loop (e.g. from a sigdata file's data table).
+#If istriggered, the profile was triggered at firstpointtime, otherwise it is triggered at the first point exceeding the
+#trigger signal level/ratio. Returns the trigger time (-1 if not triggered), temperatures, and depths (NaN if not valid/triggered)
+def AXBT_profile_from_peaks(times, fp, Sp, Rp, settings, istriggered=False, firstpointtime=-1):
+    times = np.asarray(times, dtype=float)
+    fp = np.asarray(fp, dtype=float)
+    Sp = np.asarray(Sp, dtype=float)
+    Rp = np.asarray(Rp, dtype=float)
+    
+    #first point meeting trigger criteria
+    triggered = np.ones(len(times), dtype=bool)
+    if not istriggered:
+        triggerinds = np.where((Sp >= settings["triggersiglev"]) & (Rp >= settings["triggerfftratio"]))[0]
+        if len(triggerinds) > 0:
+            firstpointtime = times[triggerinds[0]]
+            triggered[:triggerinds[0]] = False
+        else:
+            firstpointtime = -1
+            triggered[:] = False
+            
+    #depths for all triggered points, temperatures where the signal level/ratio exceed the thresholds
+    depth = np.NaN * np.ones(len(times))
+    temperature = np.NaN * np.ones(len(times))
+    if triggered.any():
+        depth[triggered] = cdf.dataconvert(times[triggered] - firstpointtime, settings["zcoeff_axbt"])
+        valid = triggered & (Sp >= settings["minsiglev"]) & (Rp >= settings["minfftratio"])
+        temperature[valid] = cdf.dataconvert(fp[valid], settings["tcoeff_axbt"])
+        
+    return firstpointtime, np.round(temperature, 2), np.round(depth, 1)
+    
+    
+    
+
+#AXBT signal processing engine- plain python (no Qt), outputs are reported through the callbacks
+#connected to self.signals (cdf.EngineSignals by default). The GUI runs this through the
+#AXBTProcessor QRunnable adapter in qt_processors.py
+class AXBTEngine:
     
     #importing methods common to all AXBT/AXCTD processing threads
-    from ._processor_functions import (initialize_common_vars, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings)
+    from ._processor_functions import (initialize_common_vars, initialize_processor_state, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings, report_stats, wake, notify_audio, wait_for_audio, pause, start_iteration, end_iteration, check_receiver_contact, wait_for_termination)
     from ._DAS_callbacks import define_callbacks
     
     #kill: terminates the thread and emits an error message if necessary
     #killaudiorecording: stops appending PCM data to the audio file (if the file is too large)
-    #abort: pyqtslot for the GUI (user STOP button) to terminate the process
+    #abort: called by the GUI (user STOP button) to terminate the process
     #changecurrentfrequency: slot for the user to switch the VHF channel being demodulated/processed (receiver threads only- not audio/test threads)
-    #changethresholds- pyqtslot that changes the settings for the processor if a user adjusts the settings while a thread is active
+    #changethresholds- changes the settings for the processor if a user adjusts the settings while a thread is active
     #update_settings- updates the settings from an input dict to the processor thread, called during initialization and when changethresholds is called
+    #report_stats- emits processor stage timing/processing lag statistics (updatestats signal) about once per second
+    #wake, notify_audio, wait_for_audio, pause, wait_for_termination- condition variable waits/wakeups so the processor loop runs as soon as enough audio is received, and idles while waiting
+    #start_iteration, end_iteration, check_receiver_contact- common processor loop bookkeeping (iteration timing, receiver disconnect checks)
     
 
     #initializing current thread (saving variables, reading audio data or contacting/configuring receiver)
     #AXBT settings: fftwindow, minfftratio, minsiglev, triggerfftratio, triggersiglev, tcoeff_axbt, zcoeff_axbt, flims_axbt
     def __init__(self, dll, datasource, vhffreq, tabID, starttime, istriggered, firstpointtime, 
-        settings, tempdir, *args,**kwargs):
-        super(AXBTProcessor, self).__init__()
+        settings, tempdir, *args, signals=None, **kwargs):
 
         #prevents Run() method from starting before init is finished (value must be changed to 100 at end of __init__)
         self.threadstatus = 0
@@ -62,6 +102,12 @@ class AXBTProcessor(QRunnable):
         self.starttime = starttime
         self.istriggered = istriggered
         self.firstpointtime = firstpointtime
+        self.initialtrigger = (istriggered, firstpointtime) #profile was already triggered when processor started
+        
+        #time, peak frequency, signal level, and signal ratio for each point sent to the GUI, to reevaluate the profile with new settings
+        self.peaks = ([], [], [], [])
+        self.peaklock = threading.Lock() #reevaluate_profile is called from the GUI thread
+        self.reevaluations = 0 #number of reevaluations, sent with each point so the GUI can drop points sent before the latest one
         
         #initializing variables for taper and frequencies for FFT
         self.taper = []
@@ -70,18 +116,18 @@ class AXBTProcessor(QRunnable):
         #initializing non probe-specific variables and accessing receiver or opening audio file
         self.initialize_common_vars(tempdir,tabID,dll,settings,datasource,vhffreq,'AXBT')
         
-        #connecting signals to thread
-        self.signals = cdf.ProcessorSignals()
+        #connecting signals to thread (callbacks unless the Qt adapter passes pyqtSignals)
+        self.signals = signals if signals is not None else cdf.EngineSignals()
         
 
         if self.threadstatus: 
             self.keepgoing = False
         else: #if it's still 0, intialization was successful
             self.threadstatus = 100 #send signal to start running data acquisition thread
+            self.wake()
             
             
             
-    @pyqtSlot()
     def run(self):
         
         #waits for self.threadstatus to change to 100 (indicating __init__ finished) before proceeding
@@ -99,7 +145,6 @@ class AXBTProcessor(QRunnable):
                 # initializes audio callback function
                 status = cdf.initialize_receiver_callback(self.dll, self.sourcetype, self.hradio, receiver_callback, self.tabID)
                 if status:
-                    timemodule.sleep(0.3)  # gives the buffer time to populate
                     self.stream = status #important for PyAudio to be able to kill the stream
                     
                 else:
@@ -119,6 +164,7 @@ class AXBTProcessor(QRunnable):
             #MAIN PROCESSOR LOOP
             while self.keepgoing:
                 i += 1
+                self.start_iteration()
 
                 # finds time from profile start in seconds
                 curtime = dt.datetime.utcnow()  # current time
@@ -128,17 +174,10 @@ class AXBTProcessor(QRunnable):
                 if not self.isfromaudio and not self.isfromtest:
 
                     #protocal to kill thread if connection with WiNRADIO is lost
-                    if self.numcontacts == self.lastcontacts: #checks if the audio stream is receiving new data
-                        self.disconnectcount += 1
-                    else:
-                        self.disconnectcount = 0
-                        self.lastcontacts = self.numcontacts
-
-                    #if the audio stream hasn't received new data for several iterations and checking device connection fails
-                    if self.disconnectcount >= 30 and not cdf.check_connected(self.dll, self.sourcetype, self.hradio):
-                        self.kill(8)
+                    self.check_receiver_contact()
 
                     # listens to current frequency, gets sound level, set audio stream, and corresponding time
+                    framesprocessed = self.nframes
                     currentdata = self.audiostream[-int(self.f_s * self.settings["fftwindow"]):]
                     
                 else:
@@ -162,7 +201,9 @@ class AXBTProcessor(QRunnable):
                     
 
                 #identifying peak frequence + signal level/SNR from current PCM chunk
+                self.stats.start("fft")
                 fp,Sp,Rp = self.dofft(currentdata)        
+                self.stats.stop("fft")
         
                 #rounding before comparisons happen
                 ctime = np.round(ctime, 1)
@@ -171,46 +212,83 @@ class AXBTProcessor(QRunnable):
                 Rp = np.round(Rp, 3)        
                 
 
-                #writing raw data to sigdata file (ASCII) for current thread- before correcting for minratio/minsiglev
+                #writing raw data to sigdata file for current thread- before correcting for minratio/minsiglev
                 if self.keepgoing: #only writes if thread hasn't been stopped since start of current segment
-                    self.txtfile.write(f"{ctime},{fp},{Sp},{Rp}\n")
+                    self.stats.start("sigdata")
+                    self.sigdata.append("data", ctime, fp, Sp, Rp)
+                    self.stats.stop("sigdata")
+                    
+                #settings can't be changed by reevaluate_profile while the current point is processed
+                with self.peaklock:
                     
-                #logic to determine whether or not profile is triggered
-                if not self.istriggered and Sp >= self.settings["triggersiglev"] and Rp >= self.settings["triggerfftratio"]:
-                    self.istriggered = True
-                    self.firstpointtime = ctime
+                    #logic to determine whether or not profile is triggered
+                    if not self.istriggered and Sp >= self.settings["triggersiglev"] and Rp >= self.settings["triggerfftratio"]:
+                        self.istriggered = True
+                        self.firstpointtime = ctime
+                        if self.keepgoing: #won't send if keepgoing stopped since current iteration began
+                            self.signals.triggered.emit(self.tabID, 1, ctime) 
+                            
+                    #logic to determine whether or not point is valid
+                    ctemp = np.NaN
+                    cdepth = np.NaN
+                    if self.istriggered:
+                        cdepth = cdf.dataconvert(ctime - self.firstpointtime, self.settings["zcoeff_axbt"])
+                        if Sp >= self.settings["minsiglev"] and Rp >= self.settings["minfftratio"]:
+                            ctemp = cdf.dataconvert(fp, self.settings["tcoeff_axbt"])
+                    
+    
+                    # tells GUI to update data structure, plot, and table
+                    ctemp = np.round(ctemp, 2)
+                    cdepth = np.round(cdepth, 1)
                     if self.keepgoing: #won't send if keepgoing stopped since current iteration began
-                        self.signals.triggered.emit(self.tabID, 1, ctime) 
-                        
-                #logic to determine whether or not point is valid
-                ctemp = np.NaN
-                cdepth = np.NaN
-                if self.istriggered:
-                    cdepth = cdf.dataconvert(ctime - self.firstpointtime, self.settings["zcoeff_axbt"])
-                    if Sp >= self.settings["minsiglev"] and Rp >= self.settings["minfftratio"]:
-                        ctemp = cdf.dataconvert(fp, self.settings["tcoeff_axbt"])
-                
-
-                # tells GUI to update data structure, plot, and table
-                ctemp = np.round(ctemp, 2)
-                cdepth = np.round(cdepth, 1)
-                if self.keepgoing: #won't send if keepgoing stopped since current iteration began
-                    self.signals.iterated.emit(self.tabID, [ctemp, cdepth, fp, Sp, np.round(100*Rp,1), ctime])
+                        self.stats.start("emit")
+                        for (cpeaks, cval) in zip(self.peaks, [ctime, fp, Sp, Rp]):
+                            cpeaks.append(cval)
+                        self.signals.iterated.emit(self.tabID, [ctemp, cdepth, fp, Sp, np.round(100*Rp,1), ctime, self.reevaluations])
+                        self.stats.stop("emit")
+                    
+                #the newest audio is sampled every iteration, so realtime/test processing lags by the time to process it
+                iterationtime = self.end_iteration()
+                if not self.isfromaudio:
+                    self.stats.set_lag(iterationtime)
 
-                if not self.isfromaudio: 
-                    timemodule.sleep(0.1)  #pauses when processing in realtime (fs ~ 10 Hz)
-                else:
-                    timemodule.sleep(0.001) #slight pause to free some resources when processing from audio
+                #realtime: waits for the next 0.1 sec of audio (fs ~ 10 Hz), test: pauses 0.1 sec, audio: continues immediately
+                if self.isfromtest:
+                    self.pause(0.1)
+                elif not self.isfromaudio:
+                    self.wait_for_audio(framesprocessed + int(0.1*self.f_s), 1)
 
         except Exception: #if the thread encounters an error, terminate
             trace_error()  # if there is an error, terminates processing
             if self.keepgoing:
                 self.kill(10)
                 
-        while self.waittoterminate: #waits for kill process to complete to avoid race conditions with audio buffer callback
-            timemodule.sleep(0.1)
+        self.wait_for_termination() #waits for kill process to complete to avoid race conditions with audio buffer callback
+            
+            
+    #regenerates the whole profile from the cached peak frequency/signal level/ratio for each point with updated settings
+    #(trigger/minimum signal levels and ratios, conversion coefficients), sending it with the reevaluated signal.
+    #Subsequent points use the new settings. Returns the temperatures and depths, or None if no settings changed
+    def reevaluate_profile(self, settings=None):
+        with self.peaklock:
+            if settings is not None:
+                changed = any([ckey in settings and settings[ckey] != self.settings[ckey] for ckey in reevaluatesettings])
+                self.update_settings(settings)
+                if not changed:
+                    return None
+                    
+            times, fp, Sp, Rp = [np.asarray(cpeaks, dtype=float) for cpeaks in self.peaks]
+            firstpointtime, temperature, depth = AXBT_profile_from_peaks(times, fp, Sp, Rp, self.settings, *self.initialtrigger)
+            self.istriggered = bool(self.initialtrigger[0] or firstpointtime >= 0)
+            self.firstpointtime = firstpointtime
             
+            #points already sent may still be queued for the GUI (the reevaluated profile includes them)
+            self.reevaluations += 1
+            self.signals.reevaluated.emit(self.tabID, [self.istriggered, float(firstpointtime), temperature.tolist(), depth.tolist(), fp.tolist(), Sp.tolist(), np.round(100*Rp,1).tolist(), times.tolist(), self.reevaluations])
             
+        return temperature, depth
+        
+        
     #run fft on a chunk of AXBT PCM data, determine peak frequency/signal level/ratio
     def dofft(self, pcmdata):
         
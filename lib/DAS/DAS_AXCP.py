@@ -21,11 +21,8 @@
 import numpy as np
 from scipy import signal
 
-from PyQt5.QtCore import pyqtSlot #run slot
-from PyQt5.Qt import QRunnable #base for Processor class
-
-import time as timemodule
 import datetime as dt
+import threading
 
 from traceback import print_exc as trace_error
 
@@ -37,71 +34,87 @@ import lib.DAS.geomag_axbps as gm
 
 
 
-class AXCPProcessor(QRunnable):
+#AXCP signal processing engine- plain python (no Qt), outputs are reported through the callbacks
+#connected to self.signals (cdf.EngineSignals by default). The GUI runs this through the
+#AXCPProcessor QRunnable adapter in qt_processors.py
+class AXCPEngine:
     
     #importing methods common to all AXBT/AXCTD/AXCP processing threads
-    from ._processor_functions import (initialize_common_vars, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings)
+    from ._processor_functions import (initialize_common_vars, initialize_processor_state, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings, report_stats, wake, notify_audio, wait_for_audio, pause, start_iteration, end_iteration, check_receiver_contact, wait_for_termination, check_backpressure, drop_audio)
     from ._DAS_callbacks import define_callbacks
     
     #importing AXCP specific functions
-    from ._AXCP_decode_fxns import (init_AXCP_settings, initialize_AXCP_arrays, initialize_AXCP_vars, init_fft_window, dofft, init_filters, init_constants, first_subsample, second_subsample, calc_current_datapoint, iterate_AXCP_process, refine_spindown_prof, calculate_true_velocities)
+    from ._AXCP_decode_fxns import (init_AXCP_settings, initialize_AXCP_arrays, initialize_AXCP_vars, init_fft_window, dofft, calc_fft_temps, init_filters, init_constants, first_subsample, second_subsample, get_fit_windows, get_ready_fit_windows, get_fit_segments, calc_current_datapoints, process_profile_points, iterate_AXCP_process, refine_spindown_prof, calculate_true_velocities, set_processing_level)
     from ._AXCP_convert_fxns import (calc_temp_from_freq, calc_vel_components, calc_currents)
     
     #kill: terminates the thread and emits an error message if necessary
     #killaudiorecording: stops appending PCM data to the audio file (if the file is too large)
-    #abort: pyqtslot for the GUI (user STOP button) to terminate the process
+    #abort: called by the GUI (user STOP button) to terminate the process
     #changecurrentfrequency: slot for the user to switch the VHF channel being demodulated/processed (receiver threads only- not audio/test threads)
-    #changethresholds- pyqtslot that changes the settings for the processor if a user adjusts the settings while a thread is active
+    #changethresholds- changes the settings for the processor if a user adjusts the settings while a thread is active
     #update_settings- updates the settings from an input dict to the processor thread, called during initialization and when changethresholds is called
+    #report_stats- emits processor stage timing/processing lag statistics (updatestats signal) about once per second
+    #wake, notify_audio, wait_for_audio, pause, wait_for_termination- condition variable waits/wakeups so the processor loop runs as soon as enough audio is received, and idles while waiting
+    #start_iteration, end_iteration, check_receiver_contact- common processor loop bookkeeping (iteration timing, receiver disconnect checks)
+    #check_backpressure/drop_audio- switch to cheaper processing (set_processing_level) or drop the oldest audio if realtime processing falls behind
     
 
     #initializing current thread (saving variables, reading audio data or contacting/configuring receiver)
     #AXBT settings: fftwindow, minfftratio, minsiglev, triggerfftratio, triggersiglev, tcoeff, zcoeff, flims
-    def __init__(self, dll, datasource, vhffreq, tabID, starttime=dt.datetime.utcnow(), status=0, triggertime=-1, lat=20, lon=-80, dropdate=dt.date.today(), settings={}, tempdir='', *args, **kwargs):
+    def __init__(self, dll, datasource, vhffreq, tabID, starttime=dt.datetime.utcnow(), status=0, triggertime=-1, lat=20, lon=-80, dropdate=dt.date.today(), settings={}, tempdir='', *args, signals=None, **kwargs):
         
-        super(AXCPProcessor, self).__init__()
         
         #prevents Run() method from starting before init is finished (value must be changed to 100 at end of __init__)
         self.threadstatus = 0
         
         self.probetype = "AXCP"
         
-        self.processing_active = False #this is true whenever a chunk of data is being processed
-        self.lock_processing = False #change this to true to pause data processing
-        
         #AXCP specific variables
         self.starttime = starttime
         self.triggertime = triggertime
         
         self.status = status
         
-        #updating position, magnetic field components/declination
-        self.gm = gm.GeoMag(wmm_filename= 'lib/DAS/WMM.COF') #this must be initialized first
-        self.update_position(lat, lon, dropdate)
-        
-        
         #initializing non probe-specific variables and accessing receiver or opening audio file
         self.initialize_common_vars(tempdir,tabID,dll,settings,datasource,vhffreq,'AXCP')
         
-        #initialize default settings, override user-specified ones
-        self.init_AXCP_settings(settings)     
-        
-        #initializing buffers and output profile arrays **must be called before initialize_AXCP_vars**
-        self.initialize_AXCP_arrays()
-            
-        #initializing AXCP processor specific vars, as well as filter and conversion coefficients 
-        self.initialize_AXCP_vars()
+        #initializing position, settings, and profile arrays/variables
+        self.initialize_AXCP_state(lat, lon, dropdate, settings)
         
-        #connecting signals to thread
-        self.signals = cdf.ProcessorSignals()
+        #connecting signals to thread (callbacks unless the Qt adapter passes pyqtSignals)
+        self.signals = signals if signals is not None else cdf.EngineSignals()
         
                 
         if self.threadstatus: 
             self.keepgoing = False
         else: #if it's still 0, intialization was successful
             self.threadstatus = 100 #send signal to start running data acquisition thread
+            self.wake()
+        
+            
+            
+            
+    #initializes the AXCP processor state that doesn't depend on the data source (self.f_s must already be set):
+    #position/magnetic field, position update locking, settings, and profile arrays/variables. Called by __init__
+    #and by AXCPSweepProcessor (AXCP_sweep.py), so anything added here is set up for both
+    def initialize_AXCP_state(self, lat, lon, dropdate, settings):
+        
+        self.pending_position = None #(lat, lon, date) from the GUI, applied by the processor thread between chunks
+        self.positionlock = threading.Lock() #serializes position updates and the end of profile refinement (on_axcp_terminate)
+        self.loopfinished = False #set once run() is done with the profile, after which the GUI thread applies updates
+        
+        #updating position, magnetic field components/declination
+        self.gm = gm.GeoMag(wmm_filename=cdf.resource_path('lib','DAS','WMM.COF')) #must be initialized before the AXCP vars (init_constants)
+        self.update_position(lat, lon, dropdate)
+        
+        #initialize default settings, override user-specified ones
+        self.init_AXCP_settings(settings)     
         
+        #initializing buffers and output profile arrays **must be called before initialize_AXCP_vars**
+        self.initialize_AXCP_arrays()
             
+        #initializing AXCP processor specific vars, as well as filter and conversion coefficients 
+        self.initialize_AXCP_vars()
             
             
     def update_position(self, lat, lon, dropdate):
@@ -114,40 +127,46 @@ class AXCPProcessor(QRunnable):
         self.dec = self.magvar.dec #positive is East
             
             
-    def update_position_profile(self,lat,lon,dropdate ): #TODO- pyqt slot
-        while self.processing_active: #wait for current segment to finish
-            timemodule.sleep(0.1)
-        self.lock_processing = True #prevent AXCP DAS from processing new chunks of data until this is complete
-        
-        self.update_position(lat,lon,dropdate) #updates position/date, mag parameters
-        self.init_constants() #needed to recalculate magvar related parameters
-        
-        #reprocesses profile U and V (mag/true) from mag params
-        if self.tspinup >= 0:
-            self.reprocess_profdata()
-            self.signals.emit_profile_update.emit(self.tabID, [self.U_MAG, self.V_MAG, self.U_TRUE, self.V_TRUE]) #sends all profile info back to main slot
-        
-        timemodule.sleep(0.2) #make the DAS wait for the GUI to receive/update the profiles 
-        self.lock_processing = False #prevent AXCP DAS from processing new chunks of data until this is complete
+    #queues a position/date update (called from the GUI thread)- the processor thread applies it between chunks
+    #so acquisition is never paused, or it is applied here once run() is done with the profile (the last update
+    #queued while run() is still finishing is applied by the processor thread when the loop exits)
+    def update_position_profile(self,lat,lon,dropdate ):
+        with self.positionlock:
+            self.pending_position = (lat, lon, dropdate) #the latest update always wins
+            loopfinished = self.loopfinished
+        if loopfinished:
+            self.apply_pending_position()
+            
+            
+    def apply_pending_position(self):
+        with self.positionlock:
+            position = self.pending_position
+            if position is None:
+                return
+            self.pending_position = None
+            
+            self.update_position(*position) #updates position/date, mag parameters
+            self.init_constants() #needed to recalculate magvar related parameters
+            
+            #reprocesses profile U and V (mag/true) from mag params
+            if self.tspinup >= 0:
+                self.reprocess_profdata()
+                self.signals.emit_profile_update.emit(self.tabID, [self.U_MAG, self.V_MAG, self.U_TRUE, self.V_TRUE]) #sends all profile info back to main slot
+                
+                
+    #called by the processor thread once the loop has exited: applies any queued position update, after which
+    #updates from the GUI are applied immediately
+    def finish_position_updates(self):
+        self.apply_pending_position()
+        with self.positionlock:
+            self.loopfinished = True
+        self.apply_pending_position() #update queued between the two calls above
         
         
     #reprocessing U and V with updated position/time/magnetic parameters
+    #calc_currents and calculate_true_velocities are elementwise, so the whole profile is recalculated at once from the stored fit coefficients
     def reprocess_profdata(self):
-        
-        self.U_MAG = np.array([])
-        self.V_MAG = np.array([])
-        self.VERR = np.array([])
-        self.AREA = np.array([])
-        self.AERR = np.array([])
-        for (rotfavg, fccr, fefr, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep, w) in zip(self.ROTF, self.FCCR, self.FEFR, self.VC0A, self.VC0P, self.VE0A, self.VE0P, self.GCCA, self.GEFA, self.NINDEP, self.W):
-            area, aerr, umag, vmag, verr = self.calc_currents(rotfavg, fccr, fefr, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep, w)
-                
-            self.U_MAG = np.append(self.U_MAG, umag)
-            self.V_MAG = np.append(self.V_MAG, vmag)
-            self.VERR = np.append(self.VERR, verr)
-            self.AREA = np.append(self.AREA, area)
-            self.AERR = np.append(self.AERR, aerr)
-                
+        self.AREA, self.AERR, self.U_MAG, self.V_MAG, self.VERR = self.calc_currents(self.ROTF, self.FCCR, self.FEFR, self.VC0A, self.VC0P, self.VE0A, self.VE0P, self.GCCA, self.GEFA, self.NINDEP, self.W)
         self.U_TRUE, self.V_TRUE = self.calculate_true_velocities(self.U_MAG, self.V_MAG)
         
     
@@ -156,14 +175,17 @@ class AXCPProcessor(QRunnable):
     #   detect identifies that the probe has spun down and auto-stops processing (AXCP specific)
     #after finishing entire profile, refine the spindown point, correct amean, and adjust the profile
     def on_axcp_terminate(self):
-        if self.tspinup >= 0 and len(self.TIME) > 0: #spinup detected, valid profile points recorded
-            self.refine_spindown_prof()
+        with self.positionlock: #kill() may run on the GUI thread while the processor thread applies a position update
+            if self.tspinup >= 0 and len(self.TIME) > 0: #spinup detected, valid profile points recorded
+                self.refine_spindown_prof()
         
-    @pyqtSlot()
     def run(self):
         
         #waits for self.threadstatus to change to 100 (indicating __init__ finished) before proceeding
         self.wait_to_run()
+        if not self.keepgoing: #initialization failed- processor was already terminated (and sigdata file closed)
+            self.finish_position_updates()
+            return
         
         #defining radio receiver callbacks within scope with access to self variable
         receiver_callback = self.define_callbacks("AXCP", self.sourcetype)
@@ -173,7 +195,7 @@ class AXCPProcessor(QRunnable):
             cursource = self.audiofile
         else:
             cursource = self.serial
-        self.txtfile.write(f"AXCP Processor initialized : source={self.sourcetype} ({cursource}), fs={self.f_s} Hz\n")
+        self.sigdata.write(f"AXCP Processor initialized : source={self.sourcetype} ({cursource}), fs={self.f_s} Hz\n")
 
         
         try:
@@ -184,7 +206,6 @@ class AXCPProcessor(QRunnable):
                 # initializes audio callback function
                 status = cdf.initialize_receiver_callback(self.dll, self.sourcetype, self.hradio, receiver_callback, self.tabID)
                 if status:
-                    timemodule.sleep(0.3)  # gives the buffer time to populate
                     self.stream = status #important for PyAudio to be able to kill the stream
                     
                 else:
@@ -211,102 +232,109 @@ class AXCPProcessor(QRunnable):
             #MAIN PROCESSOR LOOP
             while self.keepgoing:
                 
-                if not self.lock_processing:
-                    
-                    self.processing_active = True
-                    i += 1
-    
-                    if not self.isfromaudio and not self.isfromtest:
-    
-                        #protocal to kill thread if connection with WiNRADIO is lost
-                        if self.numcontacts == self.lastcontacts: #checks if the audio stream is receiving new data
-                            self.disconnectcount += 1
-                        else:
-                            self.disconnectcount = 0
-                            self.lastcontacts = self.numcontacts
-    
-                        #if the audio stream hasn't received new data for several iterations and checking device connection fails
-                        if self.disconnectcount >= 30 and not cdf.check_connected(self.dll, self.sourcetype, self.hradio):
-                            self.kill(8)
-                            
-                        #removing processed data from head of buffer
-                        if buffer_head > 0:
-                            self.demod_buffer = np.delete(self.demod_buffer, range(buffer_head))
-                            
-                        #pulling data from audio buffer
-                        lenbuffer = len(self.audiostream)
-                        if lenbuffer >= self.minpointsperloop:
-                            self.demod_buffer = np.append(self.demod_buffer, self.audiostream[:lenbuffer])
-                            del self.audiostream[:lenbuffer] #pull data from receiver buffer to demodulation buffer, remove data from head of receiver buffer
-                            e += lenbuffer #increases buffer tail by number of appended points
-                        
-                        #if the buffer length isn't long enough, then start index = end index
-                        #causes processor to skip this iteration and add more points to the buffer
-                        
-                        
-                        
-                    else:
-                        #kill test/audio threads once time exceeds the max time of the audio file
-                        #NOTE: need to do this on the cycle before hitting the max time when processing from audio because the WAV file processes faster than the thread can kill itself
-                        
-                        #calculating end of next slice of PCM data for signal level calcuation and demodulation
-                        e = self.demodbufferstartind + self.minpointsperloop
-                        
-                        if self.numpoints - self.demodbufferstartind < self.minpointsperloop: #kill process at file end
-                            self.kill(0)
-                        
-                        elif e >= self.numpoints: #terminate loop if at end of file
-                            e = self.numpoints - 1
-                            
-                        
-                        #updates progress every iteration
-                        if self.isfromaudio:
-                            self.signals.updateprogress.emit(self.tabID, int(self.demodbufferstartind / self.numpoints * 100))
+                #applying any drop position update from the GUI before processing the next chunk
+                self.apply_pending_position()
+                
+                i += 1
+                self.start_iteration()
+
+                if not self.isfromaudio and not self.isfromtest:
+
+                    #protocal to kill thread if connection with WiNRADIO is lost
+                    self.check_receiver_contact()
                         
-                        #add next round of PCM data to buffer for signal calculation and demodulation
-                        # self.demod_buffer = np.append(self.demod_buffer, self.audiostream[self.demodbufferstartind:e])
-                        self.demod_buffer = self.audiostream[self.demodbufferstartind:e]
+                    #removing processed data from head of buffer
+                    self.stats.start("buffer")
+                    if buffer_head > 0:
+                        self.demod_buffer = np.delete(self.demod_buffer, range(buffer_head))
                         
-    
+                    #pulling data from audio buffer
+                    lenbuffer = len(self.audiostream)
+                    if lenbuffer >= self.minpointsperloop:
+                        self.demod_buffer = np.append(self.demod_buffer, self.audiostream[:lenbuffer])
+                        del self.audiostream[:lenbuffer] #pull data from receiver buffer to demodulation buffer, remove data from head of receiver buffer
+                        e += lenbuffer #increases buffer tail by number of appended points
+                    self.stats.stop("buffer")
+                    
+                    #processing lag = received audio that hasn't been processed (demod buffer + receiver buffer)
+                    lag = (len(self.demod_buffer) + len(self.audiostream))/self.f_s
+                    self.stats.set_lag(lag)
+                    
+                    #switching to cheaper processing, or dropping the oldest audio, if processing has fallen too far behind
+                    ndrop = self.check_backpressure(lag)
+                    if ndrop > 0:
+                        self.drop_audio(ndrop)
+                    
+                    #if the buffer length isn't long enough, then start index = end index
+                    #causes processor to skip this iteration and add more points to the buffer
+                    
+                    
+                    
+                else:
+                    #kill test/audio threads once time exceeds the max time of the audio file
+                    #NOTE: need to do this on the cycle before hitting the max time when processing from audio because the WAV file processes faster than the thread can kill itself
+                    
+                    #calculating end of next slice of PCM data for signal level calcuation and demodulation
+                    e = self.demodbufferstartind + self.minpointsperloop
+                    
+                    if self.numpoints - self.demodbufferstartind < self.minpointsperloop: #kill process at file end
+                        self.kill(0)
+                    
+                    elif e >= self.numpoints: #terminate loop if at end of file
+                        e = self.numpoints - 1
                         
                     
-                    if e >= self.demodbufferstartind + self.minpointsperloop and self.keepgoing: #only process buffer if there is enough data
+                    #updates progress every iteration
+                    if self.isfromaudio:
+                        self.signals.updateprogress.emit(self.tabID, int(self.demodbufferstartind / self.numpoints * 100))
+                    
+                    #add next round of PCM data to buffer for signal calculation and demodulation
+                    # self.demod_buffer = np.append(self.demod_buffer, self.audiostream[self.demodbufferstartind:e])
+                    self.demod_buffer = self.audiostream[self.demodbufferstartind:e]
                     
+                    #test processing lag = time since start - audio time processed (no lag when reprocessing audio files)
+                    if self.isfromtest:
+                        self.stats.set_lag((dt.datetime.utcnow() - self.starttime).total_seconds() - self.demodbufferstartind/self.f_s)
+                    
+
+                    
+                
+                if e >= self.demodbufferstartind + self.minpointsperloop and self.keepgoing: #only process buffer if there is enough data
+                
+                    
+                    #demodulating and parsing current batch of AXCTD PCM data
+                    oldstatus = self.status
+                    data = self.iterate_AXCP_process(e)
+                    if self.status and not oldstatus: #spinup detected/profile collection triggered
+                        #release signal indicating probe triggered
+                        self.signals.triggered.emit(self.tabID, self.status, self.tspinup)
+                    
+                    #won't send if keepgoing stopped since current iteration began
+                    if self.keepgoing and len(data) > 0: 
+                        self.stats.start("emit")
+                        self.signals.iterated.emit(self.tabID, data) #updating data in GUI loop
+                        self.stats.stop("emit")
                         
-                        #demodulating and parsing current batch of AXCTD PCM data
-                        oldstatus = self.status
-                        data = self.iterate_AXCP_process(e)
-                        if self.status and not oldstatus: #spinup detected/profile collection triggered
-                            #release signal indicating probe triggered
-                            self.signals.triggered.emit(self.tabID, self.status, self.tspinup)
+                    #wait to run this until any final data has been passed
+                    if not self.status and oldstatus: #spindown detected
+                        self.kill(0) #auto terminate on spindown
                         
-                        #won't send if keepgoing stopped since current iteration began
-                        if self.keepgoing and len(data) > 0: 
-                            self.signals.iterated.emit(self.tabID, data) #updating data in GUI loop
-                            
-                        #wait to run this until any final data has been passed
-                        if not self.status and oldstatus: #spindown detected
-                            self.kill(0) #auto terminate on spindown
-                            
-                        #increment demod buffer index forward
-                        buffer_head = e - self.demodbufferstartind
-                        self.demodbufferstartind = e 
+                    #increment demod buffer index forward
+                    buffer_head = e - self.demodbufferstartind
+                    self.demodbufferstartind = e 
+                
+                else:
+                    buffer_head = 0
                     
-                    else:
-                        buffer_head = 0
+                self.end_iteration()
                         
                         
-                self.processing_active = False
-                
-                #sleeping until ready to process more data (sleep length is datasource-dependent)
-                if self.isfromtest: #sleep until real time catches up to number of demodulated points
+                #waiting until ready to process more data (datasource-dependent)
+                if self.isfromtest: #wait until real time catches up to number of demodulated points
                     ctimeinaudio = self.demodbufferstartind/self.f_s
-                    while (dt.datetime.utcnow() - self.starttime).total_seconds() < ctimeinaudio:
-                        timemodule.sleep(0.01)
-                elif self.isfromaudio: 
-                    timemodule.sleep(0.001) #slight pause to free some resources when processing from audio
-                else: 
-                    timemodule.sleep(0.1) #realtime processing- wait 0.1 sec for buffer to refill
+                    self.pause(ctimeinaudio - (dt.datetime.utcnow() - self.starttime).total_seconds())
+                elif not self.isfromaudio: #realtime processing- wait until the receiver buffer holds the next chunk of audio (or 1 sec for receiver contact checks)
+                    self.wait_for_audio(self.nframes + self.minpointsperloop - len(self.audiostream), 1)
                     
 
         except Exception: #if the thread encounters an error, terminate
@@ -314,8 +342,10 @@ class AXCPProcessor(QRunnable):
             if self.keepgoing:
                 self.kill(10)
                 
-        while self.waittoterminate: #waits for kill process to complete to avoid race conditions with audio buffer callback
-            timemodule.sleep(0.1)
+        #applying any position update received while the final chunk was processed
+        self.finish_position_updates()
+                
+        self.wait_for_termination() #waits for kill process to complete to avoid race conditions with audio buffer callback
             
         
 
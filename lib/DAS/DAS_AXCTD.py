@@ -19,11 +19,8 @@
 
 import numpy as np
 from scipy import signal
+import os
 
-from PyQt5.QtCore import pyqtSlot #run slot
-from PyQt5.Qt import QRunnable #base for Processor class
-
-import time as timemodule
 import datetime as dt
 
 from traceback import print_exc as trace_error
@@ -32,30 +29,37 @@ import lib.DAS.common_DAS_functions as cdf
 
 import lib.DAS.demodulate as demodulate
 import lib.DAS.parseAXCTD as parse
+from lib.DAS.DAS_bitstream import write_bitstream
 
 
 
 
-class AXCTDProcessor(QRunnable):
+#AXCTD signal processing engine- plain python (no Qt), outputs are reported through the callbacks
+#connected to self.signals (cdf.EngineSignals by default). The GUI runs this through the
+#AXCTDProcessor QRunnable adapter in qt_processors.py
+class AXCTDEngine:
     
     #importing methods common to all AXBT/AXCTD processing threads
-    from ._processor_functions import (initialize_common_vars, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings)
+    from ._processor_functions import (initialize_common_vars, initialize_processor_state, wait_to_run, kill, killaudiorecording, abort, changecurrentfrequency, changethresholds, update_settings, report_stats, wake, notify_audio, wait_for_audio, pause, start_iteration, end_iteration, check_receiver_contact, wait_for_termination, check_backpressure, drop_audio)
     from ._DAS_callbacks import define_callbacks
     
     #kill: terminates the thread and emits an error message if necessary
     #killaudiorecording: stops appending PCM data to the audio file (if the file is too large)
-    #abort: pyqtslot for the GUI (user STOP button) to terminate the process
+    #abort: called by the GUI (user STOP button) to terminate the process
     #changecurrentfrequency: slot for the user to switch the VHF channel being demodulated/processed (receiver threads only- not audio/test threads)
-    #changethresholds- pyqtslot that changes the settings for the processor if a user adjusts the settings while a thread is active
+    #changethresholds- changes the settings for the processor if a user adjusts the settings while a thread is active
     #update_settings- updates the settings from an input dict to the processor thread, called during initialization and when changethresholds is called
+    #report_stats- emits processor stage timing/processing lag statistics (updatestats signal) about once per second
+    #wake, notify_audio, wait_for_audio, pause, wait_for_termination- condition variable waits/wakeups so the processor loop runs as soon as enough audio is received, and idles while waiting
+    #start_iteration, end_iteration, check_receiver_contact- common processor loop bookkeeping (iteration timing, receiver disconnect checks)
+    #check_backpressure/drop_audio- switch to cheaper processing (set_processing_level) or drop the oldest audio if realtime processing falls behind
     
 
     #initializing current thread (saving variables, reading audio data or contacting/configuring receiver)
     #AXBT settings: fftwindow, minfftratio, minsiglev, triggerfftratio, triggersiglev, tcoeff, zcoeff, flims
     def __init__(self, dll, datasource, vhffreq, tabID, starttime, triggerstatus, firstpointtime, firstpulsetime,
-        settings, tempdir, *args,**kwargs):
+        settings, tempdir, *args, signals=None, **kwargs):
         
-        super(AXCTDProcessor, self).__init__()
 
         #prevents Run() method from starting before init is finished (value must be changed to 100 at end of __init__)
         self.threadstatus = 0
@@ -78,6 +82,7 @@ class AXCTDProcessor(QRunnable):
                 
         #initializing non probe-specific variables and accessing receiver or opening audio file
         self.initialize_common_vars(tempdir,tabID,dll,settings,datasource,vhffreq,'AXCTD')
+        self.bitstreamfilename = os.path.join(tempdir, "bitstream_" + str(self.tabID) + '.npz') #demodulated bitstream (see DAS_bitstream.py)
         
         #initializing AXCTD processor specific vars
         self.initialize_AXCTD_vars()
@@ -86,14 +91,15 @@ class AXCTDProcessor(QRunnable):
         self.load_AXCTD_settings()
         
         
-        #connecting signals to thread
-        self.signals = cdf.ProcessorSignals()
+        #connecting signals to thread (callbacks unless the Qt adapter passes pyqtSignals)
+        self.signals = signals if signals is not None else cdf.EngineSignals()
         
                 
         if self.threadstatus: 
             self.keepgoing = False
         else: #if it's still 0, intialization was successful
             self.threadstatus = 100 #send signal to start running data acquisition thread
+            self.wake()
             
             
             
@@ -111,7 +117,7 @@ class AXCTDProcessor(QRunnable):
         self.metadata = parse.initialize_axctd_metadata()
         self.metadata['counter_found_2'] = [False] * 72
         self.metadata['counter_found_3'] = [False] * 72
-        self.tempLUT = parse.read_temp_LUT('lib/DAS/temp_LUT.txt')
+        self.tempLUT = parse.read_temp_LUT(cdf.resource_path('lib','DAS','temp_LUT.txt'))
         
         #store powers at different frequencies used to ID profile start
         self.p400 = np.array([])
@@ -169,6 +175,11 @@ class AXCTDProcessor(QRunnable):
         self.r400_buffer = []
         self.r7500_buffer = [] #holds 7500 Hz sig lev ratios corresponding to each bit
         
+        #post-trigger bitstream saved at termination for reparsing without the audio (see DAS_bitstream.py)
+        #chunks: number of bits added to the binary buffer before each parsing iteration
+        self.bitstream = {"bits":[], "inds":[], "conf":[], "r400":[], "r7500":[], "chunks":[]}
+        self.nunparsed = {"bits":0, "inds":0, "conf":0, "r400":0, "r7500":0} #length of each buffer after the last parsing iteration
+        
         
         #-1: not processing, 0: no pulses, 1: found pulse, 2: active profile parsing
         self.status = -1 
@@ -186,7 +197,7 @@ class AXCTDProcessor(QRunnable):
         #settings pulled from AXBPS GUI and passed to AXCTD_Processor threads
         # settingstopull = ["minr400", "mindr7500", "deadfreq", "refreshrate", "mark_space_freqs", "usebandpass", "zcoeff_axctd", "tcoeff_axctd", "ccoeff_axctd"]
         
-        self.minpointsperloop = int(self.settings['refreshrate']*self.f_s) #how many PCM datapoints AXCTDprocessor handles per loop
+        self.set_processing_level(self.processinglevel) #how many PCM datapoints AXCTDprocessor handles per loop
         
         #signal to noise ratio settings
         self.minR400 = self.settings['minr400'] #threshold to ID first 400 Hz pulse
@@ -233,12 +244,36 @@ class AXCTDProcessor(QRunnable):
         
         
         
+    #realtime backpressure processing levels (see _processor_functions.check_backpressure): level 0 processes
+    #refreshrate seconds of audio per loop with signal levels calculated f_s_power times per second, levels 1 and 2
+    #process 2x/4x as much audio per loop with signal levels calculated 1/2 and 1/4 as often
+    def set_processing_level(self, level):
+        self.minpointsperloop = int(self.settings['refreshrate']*self.f_s) * 2**level #PCM datapoints processed per loop
+        self.d_pcm = int(np.round(self.f_s/self.f_s_power)) * 2**level #how many points apart to sample power
+        
+        
+        
+    #saves the post-trigger bitstream (with bit times, demodulation confidences, signal levels, conversion coefficients and
+    #in-profile screening settings) to self.bitstreamfilename, called on termination (kill) if the profile was triggered
+    def save_bitstream(self):
+        if self.status < 2 or len(self.bitstream["chunks"]) == 0:
+            return
+        
+        try:
+            write_bitstream(self.bitstreamfilename, self.bitstream, self.f_s, self.profstartind, self.firstpointtime, self.tcoeff, self.ccoeff, self.zcoeff, self.minR400_inprof, self.mindR7500_inprof, self.tlims, self.slims)
+        except Exception:
+            trace_error()
+            self.sigdata.write("[!] Unable to save AXCTD bitstream\n")
+        
+        
+        
         
-    @pyqtSlot()
     def run(self):
         
         #waits for self.threadstatus to change to 100 (indicating __init__ finished) before proceeding
         self.wait_to_run()
+        if not self.keepgoing: #initialization failed- processor was already terminated (and sigdata file closed)
+            return
         
         #defining radio receiver callbacks within scope with access to self variable
         receiver_callback = self.define_callbacks("AXCTD", self.sourcetype)
@@ -248,7 +283,7 @@ class AXCTDProcessor(QRunnable):
             cursource = self.audiofile
         else:
             cursource = self.serial
-        self.txtfile.write(f"AXCTD Processor initialized : source={self.sourcetype} ({cursource}), fs={self.f_s} Hz\n")
+        self.sigdata.write(f"AXCTD Processor initialized : source={self.sourcetype} ({cursource}), fs={self.f_s} Hz\n")
 
         
         try:
@@ -259,7 +294,6 @@ class AXCTDProcessor(QRunnable):
                 # initializes audio callback function
                 status = cdf.initialize_receiver_callback(self.dll, self.sourcetype, self.hradio, receiver_callback, self.tabID)
                 if status:
-                    timemodule.sleep(0.3)  # gives the buffer time to populate
                     self.stream = status #important for PyAudio to be able to kill the stream
                     
                 else:
@@ -286,22 +320,16 @@ class AXCTDProcessor(QRunnable):
             #MAIN PROCESSOR LOOP
             while self.keepgoing:
                 i += 1
+                self.start_iteration()
 
 
                 if not self.isfromaudio and not self.isfromtest:
 
                     #protocal to kill thread if connection with WiNRADIO is lost
-                    if self.numcontacts == self.lastcontacts: #checks if the audio stream is receiving new data
-                        self.disconnectcount += 1
-                    else:
-                        self.disconnectcount = 0
-                        self.lastcontacts = self.numcontacts
-
-                    #if the audio stream hasn't received new data for several iterations and checking device connection fails
-                    if self.disconnectcount >= 30 and not cdf.check_connected(self.dll, self.sourcetype, self.hradio):
-                        self.kill(8)
+                    self.check_receiver_contact()
                         
                     #removing processed data from head of buffer
+                    self.stats.start("buffer")
                     if buffer_head > 0:
                         self.demod_buffer = np.delete(self.demod_buffer, range(buffer_head))
                         
@@ -311,6 +339,16 @@ class AXCTDProcessor(QRunnable):
                         self.demod_buffer = np.append(self.demod_buffer, self.audiostream[:lenbuffer])
                         del self.audiostream[:lenbuffer] #pull data from receiver buffer to demodulation buffer, remove data from head of receiver buffer
                         e += lenbuffer #increases buffer tail by number of appended points
+                    self.stats.stop("buffer")
+                    
+                    #processing lag = received audio that hasn't been processed (demod buffer + receiver buffer)
+                    lag = (len(self.demod_buffer) + len(self.audiostream))/self.f_s
+                    self.stats.set_lag(lag)
+                    
+                    #switching to cheaper processing, or dropping the oldest audio, if processing has fallen too far behind
+                    ndrop = self.check_backpressure(lag)
+                    if ndrop > 0:
+                        self.drop_audio(ndrop)
                     
                     #if the buffer length isn't long enough, then start index = end index
                     #causes processor to skip this iteration and add more points to the buffer
@@ -339,6 +377,10 @@ class AXCTDProcessor(QRunnable):
                     # self.demod_buffer = np.append(self.demod_buffer, self.audiostream[self.demodbufferstartind:e])
                     self.demod_buffer = self.audiostream[self.demodbufferstartind:e]
                     
+                    #test processing lag = time since start - audio time processed (no lag when reprocessing audio files)
+                    if self.isfromtest:
+                        self.stats.set_lag((dt.datetime.utcnow() - self.starttime).total_seconds() - self.demodbufferstartind/self.f_s)
+                    
 
                     
                 
@@ -360,7 +402,9 @@ class AXCTDProcessor(QRunnable):
                         
                     #won't send if keepgoing stopped since current iteration began
                     if self.keepgoing and len(data) > 0: 
+                        self.stats.start("emit")
                         self.signals.iterated.emit(self.tabID, data) #updating data in GUI loop
+                        self.stats.stop("emit")
                             
                             
                     #increment demod buffer index forward
@@ -377,17 +421,15 @@ class AXCTDProcessor(QRunnable):
                 else:
                     buffer_head = 0
                         
+                self.end_iteration()
                         
                         
-                #sleeping until ready to process more data (sleep length is datasource-dependent)
-                if self.isfromtest: #sleep until real time catches up to number of demodulated points
+                #waiting until ready to process more data (datasource-dependent)
+                if self.isfromtest: #wait until real time catches up to number of demodulated points
                     ctimeinaudio = self.demodbufferstartind/self.f_s
-                    while (dt.datetime.utcnow() - self.starttime).total_seconds() < ctimeinaudio:
-                        timemodule.sleep(0.01)
-                elif self.isfromaudio: 
-                    timemodule.sleep(0.001) #slight pause to free some resources when processing from audio
-                else: 
-                    timemodule.sleep(0.1) #realtime processing- wait 0.1 sec for buffer to refill
+                    self.pause(ctimeinaudio - (dt.datetime.utcnow() - self.starttime).total_seconds())
+                elif not self.isfromaudio: #realtime processing- wait until the receiver buffer holds the next chunk of audio (or 1 sec for receiver contact checks)
+                    self.wait_for_audio(self.nframes + self.minpointsperloop - len(self.audiostream), 1)
                     
 
         except Exception: #if the thread encounters an error, terminate
@@ -395,8 +437,7 @@ class AXCTDProcessor(QRunnable):
             if self.keepgoing:
                 self.kill(10)
                 
-        while self.waittoterminate: #waits for kill process to complete to avoid race conditions with audio buffer callback
-            timemodule.sleep(0.1)
+        self.wait_for_termination() #waits for kill process to complete to avoid race conditions with audio buffer callback
             
             
     
@@ -410,6 +451,7 @@ class AXCTDProcessor(QRunnable):
         #sampling interval = sampling frequency / power sampling frequency
         #calculating signal levels at 400 Hz, 7500 Hz, and dead frequency (default 3000 Hz)
         
+        self.stats.start("signal_levels")
         pstartind = len(self.power_inds)
         
         self.power_inds.extend([ind for ind in range(self.demodbufferstartind, e-self.N_power, self.d_pcm)])
@@ -427,6 +469,11 @@ class AXCTDProcessor(QRunnable):
         self.pdead = demodulate.boxsmooth_lag(self.pdead, self.power_smooth_window, pstartind)
         self.r400 = np.append(self.r400, np.log10(self.p400[pstartind:]/self.pdead[pstartind:]))
         self.r7500 = np.append(self.r7500, np.log10(self.p7500[pstartind:]/self.pdead[pstartind:]))
+        self.stats.stop("signal_levels")
+        
+        #logging most recent signal levels
+        if len(self.power_inds) > pstartind:
+            self.sigdata.append("levels", self.power_inds[-1]/self.f_s, self.p400[-1], self.p7500[-1], self.pdead[-1], self.r400[-1], self.r7500[-1], self.status)
         
         
         #look for 400 Hz pulse if it hasn't been discovered yet
@@ -436,7 +483,7 @@ class AXCTDProcessor(QRunnable):
                 self.firstpulse400 = self.power_inds[pstartind:][matchpoints[0][0]] #getting index in original PCM data
                 self.firstpulsetime = self.firstpulse400/self.f_s
                 self.status = 1
-                self.txtfile.write(f"400 Hz pulse detected : {self.firstpulsetime} sec (ind = {self.firstpulse400})\n")
+                self.sigdata.write(f"400 Hz pulse detected : {self.firstpulsetime} sec (ind = {self.firstpulse400})\n")
             
         
         #if pulse discovered, demodulate data to bitstream AND check 7500 Hz power
@@ -465,10 +512,13 @@ class AXCTDProcessor(QRunnable):
                     self.status = 2
                 if self.profstartind > 0 and self.firstpointtime <= 0:
                     self.firstpointtime = self.profstartind/self.f_s
-                    self.txtfile.write(f"7500 Hz tone detected : {self.firstpointtime} sec (ind = {self.profstartind})\n")
+                    self.sigdata.write(f"7500 Hz tone detected : {self.firstpointtime} sec (ind = {self.profstartind})\n")
             
             #demodulate to bitstream and append bits to buffer
+            self.stats.start("demodulation")
             curbits, conf, bit_edges, self.next_demod_ind = demodulate.demodulate_axctd(self.demod_buffer, self.f_s, self.demod_Npad, self.sos_filter, self.bitrate, self.f1, self.f2, self.trig1, self.trig2, self.Npcm, self.bit_inset, self.phase_error, self.high_bit_scale)
+            self.stats.stop("demodulation")
+            self.stats.count("bits", len(curbits))
             
             self.binary_buffer.extend(curbits) #buffer for demodulated binary data not organized into frames
             
@@ -496,6 +546,7 @@ class AXCTDProcessor(QRunnable):
             #pulse length: 1.8 sec, header length: 2.88 sec, gap period (first 2 pulses): 5 sec
             #total pulse cycle ~= 9.68 sec (assume 9-10 sec)
             
+            self.stats.start("headers")
             headerdata = [None,None]
             
             firstbin = self.binary_buffer_inds[0]
@@ -584,9 +635,9 @@ class AXCTDProcessor(QRunnable):
                             self.metadata[key] = header[key]
                     
                     #printing header info to sigdata file
-                    self.txtfile.write(f"Header {i+2} detected!\n")
+                    self.sigdata.write(f"Header {i+2} detected!\n")
                     for key in header.keys():
-                        self.txtfile.write(f"{key} : {header[key]}\n")
+                        self.sigdata.write(f"{key} : {header[key]}\n")
                             
             
             #if updated headers included, then try to update coefficients
@@ -597,6 +648,7 @@ class AXCTDProcessor(QRunnable):
                     self.ccoeff = self.metadata['ccoeff']
                 if sum(self.metadata['tcoeff_valid']) == 4:
                     self.zcoeff = self.metadata['zcoeff']
+            self.stats.stop("headers")
             
                     
         pass_empty = False
@@ -614,11 +666,19 @@ class AXCTDProcessor(QRunnable):
                 self.r400_buffer = self.r400_buffer[firstind:]
                 self.r7500_buffer = self.r7500_buffer[firstind:]
             
+            #recording values added to each buffer since the last iteration to the post-trigger bitstream (see save_bitstream)
+            self.bitstream["chunks"].append(len(self.binary_buffer) - self.nunparsed["bits"])
+            for (ckey, cbuffer) in zip(["bits", "inds", "conf", "r400", "r7500"], [self.binary_buffer, self.binary_buffer_inds, self.binary_buffer_conf, self.r400_buffer, self.r7500_buffer]):
+                self.bitstream[ckey].extend(cbuffer[self.nunparsed[ckey]:])
+            
             #calculting times corresponding to each bit
             binbufftimes = (np.asarray(self.binary_buffer_inds) - self.profstartind)/self.f_s
                 
             #parsing data into frames
+            self.stats.start("parsing")
             hexframes, times, depths, temps, conds, psals, r400, r7500, next_buffer_ind = parse.parse_bitstream_to_profile(self.binary_buffer, binbufftimes, self.r400_buffer, self.r7500_buffer, self.tempLUT, self.tcoeff, self.ccoeff, self.zcoeff)
+            self.stats.stop("parsing")
+            self.stats.count("frames", len(hexframes))
                         
             #rounding data and appending to lists
             times = np.round(np.asarray(times) + self.firstpointtime, 2)
@@ -630,40 +690,9 @@ class AXCTDProcessor(QRunnable):
             r7500 = np.round(r7500,2)
             
             
-            is_good = [True] * len(times)
-            
-            #if R400, dR7500, temp, or psal are outside of preset bounds, exclude datapoint
-            for i,p in enumerate(r7500):
-                if p < self.mindR7500_inprof or r400[i] < self.minR400_inprof or temps[i] < self.tlims[0] or temps[i] > self.tlims[1] or psals[i] < self.slims[0] or psals[i] > self.slims[1]:
-                    is_good[i] = False
-                    
-            times = times[is_good]
-            depths = depths[is_good]
-            temps = temps[is_good]
-            conds = conds[is_good]
-            psals = psals[is_good]
-            r400 = r400[is_good]
-            r7500 = r7500[is_good]
-            
-            
-            
-            #identifying and removing spikes
-            if len(temps) > 0:
-                is_good = [True] * len(times)
-                
-                #median and percentile value based thresholds
-                thresh = 10
-                pct_offset = 35
-                T_median = np.percentile(temps,50)
-                T_low_diff_thresh = T_median - thresh*(T_median - np.percentile(temps,50-pct_offset))
-                T_high_diff_thresh = T_median + thresh*(np.percentile(temps,50+pct_offset) - T_median)
-                S_median = np.percentile(psals,50)
-                S_low_diff_thresh = S_median - thresh*(S_median - np.percentile(psals,50-pct_offset))
-                S_high_diff_thresh = S_median + thresh*(np.percentile(psals,50+pct_offset) - S_median)
-                for i,_ in enumerate(r7500):
-                    if temps[i] < T_low_diff_thresh or temps[i] > T_high_diff_thresh or psals[i] < S_low_diff_thresh or psals[i] > S_high_diff_thresh:
-                        is_good[i] = False
-                        
+            #excluding points with bad signal levels or temperature/salinity and removing spikes
+            is_good = parse.screen_profile_points(temps, psals, r400, r7500, self.minR400_inprof, self.mindR7500_inprof, self.tlims, self.slims)
+            if is_good.any():
                 times = times[is_good]
                 depths = depths[is_good]
                 temps = temps[is_good]
@@ -674,13 +703,15 @@ class AXCTDProcessor(QRunnable):
             else:
                 pass_empty = True
                 
-            
-            
+                
+                
             #removing parsed data from binary buffer
             self.binary_buffer = self.binary_buffer[next_buffer_ind:]
             self.binary_buffer_inds = self.binary_buffer_inds[next_buffer_ind:]
             self.r400_buffer = self.r400_buffer[next_buffer_ind:]
             self.r7500_buffer = self.r7500_buffer[next_buffer_ind:]
+            for (ckey, cbuffer) in zip(["bits", "inds", "conf", "r400", "r7500"], [self.binary_buffer, self.binary_buffer_inds, self.binary_buffer_conf, self.r400_buffer, self.r7500_buffer]):
+                self.nunparsed[ckey] = len(cbuffer)
             
         if self.status < 2 or pass_empty:
             
@@ -0,0 +1,226 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file reprocesses many AXBT/AXCTD/AXCP audio files in parallel, one file per worker
+# process, writing the same raw data files as saving a DAS tab in the GUI. A file that
+# fails (unreadable audio, processing error) is reported without stopping the others.
+#
+# Example:
+#   jobs = read_manifest("deployment.csv") #or find_audio_files("recordings", "AXBT")
+#   results = run_batch(jobs, outdir="processed", filetypes=["EDF","sigdata"])
+#   write_batch_summary(results, "processed/summary.csv")
+#
+# Manifest files are comma-delimited with a header line. Columns file, probetype, and channel are
+# required, lat, lon, date (YYYYMMDD), time (HHMM) and id are optional. Relative file paths are
+# relative to the manifest, lines starting with # are ignored. Example:
+#   file,probetype,channel,lat,lon,date,time,id
+#   drop1.WAV,AXBT,0,25.2,-85.1,20220212,1530,NNNNN
+#   drop2.WAV,AXCTD,2,,,,,
+
+
+import csv
+import os
+import datetime as dt
+import multiprocessing
+import time as timemodule
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from queue import Empty
+
+from traceback import print_exc as trace_error, format_exc
+
+import lib.DAS.DAS_outputs as das_out
+import lib.DAS.DAS_headless as headless
+
+
+audioextensions = ['.wav']
+
+
+
+# =============================================================================
+#   BUILDING JOB LISTS
+# =============================================================================
+
+#single file to process- metadata entries left as None aren't available (position/time dependent files are skipped)
+def make_job(audiofile, probetype, chselect=0, lat=None, lon=None, dropdatetime=None, identifier='NNNNN'):
+
+    probetype = probetype.upper()
+    if probetype not in das_out.settingstopull.keys():
+        raise ValueError(f"Probe type {probetype} not recognized for {audiofile}, must be AXBT, AXCTD, or AXCP")
+
+    return {"file":audiofile, "probetype":probetype, "channel":int(chselect), "lat":lat, "lon":lon, "dropdatetime":dropdatetime, "id":identifier.replace(' ','_')}
+
+
+
+#all audio files in directory (and subdirectories if recursive), processed as probetype
+def find_audio_files(directory, probetype, chselect=0, recursive=False, **kwargs):
+
+    audiofiles = []
+    for (cdir, subdirs, files) in os.walk(directory):
+        audiofiles.extend([os.path.join(cdir, cf) for cf in files if os.path.splitext(cf)[1].lower() in audioextensions])
+        if not recursive:
+            break
+
+    return [make_job(cfile, probetype, chselect, **kwargs) for cfile in sorted(audiofiles)]
+
+
+
+#reads a manifest file (format described at the top of this file)
+def read_manifest(filename):
+
+    manifestdir = os.path.dirname(os.path.abspath(filename))
+    jobs = []
+
+    with open(filename) as f_in:
+        reader = csv.DictReader([cline for cline in f_in if cline.strip() and not cline.lstrip().startswith('#')], skipinitialspace=True)
+        for (i,row) in enumerate(reader):
+            row = {ckey.strip().lower():(cval.strip() if cval is not None else '') for (ckey,cval) in row.items()}
+
+            try:
+                audiofile = row["file"]
+                if not os.path.isabs(audiofile):
+                    audiofile = os.path.join(manifestdir, audiofile)
+
+                lat = float(row["lat"]) if row.get("lat") else None
+                lon = float(row["lon"]) if row.get("lon") else None
+                dropdatetime = None
+                if row.get("date"):
+                    dropdatetime = dt.datetime.strptime(row["date"] + row.get("time","0000").zfill(4), "%Y%m%d%H%M")
+
+                jobs.append(make_job(audiofile, row["probetype"], int(row.get("channel") or 0), lat=lat, lon=lon, dropdatetime=dropdatetime, identifier=row.get("id") or 'NNNNN'))
+
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Invalid manifest entry on line {i+2} of {filename}: {e}")
+
+    return jobs
+
+
+
+#output file headers (path without extension) for each job in outdir (default: audio file directory)
+#duplicate names get a number appended, as when saving from the GUI (see gui/_globalfunctions.check_filename)
+def get_output_headers(jobs, outdir=None):
+
+    headers = []
+    for job in jobs:
+        cdir = outdir if outdir is not None else os.path.dirname(os.path.abspath(job["file"]))
+        header = os.path.join(cdir, os.path.splitext(os.path.basename(job["file"]))[0])
+
+        newheader = header
+        new_file_num = 0
+        while newheader in headers:
+            new_file_num += 1
+            newheader = f"{header}_{new_file_num}"
+        headers.append(newheader)
+
+    return headers
+
+
+
+
+
+# =============================================================================
+#   PROCESSING
+# =============================================================================
+
+#processes one job in a worker process- all errors are caught and returned so one bad file doesn't stop the batch
+#progressqueue (optional) receives (jobID, percent) as the file is processed
+def run_batch_job(jobID, job, outfileheader, filetypes, settings, progressqueue=None):
+
+    result = {"job":jobID, "file":job["file"], "probetype":job["probetype"], "output":outfileheader, "status":0, "npoints":0, "errors":[], "failed":[], "error":""}
+
+    try:
+        starttime = timemodule.perf_counter()
+
+        progress = None
+        if progressqueue is not None:
+            progress = lambda cprogress: progressqueue.put((jobID, cprogress))
+
+        cresult = headless.process_and_save_audio_file(job["file"], job["probetype"], outfileheader, filetypes, chselect=job["channel"], settings=settings, lat=job["lat"], lon=job["lon"], dropdatetime=job["dropdatetime"], identifier=job["id"], progress=progress)
+        result.update(cresult)
+        result["proctime"] = timemodule.perf_counter() - starttime
+
+        if result["errors"]:
+            result["status"] = result["errors"][0]
+
+    except Exception:
+        trace_error()
+        result["status"] = 10
+        result["error"] = format_exc().strip().split('\n')[-1]
+
+    return result
+
+
+
+#processes all jobs (see make_job, find_audio_files, read_manifest) in a process pool
+#filetypes: any of EDF, sigdata, sigtxt, stats, bits, DTA, DAT, NVO (see das_out.write_DAS_files), settings default to the AXBPS defaults
+#progress(jobID, audiofile, percent) is called as files are processed (percent=100 when each file finishes)
+#returns a list of result dicts (in job order) with the status, number of profile points, and any errors for each file
+def run_batch(jobs, outdir=None, filetypes=["EDF","sigdata"], settings=None, maxworkers=None, progress=None):
+
+    if settings is None:
+        settings = das_out.default_processor_settings()
+    if "STATS" in [cf.upper() for cf in filetypes]: #the stats log is only written if the processor statslog setting is enabled
+        settings = dict(settings, statslog=True)
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+
+    headers = get_output_headers(jobs, outdir)
+    results = [None]*len(jobs)
+
+    with multiprocessing.Manager() as manager:
+        progressqueue = manager.Queue() if progress is not None else None
+
+        with ProcessPoolExecutor(max_workers=maxworkers) as executor:
+            futures = {executor.submit(run_batch_job, i, job, headers[i], filetypes, settings, progressqueue):i for (i,job) in enumerate(jobs)}
+            pending = set(futures.keys())
+
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+
+                #passing per-file progress from workers along
+                if progressqueue is not None:
+                    try:
+                        while True:
+                            jobID, cprogress = progressqueue.get_nowait()
+                            progress(jobID, jobs[jobID]["file"], cprogress)
+                    except Empty:
+                        pass
+
+                for future in done:
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except Exception: #worker process died
+                        trace_error()
+                        results[i] = {"job":i, "file":jobs[i]["file"], "probetype":jobs[i]["probetype"], "output":headers[i], "status":10, "npoints":0, "errors":[], "failed":[], "error":"Worker process failed"}
+                    if progress is not None:
+                        progress(i, jobs[i]["file"], 100)
+
+    return results
+
+
+
+#writes a table (one row per file) of batch processing results
+def write_batch_summary(results, filename):
+
+    with open(filename,'w',newline='') as f_out:
+        writer = csv.writer(f_out, lineterminator='\n')
+        writer.writerow(["job","file","probetype","status","npoints","unsaved","error","proctime","output"])
+        for result in results:
+            writer.writerow([result['job'], result['file'], result['probetype'], result['status'], result['npoints'], '/'.join(result['failed']), result['error'], f"{result.get('proctime',0):.2f}", result['output']])
+
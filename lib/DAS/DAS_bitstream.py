@@ -0,0 +1,123 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the AXCTD bitstream file: the post-trigger bits demodulated by the AXCTD processor, with
+# the PCM index, demodulation confidence and 400 Hz/7.5 kHz signal levels of each bit. The processor saves it on
+# termination (bitstream_<tabID>.npz in the processor tempdir, saved as <drop>.bits.npz with the WAV file).
+#
+# reparse_bitstream regenerates the AXCTD profile from a bitstream file (e.g. with different conversion coefficients,
+# temperature/salinity limits or in-profile signal level thresholds) in milliseconds, without demodulating the audio
+# again. Bits are parsed in the same batches as the processor parsed them, so the reparsed profile matches the
+# processor's profile if the settings are unchanged.
+#
+# File format (numpy .npz, compressed):
+#   bits (np.packbits, nbits bits), inds (PCM index of each bit), conf (float32), r400/r7500 (float64 per bit)
+#       demodulation returns one more bit edge than bits per batch, so inds/r400/r7500 may be longer than bits. Bits are
+#       paired with them by position from the start of the profile, as they are in the processor's buffers
+#   chunks: number of bits added before each parsing iteration
+#   f_s, profstartind (PCM index of profile start), firstpointtime (sec)
+#   tcoeff, ccoeff, zcoeff: conversion coefficients used by the processor
+#   minr400, mindr7500, tlims, slims: in-profile signal level thresholds and temperature/salinity limits used by the processor
+
+
+import numpy as np
+
+import lib.DAS.common_DAS_functions as cdf
+import lib.DAS.parseAXCTD as parse
+
+
+
+#bitstream: {"bits", "inds", "conf", "r400", "r7500", "chunks"} lists recorded by the AXCTD processor
+def write_bitstream(filename, bitstream, f_s, profstartind, firstpointtime, tcoeff, ccoeff, zcoeff, minr400, mindr7500, tlims, slims):
+    bits = np.asarray(bitstream["bits"], dtype=np.uint8)
+
+    with open(filename, 'wb') as f: #file handle so numpy doesn't append .npz to the filename
+        np.savez_compressed(f, bits=np.packbits(bits), nbits=len(bits), inds=np.asarray(bitstream["inds"], dtype=np.float64), conf=np.asarray(bitstream["conf"], dtype=np.float32),
+            r400=np.asarray(bitstream["r400"], dtype=np.float64), r7500=np.asarray(bitstream["r7500"], dtype=np.float64), chunks=np.asarray(bitstream["chunks"], dtype=np.int32),
+            f_s=f_s, profstartind=profstartind, firstpointtime=firstpointtime, tcoeff=np.asarray(tcoeff, dtype=float), ccoeff=np.asarray(ccoeff, dtype=float), zcoeff=np.asarray(zcoeff, dtype=float),
+            minr400=minr400, mindr7500=mindr7500, tlims=np.asarray(tlims, dtype=float), slims=np.asarray(slims, dtype=float))
+
+
+
+#returns the contents of a bitstream file as a dict (bits unpacked, scalars as python floats/ints)
+def read_bitstream(filename):
+    with np.load(filename) as f:
+        bitstream = {key:f[key] for key in f.files}
+
+    bitstream["bits"] = np.unpackbits(bitstream["bits"])[:int(bitstream["nbits"])]
+    for key in ["nbits", "profstartind"]:
+        bitstream[key] = int(bitstream[key])
+    for key in ["f_s", "firstpointtime", "minr400", "mindr7500"]:
+        bitstream[key] = float(bitstream[key])
+
+    return bitstream
+
+
+
+#regenerates the AXCTD profile from a bitstream file (or a dict from read_bitstream), returning a dict of arrays
+#   {"time", "depth", "temperature", "conductivity", "salinity", "r400", "r7500", "frame"}
+#tcoeff/ccoeff/zcoeff (4 coefficients each) replace the processor's conversion coefficients, and settings (AXBPS
+#AXCTD processor settings: any of minr400, mindr7500, tlims_axctd, slims_axctd) replace the screening settings
+def reparse_bitstream(bitstream, settings={}, tcoeff=None, ccoeff=None, zcoeff=None, tempLUT=None):
+
+    if isinstance(bitstream, str):
+        bitstream = read_bitstream(bitstream)
+
+    #conversion coefficients and screening settings (in-profile thresholds are half of the trigger thresholds, as in the processor)
+    tcoeff = list(tcoeff if tcoeff is not None else bitstream["tcoeff"])
+    ccoeff = list(ccoeff if ccoeff is not None else bitstream["ccoeff"])
+    zcoeff = list(zcoeff if zcoeff is not None else bitstream["zcoeff"])
+    minR400 = settings["minr400"]/2 if "minr400" in settings else bitstream["minr400"]
+    mindR7500 = settings["mindr7500"]/2 if "mindr7500" in settings else bitstream["mindr7500"]
+    tlims = settings.get("tlims_axctd", bitstream["tlims"])
+    slims = settings.get("slims_axctd", bitstream["slims"])
+
+    if tempLUT is None:
+        tempLUT = parse.read_temp_LUT(cdf.resource_path('lib','DAS','temp_LUT.txt'))
+
+    bits = bitstream["bits"].tolist() #parser compares frames as lists
+    times = (bitstream["inds"] - bitstream["profstartind"])/bitstream["f_s"]
+    r400_in = bitstream["r400"].tolist()
+    r7500_in = bitstream["r7500"].tolist()
+
+    keys = ["time", "depth", "temperature", "conductivity", "salinity", "r400", "r7500"]
+    profile = {key:[] for key in keys}
+    profile["frame"] = []
+
+    #parsing bits in the same batches as the processor: unparsed bits carry over to the next batch
+    s = 0 #first unparsed bit
+    e = 0 #end of current batch
+    for nnew in bitstream["chunks"]:
+        e += int(nnew)
+        hexframes, ctimes, depths, temps, conds, psals, r400, r7500, next_buffer_ind = parse.parse_bitstream_to_profile(bits[s:e], times[s:e], r400_in[s:e], r7500_in[s:e], tempLUT, tcoeff, ccoeff, zcoeff)
+        s += next_buffer_ind
+
+        #rounding data as the processor does
+        cdata = [np.round(np.asarray(ctimes) + bitstream["firstpointtime"], 2)] + [np.round(cvals, 2) for cvals in [depths, temps, conds, psals, r400, r7500]]
+
+        is_good = parse.screen_profile_points(cdata[2], cdata[4], cdata[5], cdata[6], minR400, mindR7500, tlims, slims)
+        for (key, cvals) in zip(keys, cdata):
+            profile[key].append(np.asarray(cvals, dtype=float)[is_good])
+        profile["frame"].extend([cframe for (cframe, cgood) in zip(hexframes, is_good) if cgood])
+
+    for key in keys:
+        profile[key] = np.concatenate(profile[key]) if len(profile[key]) > 0 else np.array([])
+
+    return profile
+
@@ -0,0 +1,74 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the calibration polynomials used by the processors, with coefficients in ascending order:
+#   D_out = C[0] + C[1]*D_in + C[2]*D_in^2 + C[3]*D_in^3 + ...
+# e.g. AXBT/AXCTD depth from time since profile start, AXBT temperature from frequency, AXCTD temperature and
+# conductivity from uncalibrated values, and AXCP depth from time since spinup
+#
+# Polynomials are evaluated in Horner form, on a scalar or a whole array at once (one array operation per coefficient).
+# get_polynomial returns a cached ConversionPolynomial for a set of coefficients, so processors can look one up each
+# iteration without rebuilding it.
+
+
+import numpy as np
+from functools import lru_cache
+
+
+
+#evaluates the polynomial with (ascending) coefficients at x (scalar or numpy array) in Horner form
+def horner(x, coefficients):
+    if len(coefficients) == 0:
+        return 0. * x
+    output = coefficients[-1]
+    for c in coefficients[-2::-1]:
+        output = output*x + c
+    return output
+
+
+
+#polynomial for a set of calibration coefficients, called with a scalar (returns a float), list (returns a list),
+#or numpy array (returns an array)
+class ConversionPolynomial:
+
+    def __init__(self, coefficients):
+        coefficients = [float(c) for c in coefficients]
+        while len(coefficients) > 1 and coefficients[-1] == 0: #trailing zero coefficients don't change the output
+            coefficients.pop()
+        self.coefficients = tuple(coefficients)
+
+    def __call__(self, data_in):
+        if type(data_in) == list:
+            return horner(np.asarray(data_in, dtype=float), self.coefficients).tolist()
+        return horner(data_in, self.coefficients)
+
+    #derivative (e.g. fall rate from a depth polynomial)
+    def derivative(self):
+        return get_polynomial([i*c for (i,c) in enumerate(self.coefficients)][1:])
+
+
+
+#cached polynomial for the coefficients (any sequence of numbers)
+def get_polynomial(coefficients):
+    return _cached_polynomial(tuple(coefficients))
+
+@lru_cache(maxsize=64)
+def _cached_polynomial(coefficients):
+    return ConversionPolynomial(coefficients)
+
@@ -0,0 +1,105 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file processes audio files with the Qt-free processor engines, e.g. on a server
+# without a display or in a worker process. Nothing here imports PyQt5.
+#
+# Example:
+#   settings = das_out.default_processor_settings()
+#   processor, collector = process_audio_file("drop.WAV", "AXBT", settings=settings)
+#   das_out.write_DAS_files("drop", ["EDF","sigdata"], "AXBT", collector.rawdata, processor, settings,
+#       dropdatetime=dt.datetime(2022,2,12,15,30), lat=25, lon=-85, sigdatafile=processor.sigdatafilename)
+
+
+import datetime as dt
+import os
+import tempfile
+import shutil
+
+import lib.DAS.DAS_outputs as das_out
+from lib.DAS.DAS_AXBT import AXBTEngine
+from lib.DAS.DAS_AXCTD import AXCTDEngine
+from lib.DAS.DAS_AXCP import AXCPEngine
+
+
+
+
+#runs a processor engine over a full audio file (channel chselect, 0 sums all channels) in the current thread
+#settings is an AXBPS settings dict (see das_out.default_processor_settings), tempdir holds the processor's sigdata/WAV copy
+#lat/lon/dropdatetime are only used for AXCP magnetic field parameters (defaults from settings maglat/maglon, today)
+#progress(percent) is called as the file is processed
+#returns the processor (after termination) and a ProfileCollector holding the raw data (collector.rawdata)
+def process_audio_file(audiofile, probetype, chselect=0, settings=None, tempdir=None, lat=None, lon=None, dropdatetime=None, tabID=0, progress=None):
+
+    probetype = probetype.upper()
+
+    if settings is None:
+        settings = das_out.default_processor_settings()
+    if tempdir is None:
+        tempdir = tempfile.gettempdir()
+
+    #format is Audio<channel#><filename> e.g. AA00002/My/File.WAV (see gui/_DASfunctions.AudioWindow)
+    datasource = f"AA{chselect:05d}{os.path.abspath(audiofile)}"
+    procsettings = das_out.get_processor_settings(settings, probetype)
+    starttime = dt.datetime.utcnow()
+
+    if probetype == "AXBT":
+        processor = AXBTEngine({}, datasource, 0, tabID, starttime, False, -1, procsettings, tempdir)
+    elif probetype == "AXCTD":
+        processor = AXCTDEngine({}, datasource, 0, tabID, starttime, 0, -1, -1, procsettings, tempdir)
+    elif probetype == "AXCP":
+        lat = settings.get('maglat', 20) if lat is None else lat
+        lon = settings.get('maglon', -80) if lon is None else lon
+        dropdate = dt.datetime.utcnow().date() if dropdatetime is None else dropdatetime.date()
+        processor = AXCPEngine({}, datasource, 0, tabID, starttime, lat=lat, lon=lon, dropdate=dropdate, settings=procsettings, tempdir=tempdir)
+    else:
+        raise ValueError(f"Probe type {probetype} not recognized, must be AXBT, AXCTD, or AXCP")
+
+    collector = das_out.ProfileCollector(probetype)
+    collector.connect(processor.signals)
+    if progress is not None:
+        processor.signals.updateprogress.connect(lambda tabID, cprogress: progress(cprogress))
+
+    processor.run() #returns once the audio file is processed (or the processor fails)
+
+    return processor, collector
+
+
+
+#processes an audio file and writes filetypes (see das_out.write_DAS_files) to outfileheader + extension
+#returns a dict with the number of profile points, processor error codes and file types that couldn't be saved
+def process_and_save_audio_file(audiofile, probetype, outfileheader, filetypes, chselect=0, settings=None, lat=None, lon=None, dropdatetime=None, identifier='', progress=None):
+
+    if settings is None:
+        settings = das_out.default_processor_settings()
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        processor, collector = process_audio_file(audiofile, probetype, chselect=chselect, settings=settings, tempdir=tempdir, lat=lat, lon=lon, dropdatetime=dropdatetime, progress=progress)
+
+        if processor.threadstatus == 100:
+            failed = das_out.write_DAS_files(outfileheader, filetypes, probetype, collector.rawdata, processor, settings, dropdatetime=dropdatetime, lat=lat, lon=lon, identifier=identifier, datasource='Audio', wavfile=audiofile, sigdatafile=processor.sigdatafilename, statsfile=processor.stats.logfilename, bitstreamfile=getattr(processor, 'bitstreamfilename', None))
+        else: #audio file couldn't be read- nothing to save
+            failed = list(filetypes)
+
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    return {"npoints":len(collector.rawdata["depth"]), "errors":collector.errors, "failed":failed}
+
@@ -0,0 +1,355 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the process backend for the DAS processors: each processor engine (DAS_AXBT.py, DAS_AXCTD.py,
+# DAS_AXCP.py) runs in its own OS process, so concurrent drops are processed on separate CPU cores instead of sharing
+# the GUI process (and its GIL).
+#
+# ProcessorHost stays in the GUI process and has the same methods and signals the GUI uses with in-process processors
+# (see RemoteProcessor in qt_processors.py). For realtime sources, the host activates the receiver and its callback
+# writes the audio to a shared memory ring buffer (sharedmemory_functions.py), which the processor reads as a receiver
+# of type SM. Processor signals are returned over a multiprocessing queue as (signal name, arguments...) and emitted
+# by the host, and GUI calls (abort, changethresholds, reevaluate_profile, update_position_profile) are sent to the
+# processor over a second queue. The processor process writes the WAV, signal data and bitstream files to the tempdir
+# as it would in the GUI process.
+#
+# Processor attributes read by the GUI after processing (e.g. AXCTD metadata, AXCP magnetic field parameters) are
+# copied to the host in "state" messages. AXCP processors stay open after processing for position updates until the
+# host is closed.
+
+
+import multiprocessing
+import queue
+import threading
+import time as timemodule
+from traceback import print_exc as trace_error
+
+import lib.DAS.common_DAS_functions as cdf
+import lib.DAS.sharedmemory_functions as sm
+
+
+
+ringlength = 60 #sec of audio held in the shared memory ring buffer
+
+#signals forwarded from the processor process
+signalnames = ["iterated", "triggered", "terminated", "failed", "updateprogress", "updatestats", "reevaluated", "emit_profile_update", "update_spindown_index"]
+
+#processor attributes copied to the host (used by das_out.build_DAS_output)
+stateattributes = {"AXBT":[], "AXCTD":["metadata"], "AXCP":["temp_mode", "revcoil", "quality", "lat", "lon", "fh", "fz", "dec"]}
+
+#methods the host can call in the processor process
+commandnames = ["abort", "changethresholds", "reevaluate_profile", "update_position_profile", "kill"]
+
+
+
+
+# =============================================================================
+#                        PROCESSOR PROCESS
+# =============================================================================
+
+#entry point for the processor process: args/kwargs are passed to the engine after the dll (realtime datasource is 'SM' + ring name)
+def run_processor_process(probetype, args, kwargs, results, commands):
+
+    try:
+        if probetype == "AXBT":
+            from lib.DAS.DAS_AXBT import AXBTEngine as Engine
+        elif probetype == "AXCTD":
+            from lib.DAS.DAS_AXCTD import AXCTDEngine as Engine
+        elif probetype == "AXCP":
+            from lib.DAS.DAS_AXCP import AXCPEngine as Engine
+
+        engine = None
+        signals = cdf.EngineSignals()
+
+        #processor attributes are sent before the signals the GUI reads them after
+        send_state = lambda *values: results.put(("state", get_state(engine, probetype)))
+        signals.triggered.connect(send_state)
+        signals.terminated.connect(send_state)
+
+        for name in signalnames:
+            getattr(signals, name).connect(forward_signal(results, name))
+
+        engine = Engine({}, *args, signals=signals, **kwargs)
+        send_state()
+
+        commandthread = threading.Thread(target=serve_commands, args=(engine, probetype, results, commands), daemon=True)
+        commandthread.start()
+
+        engine.run()
+        results.put(("done",))
+
+        if probetype == "AXCP": #stays open for position updates
+            commandthread.join()
+
+    except Exception:
+        trace_error()
+        results.put(("failed", args[2], 10))
+        results.put(("done",))
+
+
+
+def forward_signal(results, name):
+    def forward(*values):
+        results.put((name,) + values)
+    return forward
+
+
+
+def get_state(engine, probetype):
+    if engine is None:
+        return {}
+    return {cattr:getattr(engine, cattr) for cattr in stateattributes[probetype] if hasattr(engine, cattr)}
+
+
+
+#runs commands from the host until it closes the processor or the GUI process exits
+def serve_commands(engine, probetype, results, commands):
+    parent = multiprocessing.parent_process()
+
+    while True:
+        try:
+            command = commands.get(timeout=1)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive(): #GUI process exited without closing the processor
+                if engine.keepgoing:
+                    engine.abort()
+                return
+            continue
+
+        if command[0] == "close":
+            return
+
+        name, commandID, commandargs = command
+        try:
+            if name in commandnames:
+                getattr(engine, name)(*commandargs)
+            results.put(("state", get_state(engine, probetype)))
+        except Exception:
+            trace_error()
+        results.put(("ack", commandID))
+
+
+
+
+
+# =============================================================================
+#                        GUI PROCESS HOST
+# =============================================================================
+
+class ProcessorHost:
+
+    from ._DAS_callbacks import define_ring_callback
+
+    #same arguments as the processor engine for probetype, signals are emitted by the host (cdf.EngineSignals if not specified)
+    def __init__(self, probetype, dll, datasource, vhffreq, tabID, *args, signals=None, **kwargs):
+
+        self.probetype = probetype
+        self.dll = dll
+        self.tabID = tabID
+        self.signals = signals if signals is not None else cdf.EngineSignals()
+
+        self.sourcetype = datasource[:2]
+        self.isrealtime = self.sourcetype not in ['AA','TT']
+        self.hradio = None
+        self.stream = None
+        self.ring = None
+        self.lastconnectioncheck = 0
+        self.threadstatus = 0
+
+        self.isterminated = False
+        self.isrunning = False #whether run() is pumping processor results
+        self.commandID = 0
+        self.closed = False
+
+        #placeholders until the processor sends its state
+        for cattr in stateattributes[probetype]:
+            setattr(self, cattr, None)
+
+        #realtime receivers stay in the GUI process and write to the shared memory ring buffer
+        if self.isrealtime:
+            self.hradio, self.threadstatus = cdf.activate_receiver(dll, self.sourcetype, datasource[2:], vhffreq)
+            if not self.threadstatus:
+                f_s = cdf.get_fs(dll, self.sourcetype, hradio=self.hradio)
+                self.ring = sm.AudioRingBuffer(capacity=int(ringlength*f_s), f_s=f_s, origin=self.sourcetype)
+                datasource = 'SM' + self.ring.name
+
+        context = multiprocessing.get_context('spawn') #the processor process doesn't need (or inherit) the GUI
+        self.results = context.Queue()
+        self.commands = context.Queue()
+        self.process = context.Process(target=run_processor_process, args=(probetype, (datasource, vhffreq, tabID) + args, kwargs, self.results, self.commands), daemon=True)
+
+
+
+    def run(self):
+
+        if self.threadstatus: #receiver couldn't be activated
+            self.signals.failed.emit(self.tabID, self.threadstatus)
+            self.isterminated = True
+            self.closed = True
+            self.signals.terminated.emit(self.tabID)
+            return
+
+        self.isrunning = True
+        try:
+            self.process.start()
+
+            if self.isrealtime:
+                self.receiver_callback = self.define_ring_callback(self.sourcetype) #reference kept so WiNRADIO callbacks aren't garbage collected
+                status = cdf.initialize_receiver_callback(self.dll, self.sourcetype, self.hradio, self.receiver_callback, self.tabID)
+                if status:
+                    self.stream = status #important for PyAudio to be able to kill the stream
+                else:
+                    self.send("kill", 7)
+
+            while True:
+                self.check_connected()
+                try:
+                    result = self.results.get(timeout=1)
+                except queue.Empty:
+                    if not self.process.is_alive(): #processor process exited unexpectedly
+                        if not self.isterminated:
+                            self.signals.failed.emit(self.tabID, 10)
+                            self.isterminated = True
+                            self.signals.terminated.emit(self.tabID)
+                        break
+                    continue
+
+                if result[0] == "done":
+                    break
+                self.handle_result(result)
+
+        except Exception:
+            trace_error()
+            self.signals.failed.emit(self.tabID, 10)
+
+        finally:
+            self.isrunning = False
+            self.stop_receiver()
+            self.close_ring()
+            if self.probetype != "AXCP": #AXCP processors stay open for position updates
+                self.close()
+
+
+
+    def handle_result(self, result):
+        name = result[0]
+
+        if name == "state":
+            for (cattr, cval) in result[1].items():
+                setattr(self, cattr, cval)
+
+        elif name in signalnames:
+            if name == "terminated":
+                self.isterminated = True
+                self.stop_receiver() #the processor has stopped reading audio
+            getattr(self.signals, name).emit(*result[1:])
+
+
+
+    #sends a command to the processor. Once the host has stopped pumping results (after termination), waits for the
+    #command to finish and emits the resulting signals in the calling thread
+    def send(self, name, *commandargs):
+        if self.closed:
+            return
+
+        self.commandID += 1
+        commandID = self.commandID
+        self.commands.put((name, commandID, commandargs))
+
+        if not self.isrunning:
+            try:
+                while True:
+                    result = self.results.get(timeout=5)
+                    if result[0] == "ack" and result[1] == commandID:
+                        break
+                    self.handle_result(result)
+            except queue.Empty:
+                trace_error()
+
+
+
+    #passes the receiver connection status to the processor through the ring buffer (checked at most once per second)
+    def check_connected(self):
+        if self.ring is None or self.hradio is None or timemodule.monotonic() - self.lastconnectioncheck < 1:
+            return
+        self.lastconnectioncheck = timemodule.monotonic()
+        try:
+            self.ring.set_connected(cdf.check_connected(self.dll, self.sourcetype, self.hradio))
+        except Exception:
+            trace_error()
+
+
+    def stop_receiver(self):
+        if self.ring is not None:
+            self.ring.set_connected(False)
+        if self.hradio is not None and not self.threadstatus:
+            try:
+                cdf.stop_receiver(self.dll, self.sourcetype, self.hradio, stream=self.stream)
+            except Exception:
+                trace_error()
+        self.hradio = None
+
+
+    def close_ring(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+    #stops the processor process after processing
+    def close(self):
+        if not self.closed:
+            self.commands.put(("close",))
+            self.closed = True
+
+
+
+    # =============================================================================
+    #         METHODS CALLED BY THE GUI (same as the processor engines)
+    # =============================================================================
+
+    def abort(self):
+        if not self.isterminated:
+            self.send("abort")
+        else:
+            self.close()
+
+
+    def changethresholds(self, settings):
+        self.send("changethresholds", settings)
+
+
+    def reevaluate_profile(self, settings=None):
+        self.send("reevaluate_profile", settings)
+
+
+    def update_position_profile(self, lat, lon, dropdate):
+        self.send("update_position_profile", lat, lon, dropdate)
+
+
+    #the receiver is in the GUI process, so the frequency is changed here
+    def changecurrentfrequency(self, newfreq):
+        try:
+            if self.hradio is not None:
+                status = cdf.change_receiver_freq(self.dll, self.sourcetype, self.hradio, newfreq)
+                if not status:
+                    self.send("kill", 4)
+        except Exception:
+            trace_error()
+
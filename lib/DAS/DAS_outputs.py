@@ -0,0 +1,442 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the Qt-free pieces of the DAS tab: default processor settings, collecting
+# processor engine outputs into the raw data structure used by the GUI, and building/writing
+# the raw data files (DTA, DAT, NVO, EDF, sigdata, sigdata text). The GUI (gui/_globalfunctions.saveDASfiles)
+# and the command line processor (process_audio.py) both use these so their outputs match.
+
+
+import numpy as np
+import os
+
+from shutil import copy as shcopy
+from traceback import print_exc as trace_error
+
+import lib.fileinteraction as io
+from lib.DAS.DAS_sigdata import export_text as export_sigdata_text
+
+
+
+
+# =============================================================================
+#   PROCESSOR SETTINGS
+# =============================================================================
+
+#settings sent from AXBPS to each DAS processor (initialization and changethresholds)
+settingstopull = {"AXBT": ["fftwindow", "minfftratio", "minsiglev", "triggerfftratio", "triggersiglev", "tcoeff_axbt", "zcoeff_axbt", "flims_axbt", "statslog"],
+                  "AXCTD": ["minr400", "mindr7500", "deadfreq", "refreshrate", "mark_space_freqs", "usebandpass", "zcoeff_axctd", "tcoeff_axctd", "ccoeff_axctd", "tlims_axctd", "slims_axctd", "statslog"],
+                  "AXCP": ['cprefreshrate', 'axcpquality', 'spindowndetectrt', 'cptempmode', 'cpfftwindow', 'cpffthop', 'revcoil', "spinupfrotmax", "spindownfrotmax", "statslog"]}
+
+
+
+#default data acquisition settings and conversions (part of the AXBPS default settings, see gui/_settingswindow.py)
+def default_processor_settings():
+
+    settingsdict = {}
+
+    #AXBT data acquisition
+    settingsdict["fftwindow"] = 0.3  # window to run FFT (in seconds)
+    settingsdict["minfftratio"] = 0.5  # minimum signal to noise ratio to ID data
+    settingsdict["minsiglev"] = 63.  # minimum total signal level to receive data
+    settingsdict["triggerfftratio"] = 0.95  # minimum signal to noise ratio to ID data
+    settingsdict["triggersiglev"] = 70.  # minimum total signal level to receive data
+
+    #all probes
+    settingsdict["statslog"] = False #write processor stage timing/lag statistics to a stats log
+
+    #AXCTD data acquisition
+    settingsdict["minr400"] = 2.0  #minimum 400 Hz signal ratio to detect AXCTD pulse
+    settingsdict["mindr7500"] = 1.5  #minimum 7500 Hz signal ratio to detect AXCTD profile tone
+    settingsdict["deadfreq"] = 3000 #quiet frequency used to calculate AXCTD signal ratios
+    settingsdict["mark_space_freqs"] = [400, 800] #bit 1/0 freqs (respectively) used for AXCTD demod
+    settingsdict['refreshrate'] = 2 #iterate AXCTD processer every X sec
+    settingsdict['usebandpass'] = False #use a 100-1200 Hz bandpasss filter instead of 1200 Hz lowpass filter
+
+    #AXCP data acquisition
+    settingsdict['cprefreshrate'] = 1.0 #AXCP refresh rate (seconds)
+    settingsdict['axcpquality'] = 1 #processing quality-> 1=best, 3=worst
+    settingsdict['spindowndetectrt'] = 1 #realtime spindown detection and profile termination (1 or 0)
+    settingsdict['cptempmode'] = 2 #whether or not to use FFT for AXCP temperature calculation
+    settingsdict['cpfftwindow'] = 1 #FFT window length for AXCP (must be <= refreshrateaxcp)
+    settingsdict['cpffthop'] = 0.25 #time between overlapping AXCP FFT windows (seconds)
+    settingsdict['revcoil'] = 0 #whether coil is reversed on AXCP
+    settingsdict['maglat'] = 20 #default latitude for AXCP Fh/Fz/declination calculations
+    settingsdict['maglon'] = -80 #default longitude for AXCP Fh/Fz/declination calculations
+    settingsdict["spinupfrotmax"] = 0.5 #maximum RMS deviation of probe rotation rate for spinup to be ID'ed
+    settingsdict["spindownfrotmax"] = 0.5 #max RMS deviation of probe rotation rate at spindown
+
+    #AXBT conversions
+    # #standard navy equations
+    # settingsdict["tcoeff_axbt"] = [-40,0.02778,0,0] #temperature conversion coefficients
+    # settingsdict["zcoeff_axbt"] = [0,1.524,0,0] #depth conversion coefficients
+
+    #updated equations similar to Mk-21 output
+    settingsdict['tcoeff_axbt'] = [-67.8339, 0.0713, -2.2001e-05, 3.6060e-09]
+    settingsdict['zcoeff_axbt'] = [0, 1.5926, -0.00018, 0]
+
+    settingsdict["flims_axbt"] = [1300, 2800] #valid frequency range limits
+
+    #AXCTD conversions (default coefficients replaced by header)
+    settingsdict["zcoeff_axctd"] = [0.72, 2.76124, -0.000238007, 0]
+    settingsdict["tcoeff_axctd"] = [-0.053328, 0.994372, 0.0, 0.0]
+    settingsdict["ccoeff_axctd"] = [-0.0622192, 1.04584, 0.0, 0.0]
+    settingsdict["tlims_axctd"] = [-4,35]
+    settingsdict["slims_axctd"] = [25,45]
+
+    return settingsdict
+
+
+
+#pulls the settings for a processor of the specified probe type from the AXBPS settings dict
+def get_processor_settings(settingsdict, probetype):
+    return {csetting:settingsdict[csetting] for csetting in settingstopull[probetype.upper()]}
+
+
+
+
+
+# =============================================================================
+#   COLLECTING PROCESSOR OUTPUTS
+# =============================================================================
+
+#profile data columns in the raw data structure (AXCTD frames are hex strings)
+rawdatacolumns = {"temperature":float, "depth":float, "conductivity":float, "salinity":float, "Umag":float, "Vmag":float, "Utrue":float, "Vtrue":float, "frequency":float, "frotdev":float, "time":float, "frame":object}
+
+
+#raw data structure for a DAS tab/processor: a dict with one entry per profile data column plus the trigger status/times
+#(and any metadata added by the GUI). Each column is stored in a preallocated array that doubles in size when full, and
+#rawdata[column] is a view of the filled part of it, so adding points doesn't copy the profile and reading a column
+#(plotting, saving, the profile editor) doesn't copy it either. Columns are changed with append, truncate, or by
+#assigning a new array to a column (which replaces its contents). Views of a column are only valid until the next
+#truncate/assignment, as points appended afterwards overwrite the truncated data
+class RawData(dict):
+
+    initialcapacity = 1024
+
+    def __init__(self):
+        super().__init__(starttime=0, istriggered=False, firstpointtime=-1, firstpulsetime=-1)
+        self.buffers = {}
+        self.lengths = {}
+        for (ckey, cdtype) in rawdatacolumns.items():
+            self.set_column(ckey, np.empty(self.initialcapacity, dtype=cdtype), 0)
+
+
+    def set_column(self, key, buffer, length):
+        self.buffers[key] = buffer
+        self.lengths[key] = length
+        dict.__setitem__(self, key, buffer[:length])
+
+
+    #appends values (scalar or array-like) to each column in data (dict of column:values)
+    def append(self, data):
+        for (ckey, cvals) in data.items():
+            cvals = np.asarray(cvals, dtype=rawdatacolumns[ckey]).reshape(-1)
+            n = self.lengths[ckey]
+            nnew = n + len(cvals)
+
+            buffer = self.buffers[ckey]
+            if nnew > len(buffer):
+                capacity = len(buffer)
+                while capacity < nnew:
+                    capacity *= 2
+                buffer = np.empty(capacity, dtype=buffer.dtype)
+                buffer[:n] = self.buffers[ckey][:n]
+
+            buffer[n:nnew] = cvals
+            self.set_column(ckey, buffer, nnew)
+
+
+    #keeps the first npoints points of each column in keys (default all columns)
+    def truncate(self, npoints, keys=None):
+        for ckey in (keys if keys is not None else rawdatacolumns.keys()):
+            self.set_column(ckey, self.buffers[ckey], min(max(npoints, 0), self.lengths[ckey]))
+
+
+    def __setitem__(self, key, value):
+        if key in rawdatacolumns:
+            value = np.asarray(value, dtype=rawdatacolumns[key]).reshape(-1)
+            buffer = np.empty(max(self.initialcapacity, 2*len(value)), dtype=value.dtype)
+            buffer[:len(value)] = value
+            self.set_column(key, buffer, len(value))
+        else:
+            dict.__setitem__(self, key, value)
+
+
+
+#empty raw data structure for a DAS tab/processor
+def new_rawdata():
+    return RawData()
+
+
+
+#builds the raw profile from processor signals the same way the GUI DAS tab does, without plots/tables
+#connect to a processor engine with collector.connect(processor.signals)
+class ProfileCollector:
+
+    def __init__(self, probetype, rawdata=None):
+        self.probetype = probetype.upper()
+        self.rawdata = rawdata if rawdata is not None else new_rawdata()
+        self.isprocessing = True
+        self.errors = [] #nonzero error codes emitted by the processor
+        self.progress = 0
+        self.stats = {} #most recent processor statistics (see DAS_stats.py)
+
+
+    def connect(self, signals):
+        signals.iterated.connect(self.iterated)
+        signals.triggered.connect(self.triggered)
+        signals.terminated.connect(self.terminated)
+        signals.failed.connect(self.failed)
+        signals.updateprogress.connect(self.updateprogress)
+        signals.updatestats.connect(self.updatestats)
+        signals.reevaluated.connect(self.reevaluated)
+        signals.emit_profile_update.connect(self.replace_profiles)
+        signals.update_spindown_index.connect(self.truncate_profiles)
+
+
+    def triggered(self, tabID, event, eventtime):
+        if self.probetype == "AXCTD":
+            self.rawdata["istriggered"] = event
+            if event == 1: #triggerstatus 1: 400 Hz pulse received
+                self.rawdata["firstpulsetime"] = eventtime
+            else: #profile collection initiated
+                self.rawdata["firstpointtime"] = eventtime
+        else:
+            self.rawdata["firstpointtime"] = eventtime
+            self.rawdata["istriggered"] = True
+
+
+    def iterated(self, tabID, data):
+        if not self.isprocessing:
+            return
+
+        if self.probetype == "AXBT": #data: [temperature, depth, frequency, Sp, Rp, time, reevaluations]
+            lastdepth = self.rawdata["depth"][-1] if len(self.rawdata["depth"]) > 0 else -1
+            if data[1] != lastdepth: #only appending a datapoint if depths are different
+                self.rawdata.append({"temperature":data[0], "depth":data[1], "frequency":data[2], "time":data[5]})
+
+        elif self.probetype == "AXCTD": #data: [triggerstatus, times, r400, r7500, depths, temps, conds, psals, frames]
+            if self.rawdata["istriggered"] == 2:
+                self.rawdata.append({"time":data[1], "depth":data[4], "temperature":data[5], "conductivity":data[6], "salinity":data[7], "frame":data[8]})
+
+        elif self.probetype == "AXCP": #data: [status, time, rotf, rotfrms, depth, temp, Umag, Vmag, Utrue, Vtrue]
+            if data[0]:
+                self.rawdata.append(dict(zip(["time", "frequency", "frotdev", "depth", "temperature", "Umag", "Vmag", "Utrue", "Vtrue"], data[1:])))
+
+
+    #AXBT only: replacing the profile after the processor reevaluates it with new settings
+    #data: [istriggered, firstpointtime, temperatures, depths, frequencies, Sps, Rps, times, reevaluations]
+    def reevaluated(self, tabID, data):
+        self.rawdata["istriggered"] = data[0]
+        self.rawdata["firstpointtime"] = data[1]
+        depth = np.asarray(data[3], dtype=float)
+        keep = depth != np.append(-1, depth[:-1]) #only keeping datapoints where depths are different (as with iterated)
+        for (ckey,cdata) in zip(["temperature", "depth", "frequency", "time"], [data[2], data[3], data[4], data[7]]):
+            self.rawdata[ckey] = np.asarray(cdata, dtype=float)[keep]
+
+
+    #AXCP only: replacing velocity profiles after the processor recalculates them
+    def replace_profiles(self, tabID, data):
+        for (ckey,cdata) in zip(["Umag", "Vmag", "Utrue", "Vtrue"], data):
+            self.rawdata[ckey] = cdata
+
+
+    #AXCP only: truncating profiles based on refined spindown time
+    def truncate_profiles(self, tabID, nffspindown):
+        self.rawdata.truncate(nffspindown)
+
+
+    def terminated(self, tabID):
+        self.isprocessing = False
+
+
+    def failed(self, tabID, reason):
+        self.errors.append(reason)
+
+
+    def updateprogress(self, tabID, progress):
+        self.progress = progress
+
+
+    def updatestats(self, tabID, stats):
+        self.stats = stats
+
+
+
+
+
+# =============================================================================
+#   BUILDING/WRITING RAW DATA FILES
+# =============================================================================
+
+#builds the profile (for DTA/DAT/NVO files), EDF data fields, and EDF comments from a DAS raw data dict
+#processor is the processor used to generate rawdata (AXCTD metadata and AXCP settings are pulled from it)
+def build_DAS_output(probetype, rawdata, processor, settingsdict):
+
+    probetype = probetype.upper()
+
+    if probetype == 'AXCTD':
+        profdata = {'depth':rawdata["depth"], 'temperature': rawdata["temperature"], 'salinity':rawdata["salinity"], 'time':rawdata["time"], 'frequency':[999] * len(rawdata["depth"]), 'U':None, 'V':None}
+        edf_data = {'Time (s)': rawdata["time"], 'Frame (hex)': rawdata["frame"], 'Depth (m)':rawdata["depth"],'Temperature (degC)':rawdata["temperature"],'Conductivity (mS/cm)':rawdata["conductivity"], 'Salinity (PSU)':rawdata["salinity"]}
+
+        if rawdata["firstpulsetime"] >= 0:
+            metadata = processor.metadata
+
+        else: #default comments to use if no profile detected
+            metadata = {'zcoeff_default':settingsdict["zcoeff_axctd"],'zcoeff_valid':4*[False], 'tcoeff_default':settingsdict["tcoeff_axctd"],'tcoeff_valid':4*[False], 'ccoeff_default':settingsdict["ccoeff_axctd"],'ccoeff_valid':4*[False], 'serial_no':None, 'max_depth':None}
+
+        coeffs = {}
+        coeffops = ['z','t','c']
+        for c in coeffops:
+            if sum(metadata[c + 'coeff_valid']) == 4:
+                coeffs[c] = metadata[c+'coeff']
+            else:
+                coeffs[c] = metadata[c+'coeff_default']
+
+        edf_comments = f"""Probe Type       :  AXCTD
+    Serial Number      :  {metadata['serial_no'] if metadata['serial_no'] is not None else 'Not Provided'}
+    Terminal Depth (m) :  {metadata['max_depth'] if metadata['max_depth'] is not None else 'Not Provided'}
+    Depth Coeff. 1     :  {coeffs['z'][0]}
+    Depth Coeff. 2     :  {coeffs['z'][1]}
+    Depth Coeff. 3     :  {coeffs['z'][2]}
+    Depth Coeff. 4     :  {coeffs['z'][3]}
+    Pressure Pt Correction:  N/A
+    Temp. Coeff. 1     :  {coeffs['t'][0]}
+    Temp. Coeff. 2     :  {coeffs['t'][1]}
+    Temp. Coeff. 3     :  {coeffs['t'][2]}
+    Temp. Coeff. 4     :  {coeffs['t'][3]}
+    Cond. Coeff. 1     :  {coeffs['c'][0]}
+    Cond. Coeff. 2     :  {coeffs['c'][1]}
+    Cond. Coeff. 3     :  {coeffs['c'][2]}
+    Cond. Coeff. 4     :  {coeffs['c'][3]}"""
+
+    elif probetype == 'AXCP':
+        profdata = {'depth':rawdata["depth"], 'temperature': rawdata["temperature"], 'salinity':None, 'U':rawdata["Utrue"], 'V':rawdata["Vtrue"], 'time':rawdata["time"], 'frequency':[999] * len(rawdata["depth"])}
+
+        edf_data = {'Time (s)': rawdata["time"], 'Rotation Rate (Hz)': rawdata["frequency"], 'Rotation Deviation (Hz)': rawdata["frotdev"], 'Depth (m)':rawdata["depth"],'Temperature (degC)':rawdata["temperature"],'Zonal Current (m/s)':rawdata["Utrue"], 'Meridional Current (m/s)':rawdata["Vtrue"]}
+
+        qualities = ['High','Moderate','Low']
+        cproc = processor
+        edf_comments = f"""Probe Type       :  AXCP
+    Temperature Mode   :  {'FFT' if cproc.temp_mode >= 2 else 'Zero Crossing'}
+    Reverse Coil       :  {'Yes' if cproc.revcoil else 'No'}
+    Process Quality    :  {qualities[cproc.quality-1]}
+    MagVar Latitude    :  {cproc.lat:8.3f} {'N' if cproc.lat >= 0 else 'S'}
+    MagVar Longitude   :  {cproc.lon:9.3f} {'E' if cproc.lon >= 0 else 'W'}
+    F_h                :  {np.round(cproc.fh)} nT
+    F_z                :  {np.round(cproc.fz)} nT
+    Declination        :  {cproc.dec:5.1f} degrees
+//NOTE: Currents are provided in degrees True
+    """
+
+
+    else: #AXBT
+        profdata = {'depth':rawdata["depth"], 'temperature':rawdata["temperature"], 'salinity':None, 'time':rawdata["time"], 'frequency': rawdata["frequency"], 'U':None, 'V':None}
+        edf_data = {'Time (s)': rawdata["time"], 'Frequency (Hz):': rawdata["frequency"], 'Depth (m)':rawdata["depth"],'Temperature (degC)':rawdata["temperature"]}
+        zcoeff = settingsdict["zcoeff_axbt"]
+        tcoeff = settingsdict["tcoeff_axbt"]
+        edf_comments = f"""Probe Type       :  AXBT
+    Terminal Depth   :  850 m
+    Depth Coeff. 1   :  {zcoeff[0]}
+    Depth Coeff. 2   :  {zcoeff[1]}
+    Depth Coeff. 3   :  {zcoeff[2]}
+    Depth Coeff. 4   :  {zcoeff[3]}
+    Pressure Pt Correction:  N/A
+    Temp. Coeff. 1   :  {tcoeff[0]}
+    Temp. Coeff. 2   :  {tcoeff[1]}
+    Temp. Coeff. 3   :  {tcoeff[2]}
+    Temp. Coeff. 4   :  {tcoeff[3]}"""
+
+    return profdata, edf_data, edf_comments
+
+
+
+#writes the requested raw data files (any of 'DTA','DAT','NVO','EDF','WAV','sigdata','sigtxt','stats','bits' in filetypes) to filename + extension
+#sigdata is the binary signal data log (sigdatafile, see DAS_sigdata.py) and sigtxt its text export (.sigdata.txt)
+#bits is the AXCTD demodulated bitstream (bitstreamfile, .bits.npz, see DAS_bitstream.py)
+#stats is the processor statistics log (statsfile, only written if the processor statslog setting is enabled)
+#dropdatetime/lat/lon are required for DTA/DAT/NVO/EDF files, which are skipped if they are None
+#returns a list of the file types that couldn't be saved
+def write_DAS_files(filename, filetypes, probetype, rawdata, processor, settingsdict, dropdatetime=None, lat=None, lon=None, identifier='', datasource='Audio', wavfile=None, sigdatafile=None, statsfile=None, bitstreamfile=None):
+
+    probetype = probetype.upper()
+    filetypes = [cf.upper() for cf in filetypes]
+    failed = []
+
+    profdata, edf_data, edf_comments = build_DAS_output(probetype, rawdata, processor, settingsdict)
+    goodmetadata = dropdatetime is not None and lat is not None and lon is not None
+
+    #position/time dependent files can't be written without good metadata
+    if not goodmetadata:
+        failed.extend([cf for cf in ['DTA','DAT','NVO','EDF'] if cf in filetypes])
+    else:
+        if 'DTA' in filetypes and probetype != 'AXCP': #save DTA file
+            try:
+                io.writelogfile(filename+'.DTA', dropdatetime, profdata['depth'], profdata['temperature'], profdata['frequency'], profdata['time'], probetype)
+            except Exception:
+                trace_error()
+                failed.append('DTA')
+
+        if 'DAT' in filetypes: #save DAT file
+            try:
+                headerstart = "****0000000000****\nSOFX01 KWBC 000000\n"
+                io.writedatfile(filename+'.dat', dropdatetime, lat, lon, headerstart, identifier, settingsdict.get('missionid','UNKNOWN1'), profdata['depth'], profdata['temperature'], salinity=profdata['salinity'], U=profdata['U'], V=profdata['V'])
+            except Exception:
+                trace_error()
+                failed.append('DAT')
+
+        if 'NVO' in filetypes: #save NVO file
+            try:
+                io.writefinfile(filename+'.nvo', dropdatetime, lat, lon, 99, profdata['depth'], profdata['temperature'], salinity=profdata['salinity'], U=profdata['U'], V=profdata['V'])
+            except Exception:
+                trace_error()
+                failed.append('NVO')
+
+        if 'EDF' in filetypes: #save EDF file
+            try:
+                edf_comments += "\n//Data source: " + datasource
+                io.writeedffile(filename+'.edf', dropdatetime, lat, lon, edf_data, edf_comments, QC=False, field_formats=[])
+            except Exception:
+                trace_error()
+                failed.append('EDF')
+
+    for (cf, oldfile, ext) in [('WAV', wavfile, '.WAV'), ('SIGDATA', sigdatafile, '.sigdata'), ('STATS', statsfile, '.stats'), ('BITS', bitstreamfile, '.bits.npz')]:
+        if cf in filetypes:
+            try:
+                if oldfile is None or not os.path.exists(oldfile):
+                    failed.append(cf)
+                elif os.path.abspath(oldfile) != os.path.abspath(filename + ext):
+                    shcopy(oldfile, filename + ext)
+            except Exception:
+                trace_error()
+                failed.append(cf)
+
+    if 'SIGTXT' in filetypes:
+        try:
+            if sigdatafile is None or not os.path.exists(sigdatafile):
+                failed.append('SIGTXT')
+            else:
+                export_sigdata_text(sigdatafile, filename + '.sigdata.txt')
+        except Exception:
+            trace_error()
+            failed.append('SIGTXT')
+
+    return failed
+
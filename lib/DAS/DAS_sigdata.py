@@ -0,0 +1,307 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the binary signal data (sigdata) log written by each processor engine
+# (self.sigdata, sigdata_<tabID>.bin in the processor tempdir, saved as <drop>.sigdata).
+# Each probe type has tables of typed columns (sigdatatables) that the processor appends
+# rows to every iteration (append, or append_rows for arrays of rows), along with text
+# messages for processor events (write- trigger/spinup detection, headers, gaps...).
+# Rows are buffered and written in blocks, so logging costs ~a microsecond per row.
+#
+# read_sigdata loads a sigdata file as numpy arrays, and export_text writes it as text
+#
+# File format (little endian):
+#   header: b"AXBPSSIG", uint16 version, uint32 N, N bytes of JSON {"probetype", "tables": {table: [[column, dtype], ...]}}
+#   blocks: char type, uint16 table number, uint16 column number, uint32 N, N byte payload
+#       b'R' (rows): packed rows of the table (numpy structured dtype, ragged columns stored as the number of values)
+#       b'V' (values): concatenated values for one ragged column (dtype "*<type>") for the rows in the preceding R block
+#       b'M' (message): UTF-8 text, in order relative to the rows of all tables
+#   Row order is kept within each table, but rows of different tables buffered between messages aren't interleaved
+#
+# SigdataLog methods can be called from any thread (e.g. kill() on the GUI thread writes the AXCP refined spindown and
+# closes the file while the processor thread may still be appending), each call holds the log's lock
+
+
+import struct
+import json
+import threading
+import numpy as np
+from traceback import print_exc as trace_error
+
+
+
+#typed columns logged by each processor (ragged columns, with a variable number of values per row, start with *)
+sigdatatables = {"AXBT": {"data": [["time","f8"], ["frequency","f4"], ["siglevel","f4"], ["sigratio","f4"]]},
+
+                 "AXCTD": {"levels": [["time","f8"], ["p400","f4"], ["p7500","f4"], ["pdead","f4"], ["r400","f4"], ["r7500","f4"], ["status","i1"]]},
+
+                 "AXCP": {"iterations": [["npp","i4"], ["time","f8"], ["peak","f4"], ["ccenv","f4"], ["fccdev","f4"], ["frotlp","f4"], ["frotdev","f4"], ["depth_fft","f4"], ["temp_fft","f4"]],
+                          "points": [["nff","i4"], ["time","f8"], ["depth","f8"], ["temp_zc","f4"], ["umag","f4"], ["vmag","f4"], ["area","f4"], ["rotfavg","f4"], ["rotfrms","f4"],
+                                     ["ftbl","f4"], ["efbl","f4"], ["ccbl","f4"], ["fefr","f4"], ["fccr","f4"], ["terr","f4"], ["verr","f4"], ["aerr","f4"], ["w","f4"],
+                                     ["envxcc","*f4"], ["pk","*f4"], ["vc0a","f4"], ["vc0p","f4"], ["ve0a","f4"], ["ve0p","f4"], ["gcca","f4"], ["gefa","f4"], ["nindep","i4"]]}}
+
+magic = b"AXBPSSIG"
+version = 1
+blockheader = struct.Struct("<cHHI")
+
+
+
+#numpy structured dtype for a table's rows (ragged columns are stored as their number of values) and the ragged column numbers/dtypes
+def table_dtype(columns):
+    rowtype = np.dtype([(cname, "<i4" if ctype.startswith("*") else "<" + ctype) for (cname, ctype) in columns])
+    ragged = [(ci, np.dtype("<" + ctype[1:])) for (ci, (cname, ctype)) in enumerate(columns) if ctype.startswith("*")]
+    return rowtype, ragged
+
+
+
+class SigdataTable:
+
+    def __init__(self, tableID, name, columns, buffersize):
+        self.tableID = tableID
+        self.name = name
+        self.columns = columns
+        self.rowtype, self.ragged = table_dtype(columns)
+        self.rows = np.zeros(buffersize, dtype=self.rowtype) #buffered rows
+        self.nrows = 0
+        self.values = {ci:[] for (ci, ctype) in self.ragged} #buffered ragged column values
+
+
+
+class SigdataLog:
+
+    def __init__(self, filename, probetype, buffersize=256):
+        self.filename = filename
+        self.probetype = probetype
+        self.tables = {name:SigdataTable(i, name, columns, buffersize) for (i, (name, columns)) in enumerate(sigdatatables.get(probetype, {}).items())}
+        self.text = [] #message text not yet written
+        self.lock = threading.RLock() #serializes buffering and block writes between threads
+
+        header = json.dumps({"probetype":probetype, "tables":sigdatatables.get(probetype, {})}).encode("utf-8")
+        self.file = open(filename, 'wb')
+        self.file.write(magic + struct.pack("<HI", version, len(header)) + header)
+
+
+    #appends one row to a table (values in column order, with a sequence of values for each ragged column)
+    def append(self, table, *values):
+        with self.lock:
+            if self.file is None:
+                return
+            if self.text:
+                self.write_text()
+
+            ctable = self.tables[table]
+            if ctable.ragged:
+                values = list(values)
+                for (ci, ctype) in ctable.ragged:
+                    cvalues = np.asarray(values[ci], dtype=ctype).ravel()
+                    ctable.values[ci].append(cvalues)
+                    values[ci] = len(cvalues)
+
+            ctable.rows[ctable.nrows] = tuple(values)
+            ctable.nrows += 1
+            if ctable.nrows == len(ctable.rows):
+                self.flush_table(ctable)
+
+
+    #appends multiple rows to a table from arrays for each column (in column order, a list of sequences for each ragged column)
+    def append_rows(self, table, *columns):
+        if len(columns[0]) == 0:
+            return
+        
+        ctable = self.tables[table]
+        rows = np.empty(len(columns[0]), dtype=ctable.rowtype)
+        values = {}
+        for (ci, ((cname, ctype), cdata)) in enumerate(zip(ctable.columns, columns)):
+            if ctype.startswith("*"):
+                cvalues = [np.asarray(crow).ravel() for crow in cdata]
+                rows[cname] = [len(crow) for crow in cvalues]
+                values[ci] = cvalues
+            else:
+                rows[cname] = cdata
+
+        with self.lock:
+            if self.file is None:
+                return
+            if self.text:
+                self.write_text()
+            self.flush_table(ctable) #rows must be written in order
+            
+            self.write_block(b'R', ctable.tableID, 0, rows.tobytes())
+            for (ci, ctype) in ctable.ragged:
+                self.write_block(b'V', ctable.tableID, ci, np.concatenate(values[ci]).astype(ctype).tobytes() if values[ci] else b'')
+
+
+    #writes a text message (like a text file, messages can be written in pieces and should end with a newline)
+    def write(self, text):
+        with self.lock:
+            if self.file is None:
+                return
+            for ctable in self.tables.values(): #messages are written after all rows appended before them
+                self.flush_table(ctable)
+            self.text.append(text)
+
+
+    def write_text(self):
+        with self.lock:
+            self.write_block(b'M', 0, 0, "".join(self.text).encode("utf-8"))
+            self.text = []
+
+
+    def flush_table(self, ctable):
+        with self.lock:
+            if ctable.nrows == 0:
+                return
+            self.write_block(b'R', ctable.tableID, 0, ctable.rows[:ctable.nrows].tobytes())
+            for (ci, ctype) in ctable.ragged:
+                self.write_block(b'V', ctable.tableID, ci, np.concatenate(ctable.values[ci]).astype(ctype).tobytes())
+                ctable.values[ci] = []
+            ctable.nrows = 0
+
+
+    #block header and payload are written together (another thread's block can't be written between them)
+    def write_block(self, blocktype, tableID, column, payload):
+        with self.lock:
+            if self.file is None: #closed by another thread
+                return
+            self.file.write(blockheader.pack(blocktype, tableID, column, len(payload)))
+            self.file.write(payload)
+
+
+    #writes all buffered rows/messages to the file
+    def flush(self):
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                if self.text:
+                    self.write_text()
+                for ctable in self.tables.values():
+                    self.flush_table(ctable)
+                self.file.flush()
+            except Exception:
+                trace_error()
+
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+
+
+# =============================================================================
+#         READING SIGDATA FILES
+# =============================================================================
+
+#returns the file header (probetype, tables) and a list of (block type, table name, column number, payload) for each block
+def read_blocks(filename):
+    with open(filename, 'rb') as f_in:
+        filedata = f_in.read()
+
+    if filedata[:len(magic)] != magic:
+        raise ValueError(f"{filename} is not an AXBPS binary signal data file")
+
+    ind = len(magic)
+    (fileversion, headerlength) = struct.unpack_from("<HI", filedata, ind)
+    ind += struct.calcsize("<HI")
+    header = json.loads(filedata[ind:ind+headerlength].decode("utf-8"))
+    ind += headerlength
+
+    tablenames = list(header["tables"].keys())
+    blocks = []
+    while ind + blockheader.size <= len(filedata):
+        (blocktype, tableID, column, length) = blockheader.unpack_from(filedata, ind)
+        ind += blockheader.size
+        if ind + length > len(filedata): #incomplete block at the end of the file (e.g. the processor crashed)
+            break
+        blocks.append((blocktype, tablenames[tableID] if blocktype != b'M' else None, column, filedata[ind:ind+length]))
+        ind += length
+
+    return header, blocks
+
+
+
+#loads a sigdata file, returning {"probetype", "tables": {table: {column: array}}, "messages": [text]}
+#ragged columns are lists with an array of values for each row
+def read_sigdata(filename):
+    header, blocks = read_blocks(filename)
+
+    tabletypes = {name:table_dtype(columns) for (name, columns) in header["tables"].items()}
+    rows = {name:[] for name in tabletypes.keys()}
+    values = {name:{ci:[] for (ci, ctype) in ragged} for (name, (rowtype, ragged)) in tabletypes.items()}
+    messages = []
+
+    for (blocktype, table, column, payload) in blocks:
+        if blocktype == b'R':
+            rows[table].append(np.frombuffer(payload, dtype=tabletypes[table][0]))
+        elif blocktype == b'V':
+            values[table][column].append(np.frombuffer(payload, dtype=dict(tabletypes[table][1])[column]))
+        elif blocktype == b'M':
+            messages.append(payload.decode("utf-8"))
+
+    tables = {}
+    for (name, columns) in header["tables"].items():
+        rowtype, ragged = tabletypes[name]
+        crows = np.concatenate(rows[name]) if rows[name] else np.zeros(0, dtype=rowtype)
+        tables[name] = {cname:crows[cname].copy() for (cname, ctype) in columns}
+
+        for (ci, ctype) in ragged: #splitting ragged column values into one array per row
+            cname = columns[ci][0]
+            cvalues = np.concatenate(values[name][ci]) if values[name][ci] else np.zeros(0, dtype=ctype)
+            tables[name][cname] = np.split(cvalues, np.cumsum(crows[cname])[:-1]) if len(crows) > 0 else []
+
+    return {"probetype":header["probetype"], "tables":tables, "messages":messages}
+
+
+
+#writes a sigdata file as text: a header line for each table ("#table: columns"), then messages
+#and rows ("table,value1,value2,...", with ragged columns written as [value1 value2 ...]) in the order they were logged
+def export_text(filename, textfile):
+    header, blocks = read_blocks(filename)
+    tabletypes = {name:table_dtype(columns) for (name, columns) in header["tables"].items()}
+
+    with open(textfile, 'w') as f_out:
+        f_out.write(f"{header['probetype']} signal data\n")
+        for (name, columns) in header["tables"].items():
+            f_out.write(f"#{name}: {','.join([cname for (cname, ctype) in columns])}\n")
+
+        pending = None #rows waiting for their ragged column values
+        for (blocktype, table, column, payload) in blocks + [(None, None, None, None)]:
+
+            #writing rows once all ragged values have been read
+            if pending is not None and (blocktype != b'V' or table != pending[0]):
+                (ctable, crows, cvalues) = pending
+                rowtype, ragged = tabletypes[ctable]
+                splitvalues = {ci:np.split(cvalues.get(ci, np.zeros(0)), np.cumsum(crows[rowtype.names[ci]])[:-1]) for (ci, ctype) in ragged}
+                for (ri, crow) in enumerate(crows):
+                    rowstr = [str(cval) if ci not in splitvalues else "[" + " ".join([str(v) for v in splitvalues[ci][ri]]) + "]" for (ci, cval) in enumerate(crow)]
+                    f_out.write(f"{ctable},{','.join(rowstr)}\n")
+                pending = None
+
+            if blocktype == b'R':
+                pending = (table, np.frombuffer(payload, dtype=tabletypes[table][0]), {})
+            elif blocktype == b'V':
+                pending[2][column] = np.frombuffer(payload, dtype=dict(tabletypes[table][1])[column])
+            elif blocktype == b'M':
+                f_out.write(payload.decode("utf-8"))
+
@@ -0,0 +1,167 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the timing/lag statistics kept by each processor engine (self.stats).
+# The processor loops wrap each stage (FFT, demodulation, parsing, sigdata writes, signal
+# emission...) with stats.start(stage)/stats.stop(stage), and set the processing lag
+# (seconds of received audio not yet processed) each iteration. A summary dict is emitted
+# with the updatestats signal about once per second (see _processor_functions.report_stats)
+# and optionally written to a stats log (stats_<tabID>.txt in the processor tempdir)
+#
+# Summary dict format:
+#   {"tabID", "probetype", "elapsed" (sec since processor start), "lag", "maxlag" (sec),
+#    "level" (realtime backpressure processing level), "gaps": [[start, length] (sec) of dropped audio],
+#    "counters": {name: count}, "stages": {stage: {"count", "total", "mean", "max", "last", "hist"}}}
+#   where stage durations are in seconds and hist is the number of calls in each of the
+#   duration bins bounded by histedges (+ one bin for durations exceeding the last edge)
+
+
+from time import perf_counter #monotonic clock
+from bisect import bisect
+from traceback import print_exc as trace_error
+
+
+
+#histogram bin edges (seconds) for stage durations- 0.1 ms to 10 sec, 3 bins per decade
+histedges = [1E-4 * 10**(i/3) for i in range(16)]
+
+
+
+class ProcessorStats:
+
+    def __init__(self, tabID, probetype, logfile=None, interval=1):
+        self.tabID = tabID
+        self.probetype = probetype
+        self.interval = interval #minimum time between reports (seconds)
+
+        self.stages = {}
+        self.counters = {}
+        self.started = {} #start times for stages currently being timed
+
+        self.lag = 0. #seconds behind realtime (most recent and maximum)
+        self.maxlag = 0.
+        self.level = 0 #backpressure processing level (see _processor_functions.check_backpressure)
+        self.gaps = [] #[start time, length] of audio dropped by the processor (seconds)
+
+        self.starttime = perf_counter()
+        self.lastreport = self.starttime
+
+        #optional stats log
+        self.logfilename = logfile
+        self.logfile = None
+        if logfile is not None:
+            try:
+                self.logfile = open(logfile, 'w')
+                self.logfile.write(f"{probetype} processor statistics (tab {tabID}), stage times in msec: calls/mean/max\n")
+            except Exception:
+                trace_error()
+                self.logfile = None
+
+
+    #timing processor stages: call start(stage) before and stop(stage) after each stage
+    def start(self, stage):
+        self.started[stage] = perf_counter()
+
+
+    #returns the stage duration (seconds), or 0 if start(stage) wasn't called
+    def stop(self, stage):
+        tstart = self.started.pop(stage, None)
+        if tstart is None: #ignore unmatched stop() calls
+            return 0.
+        duration = perf_counter() - tstart
+        self.add_time(stage, duration)
+        return duration
+
+
+    #adds a duration (seconds) for the specified stage
+    def add_time(self, stage, duration):
+        if stage not in self.stages:
+            self.stages[stage] = {"count":0, "total":0., "max":0., "last":0., "hist":[0]*(len(histedges)+1)}
+
+        cstage = self.stages[stage]
+        cstage["count"] += 1
+        cstage["total"] += duration
+        cstage["last"] = duration
+        if duration > cstage["max"]:
+            cstage["max"] = duration
+        cstage["hist"][bisect(histedges, duration)] += 1
+
+
+    #increments a counter (e.g. iterations, demodulated bits, profile points)
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+    #seconds of received audio that haven't been processed yet
+    def set_lag(self, lag):
+        self.lag = max(lag, 0.)
+        if self.lag > self.maxlag:
+            self.maxlag = self.lag
+
+
+    #notes audio that was dropped (not processed) by the processor
+    def add_gap(self, start, length):
+        self.gaps.append([float(start), float(length)])
+
+
+    def report_due(self):
+        return perf_counter() - self.lastreport >= self.interval
+
+
+    def summary(self):
+        stages = {}
+        for (name, cstage) in self.stages.items():
+            stages[name] = {"count":cstage["count"], "total":cstage["total"], "mean":cstage["total"]/cstage["count"], "max":cstage["max"], "last":cstage["last"], "hist":list(cstage["hist"])}
+
+        return {"tabID":self.tabID, "probetype":self.probetype, "elapsed":perf_counter() - self.starttime, "lag":self.lag, "maxlag":self.maxlag, "level":self.level, "gaps":[list(cgap) for cgap in self.gaps], "counters":dict(self.counters), "stages":stages}
+
+
+    #returns the current summary and writes it to the stats log (if enabled)
+    def report(self):
+        self.lastreport = perf_counter()
+        summary = self.summary()
+
+        if self.logfile is not None:
+            try:
+                stagestr = " | ".join([f"{name}: {cstage['count']}/{1000*cstage['mean']:.2f}/{1000*cstage['max']:.2f}" for (name, cstage) in summary["stages"].items()])
+                counterstr = ",".join([f"{name}={n}" for (name, n) in summary["counters"].items()])
+                self.logfile.write(f"t={summary['elapsed']:.1f},lag={summary['lag']:.2f},maxlag={summary['maxlag']:.2f},level={summary['level']},gaps={len(summary['gaps'])},{counterstr} | {stagestr}\n")
+            except Exception:
+                trace_error()
+
+        return summary
+
+
+    #writes duration histograms for each stage to the stats log and closes it
+    def close(self):
+        if self.logfile is None:
+            return
+
+        try:
+            edgestr = ",".join([f"{1000*cedge:.3g}" for cedge in histedges])
+            self.logfile.write(f"Stage duration histograms (counts for bins with edges at {edgestr} msec):\n")
+            for (name, cstage) in self.stages.items():
+                self.logfile.write(f"{name}: {','.join([str(n) for n in cstage['hist']])}\n")
+            for (start, length) in self.gaps:
+                self.logfile.write(f"Gap: {length:.2f} sec of audio dropped at {start:.2f} sec\n")
+            self.logfile.close()
+        except Exception:
+            trace_error()
+        self.logfile = None
+
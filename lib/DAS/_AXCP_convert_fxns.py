@@ -21,16 +21,12 @@
 # =============================================================================
 
 import numpy as np
-from lib.DAS.common_DAS_functions import dataconvert
     
     
 
 def calc_temp_from_freq(self, freq, depth):
     teres = 1.0/(4.4*freq*self.tcalcap)-self.tcalrs
-    if teres>0:
-        ln = np.log(teres) 
-    else:
-        ln = np.NaN 
+    ln = np.log(np.where(teres > 0, teres, np.NaN)) #NaN for nonpositive resistance (works for scalars or arrays)
 
     temp=1.0/(self.tcal[0]+ln*(self.tcal[1]+ln*(self.tcal[2]+ ln*self.tcal[3]))) - 273.15
     
@@ -39,81 +35,136 @@ def calc_temp_from_freq(self, freq, depth):
     
     return temp
     
-
-
-
-def calc_vel_components(self, fcss, fess, tss):
-
+    
+    
+#solves a stack of small least squares problems (one per fit segment) from their normal equations
+def solve_normal_equations(A, b):
+    try:
+        return np.linalg.solve(A, b[...,np.newaxis])[...,0]
+    except np.linalg.LinAlgError: #at least one singular segment- fall back to minimum norm solutions for every segment
+        return np.array([np.linalg.lstsq(cA, cb, rcond=None)[0] for (cA,cb) in zip(A,b)])
+    
+    
+    
+#zero crossing analysis for each row (fit segment) of fcss: rotation period stats and phase at each sample
+#fcss, tss, and valid are (# segments x max points per segment) arrays, valid is False for padding at the end of shorter segments
+def calc_rotation_phase(fcss, tss, valid):
+    
+    nseg, npts = fcss.shape
+    
     # tz to get rotation period
     # interpolate fcss to get positive zero crossing times, tz
-    j = np.where(np.isfinite(fcss))[0]
-    x = fcss - np.mean(fcss[j]) 
-    r = np.ones(len(x))
-    r[x < 0] = -1
-    jp = np.where(np.diff(r) > 0)[0]
-    dxjp =   x[jp+1] -   x[jp]
-    dtjp = tss[jp+1] - tss[jp]
-    tzp = tss[jp] - x[jp] * dtjp / dxjp
-    per = np.diff(tzp)
-    
-    if np.sum(np.isfinite(per)) > 1:
-        peravg = np.nanmean(per)
-        perrms = np.nanstd(per)
-    else:
-        peravg = np.NaN
-        perrms = np.NaN
-    
-    
-    rotfavg = np.round(1/peravg, 2)
-    rotfrms = np.round(rotfavg * perrms / peravg, 2)
-    
-    # make phase
-    phase = np.NaN * np.ones(len(tss))
-    for jper,_ in enumerate(per):
-        j = np.where((tzp[jper]<tss) & (tss <= tzp[jper+1]))[0]
-        phase[j] = 2*np.pi*(tss[j] - tzp[jper]) / per[jper]
-    
-    # sinusoidal fitting
-    j=np.where(np.isfinite(phase))[0]
-    nfit = len(j)
+    good = valid & np.isfinite(fcss)
+    ngood = np.sum(good, axis=1)
+    fccmean = np.sum(np.where(good, fcss, 0), axis=1) / np.maximum(ngood, 1)
+    fccmean[ngood == 0] = np.NaN
+    x = fcss - fccmean[:,np.newaxis]
+    r = np.where(x < 0, -1, 1)
+    iscross = (np.diff(r, axis=1) > 0) & valid[:,1:] #crossing between samples j and j+1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tz = tss[:,:-1] - x[:,:-1] * np.diff(tss, axis=1) / np.diff(x, axis=1)
+    tz[~iscross] = np.NaN
+    
+    #packing crossing times to the front of each row (tzp[i,k] = time of kth crossing in segment i)
+    cumcross = np.cumsum(iscross, axis=1)
+    rows, cols = np.nonzero(iscross)
+    tzp = np.NaN * np.ones((nseg, npts+1))
+    tzp[rows, cumcross[rows,cols]-1] = tz[rows,cols]
+    per = np.diff(tzp, axis=1)
+    
+    goodper = np.isfinite(per)
+    nper = np.sum(goodper, axis=1)
+    peravg = np.sum(np.where(goodper, per, 0), axis=1) / np.maximum(nper, 1)
+    perrms = np.sqrt(np.sum(np.where(goodper, (per - peravg[:,np.newaxis])**2, 0), axis=1) / np.maximum(nper, 1))
+    peravg[nper <= 1] = np.NaN
+    perrms[nper <= 1] = np.NaN
+    
+    # make phase: index of the last crossing before each sample time (tzp[k] < tss <= tzp[k+1])
+    nprev = np.zeros((nseg, npts), dtype=int)
+    nprev[:,2:] = cumcross[:,:-1]
+    nprev[:,1:] += iscross & (tz < tss[:,1:])
+    k = np.maximum(nprev - 1, 0)
+    tzprev = np.take_along_axis(tzp, k, axis=1)
+    tznext = np.take_along_axis(tzp, k+1, axis=1)
+    inper = valid & (nprev > 0) & (tzprev < tss) & (tss <= tznext)
+    phase = np.NaN * np.ones((nseg, npts))
+    phase[inper] = 2*np.pi*(tss[inper] - tzprev[inper]) / (tznext[inper] - tzprev[inper])
+    
+    return peravg, perrms, phase
+    
+    
+    
+#stacked design matrices [cos(phase), sin(phase), 1, linspace(-1,1,nfit)] for each row, zeroed outside of fitpts
+def sinusoid_design(phase, fitpts):
+    nfit = np.sum(fitpts, axis=1)
+    trend = -1 + 2*(np.cumsum(fitpts, axis=1) - 1) / np.maximum(nfit - 1, 1)[:,np.newaxis] #linspace(-1,1,nfit) across the fitted points
+    design = np.stack([np.cos(phase), np.sin(phase), np.ones(phase.shape), trend], axis=2)
+    design[~fitpts] = 0
+    return design
+    
+    
+    
+#stacked least squares fits of data to the design matrix columns for each row
+#only points in fitpts are used, rows where dofit is False return NaNs
+def fit_design(design, data, fitpts, dofit):
+    
+    nfit = np.sum(fitpts, axis=1)
+    y = np.where(fitpts, data, 0)
+    
+    #stacked normal equations (design.T * design) * coef = design.T * y, identity for rows that aren't fit
+    designT = np.swapaxes(design, 1, 2)
+    A = np.matmul(designT, design)
+    b = np.matmul(designT, y[:,:,np.newaxis])[:,:,0]
+    A[~dofit] = np.eye(A.shape[1])
+    b[~dofit] = 0
+    coef = solve_normal_equations(A, b)
+    coef[~dofit] = np.NaN
+    
+    #standard deviation of fit residuals
+    res = np.where(fitpts, y - np.matmul(design, coef[:,:,np.newaxis])[:,:,0], 0)
+    resavg = np.sum(res, axis=1) / np.maximum(nfit, 1)
+    resstd = np.sqrt(np.sum(np.where(fitpts, (res - resavg[:,np.newaxis])**2, 0), axis=1) / np.maximum(nfit, 1))
+    resstd[~dofit] = np.NaN
+    
+    return coef, resstd
+    
+    
+
+#calculates rotation rate and velocity/coil amplitudes and phases for a batch of fit segments at once
+#fcss, fess, tss, and valid are (# segments x max points per segment) arrays- see calc_rotation_phase
+def calc_vel_components(self, fcss, fess, tss, valid):
+    
+    peravg, perrms, phase = calc_rotation_phase(fcss, tss, valid)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rotfavg = np.round(1/peravg, 2)
+        rotfrms = np.round(rotfavg * perrms / peravg, 2)
+    
+    # sinusoidal fitting- only segments with more than half of their points within a full rotation
+    fitpts = np.isfinite(phase)
+    dofit = np.sum(fitpts, axis=1) > np.sum(valid, axis=1)/2
     
     #using matrix math to combine individual compass coil (direction) and EF (current speed) measurements for current
     #datapoint and calculate frequency amplitudes and phases for velocity estimates
-    if nfit > len(phase)/2:
-        aprxcc = np.stack([np.cos(phase[j]), np.sin(phase[j]), np.ones(len(j))])
-        coefcc, _,_,_ = np.linalg.lstsq(aprxcc.T, fcss[j],rcond=None) #coefcc = aprxcc \ fcss(j)
-        rescc = fcss[j] - np.matmul(aprxcc.T, coefcc) # rescc = fcss[j] - aprxcc * coefcc
-        fccr = np.nanstd(rescc)
-        fcca = np.sqrt(coefcc[0]**2+coefcc[1]**2)
-        fccp = np.arctan2(-coefcc[1],coefcc[0])
-        ccbl = coefcc[2]
-        
-        aprxef = np.append(aprxcc, np.array([np.linspace(-1,1,len(j))]), axis=0) #aprxef = [aprxcc,  linspace(-1,1,length(j))']
-        coefef, _,_,_ = np.linalg.lstsq(aprxef.T, fess[j],rcond=None) #coefef = aprxef \ fess(j)'
-        resef = fess[j] - np.matmul(aprxef.T, coefef) # resef = fess[j] - aprxef * coefef
-        fefr = np.nanstd(resef)
-        fefa = np.sqrt(coefef[0]**2+coefef[1]**2)
-        fefp = np.arctan2(-coefef[1],coefef[0])
-        efbl = coefef[2]
-        
-    else:
-        ccbl = np.NaN
-        efbl = np.NaN
-        fccr = np.NaN
-        fefr = np.NaN
-        fcca = np.NaN
-        fefa = np.NaN
-        fccp = np.NaN
-        fefp = np.NaN
-        
+    design = sinusoid_design(phase, fitpts) #aprxef = [aprxcc,  linspace(-1,1,length(j))'], aprxcc is the first 3 columns
+    
+    coefcc, fccr = fit_design(design[:,:,:3], fcss, fitpts, dofit) #coefcc = aprxcc \ fcss(j)
+    fcca = np.sqrt(coefcc[:,0]**2+coefcc[:,1]**2)
+    fccp = np.arctan2(-coefcc[:,1],coefcc[:,0])
+    ccbl = coefcc[:,2]
+    
+    coefef, fefr = fit_design(design, fess, fitpts, dofit) #coefef = aprxef \ fess(j)'
+    fefa = np.sqrt(coefef[:,0]**2+coefef[:,1]**2)
+    fefp = np.arctan2(-coefef[:,1],coefef[:,0])
+    efbl = coefef[:,2]
     
     # probe gain and phase angles as function of rotation frequency
-    gcca  = dataconvert(rotfavg,self.gcca_poly)
-    gccp  = dataconvert(rotfavg,self.gccp_poly)
-    gcora = dataconvert(rotfavg,self.gcora_poly)
-    gcorp = dataconvert(rotfavg,self.gcorp_poly)
-    gefa  = dataconvert(rotfavg,self.gefa_poly)
-    gefp  = dataconvert(rotfavg,self.gefp_poly)
+    gcca  = np.polyval(self.gcca_poly[::-1], rotfavg)
+    gccp  = np.polyval(self.gccp_poly[::-1], rotfavg)
+    gcora = np.polyval(self.gcora_poly[::-1], rotfavg)
+    gcorp = np.polyval(self.gcorp_poly[::-1], rotfavg)
+    gefa  = np.polyval(self.gefa_poly[::-1], rotfavg)
+    gefp  = np.polyval(self.gefp_poly[::-1], rotfavg)
     
     # convert frequency amp and phase to velocity estimates
     vc0a = fcca / self.gcvfa / gcca * 1e6
@@ -24,7 +24,7 @@ import os
 import numpy as np
 from scipy import signal
 from ._AXCP_convert_fxns import calc_temp_from_freq
-from lib.DAS.common_DAS_functions import dataconvert
+from lib.DAS.DAS_conversions import get_polynomial
 
 
     
@@ -44,6 +44,7 @@ def init_AXCP_settings(self, settings):
     #2-use FFT (window size set by settings['tempfftwindow']) once per refresh
     self.settings["cptempmode"] = 2 
     self.settings["cpfftwindow"] = 1.0 #FFT window for temperature in seconds (used if temp_mode > 1) 
+    self.settings["cpffthop"] = 0.25 #time between overlapping temperature FFT windows in seconds (used if temp_mode > 1)
     
     #deviation threshold for FROTDEV- standard deviation of probe rotation frequency must drop below this value
     #in parallel with FROT between 12-18 Hz for spinup to be detected
@@ -67,6 +68,9 @@ def initialize_AXCP_arrays(self):
     self.FROTDEV = np.array([])
     self.TEMP_FFT = np.array([])
     self.DEPTH_FFT = np.array([])
+    self.TIME_FFT = np.array([])
+    self.fft_tail = np.array([]) #end of previous PCM chunk, for FFT windows overlapping two chunks
+    self.fft_last_end = 0 #sample index at the end of the most recent FFT window
     
     
     self.TIME = np.array([])
@@ -201,13 +205,31 @@ def initialize_AXCP_vars(self):
     self.pointsperloop = np.ceil(self.pointsperloop / self.nss1) * self.nss1
     self.pointsperloop = int(np.ceil(self.pointsperloop / self.nss1 / self.nss2) * self.nss1 * self.nss2)
     self.refreshrate = self.pointsperloop / self.f_s # actual seconds
-    self.minpointsperloop = self.pointsperloop
+    
+    #chunk size and temperature FFT spacing (larger chunks/fewer FFTs if realtime processing falls behind)
+    self.set_processing_level(self.processinglevel)
     
     # initialize conversion polynomials
     self.init_constants()
             
     
     
+#realtime backpressure processing levels (see _processor_functions.check_backpressure): level 0 processes
+#refreshrate chunks with temperature FFTs every cpffthop seconds, level 1 processes 2x larger chunks with half
+#as many temperature FFTs, and level 2 processes 4x larger chunks with one temperature FFT per chunk
+#NOTE: axcpquality sets the filter subsampling when processing starts, so it can't be lowered partway through a profile
+def set_processing_level(self, level):
+    
+    self.minpointsperloop = self.pointsperloop * 2**level
+    
+    #points between successive temperature FFT windows (one window per chunk if the step is at least the refresh rate)
+    if self.settings["cpffthop"] >= self.settings["cprefreshrate"] or level >= 2:
+        self.N_temp_hop = self.minpointsperloop
+    else:
+        self.N_temp_hop = min(max(int(np.round(self.f_s * self.settings["cpffthop"])), 1) * 2**level, self.minpointsperloop)
+    
+    
+    
 def init_filters(self):
     
     
@@ -295,6 +317,9 @@ def init_constants(self):
     self.depth_poly =  [4.68, 4.377, -0.00044   ] # Prater, JTech, Dec 1991
     # self.inv_depth_poly = [3.11700848802192e-10,5.14227005928016e-06,0.228465938277901,-1.07390827937333]
     self.inv_depth_poly = [-1.07390827937333,0.228465938277901,5.14227005928016e-06, 3.11700848802192e-10]
+    self.depthconvert = get_polynomial(self.depth_poly) #depth from time since spinup
+    self.timeconvert = get_polynomial(self.inv_depth_poly) #time since spinup from depth
+    self.fallrate = self.depthconvert.derivative()
 
     
     
@@ -311,40 +336,57 @@ def init_fft_window(self,N):
     
     self.N_temp = N
     
-    T = N/self.f_s
-    df = 1 / T
-    self.f = np.array([df * n if n < N / 2 else df * (n - N) for n in range(N)])#constraining peak frequency options to frequencies in specified band
+    self.f = np.fft.rfftfreq(N, 1/self.f_s) #constraining peak frequency options to frequencies in specified band
     self.good_f_ind = np.all((np.greater_equal(self.f, self.flims[0]), np.less_equal(self.f, self.flims[1])), axis=0)
     
     self.good_f = self.f[self.good_f_ind]
     
     
     
-#run fft to determine peak frequency in temperature band
-def dofft(self,pcmdata):
+#run a batch of ffts (one per row of pcmwindows) to determine peak frequencies in temperature band
+def dofft(self,pcmwindows):
     
-    if self.N_temp != len(pcmdata): #correct window length and parameters if it's wrong for some reason
-        self.N_temp = len(pcmdata)
-        self.init_fft_window(self.N_temp)
+    if self.N_temp != pcmwindows.shape[1]: #correct window length and parameters if it's wrong for some reason
+        self.init_fft_window(pcmwindows.shape[1])
     
-    pcmdata = self.taper * pcmdata
-
-    # conducting fft, converting to real space
-    fftdata = np.abs(np.fft.fft(pcmdata))
-    fftdata_inrange = fftdata[self.good_f_ind]
+    # conducting tapered fft, converting to real space
+    fftdata_inrange = np.abs(np.fft.rfft(self.taper * pcmwindows, axis=1))[:,self.good_f_ind]
     
-    maxind = np.argmax(fftdata_inrange)
+    #frequency of max signal within band for each window
+    fp = self.good_f[np.argmax(fftdata_inrange, axis=1)] 
+        
+    return fp
     
-    #frequency of max signal within band (AXBT-transmitted frequency)
-    fp = self.good_f[maxind] 
     
-    #maximum signal strength in band
-    Sp = 10*np.log10(fftdata_inrange[maxind])
-
-    #ratio of maximum signal in band to max signal total (SNR)
-    Rp = fftdata_inrange[maxind]/np.max(fftdata) 
+    
+#short-time FFT across the current PCM chunk: windows of N_temp points every N_temp_hop points, the last ending at the end of the chunk (e)
+#windows may start in the previous chunk, so the new windows end within the current chunk with no added latency
+def calc_fft_temps(self, e):
+    
+    pcm = np.append(self.fft_tail, self.demod_buffer)
+    self.fft_tail = pcm[len(pcm)-self.N_temp+1:]
+    
+    #window end sample indices (exclusive), at least one step after the previous chunk's last window
+    windowends = np.arange(e, self.fft_last_end + self.N_temp_hop - 1, -self.N_temp_hop)[::-1]
+    windowends = windowends[windowends - self.N_temp >= e - len(pcm)] #window must be within available data
+    if len(windowends) == 0:
+        return
+    self.fft_last_end = windowends[-1]
+    
+    pcmwindows = np.lib.stride_tricks.sliding_window_view(pcm, self.N_temp)[windowends - self.N_temp - e + len(pcm)]
+    fp = self.dofft(pcmwindows) #get peak frequency in temperature band via FFT
+    
+    ctime_fft = windowends/self.f_s #time at the end of each window
+    if self.status:
+        cdepth_fft = self.depthconvert(ctime_fft - self.tspinup) #getting depth corresponding to each time
+    else:
+        cdepth_fft = -999*np.ones(len(fp)) #leave depths as -999 until spinup time can be determined and used to process
         
-    return fp, Sp, Rp
+    ctemp_fft = self.calc_temp_from_freq(fp, cdepth_fft) #convert peak frequency in temperature band to corresponding temperature
+    
+    self.TEMP_FFT = np.append(self.TEMP_FFT, ctemp_fft)
+    self.DEPTH_FFT = np.append(self.DEPTH_FFT, cdepth_fft)
+    self.TIME_FFT = np.append(self.TIME_FFT, ctime_fft)
     
     
     
@@ -452,36 +494,87 @@ def second_subsample(self, pklp, envxcclp, fcclp, feflp, ftelp):
     
     
     
-def calc_current_datapoint(self, t1, t2):
+#start/end times of the fit segments for depth bins nff (array) - first fit is from depth_beg to depth_beg + depth_chunk, next is depth_step deeper
+def get_fit_windows(self, nff):
+    d1 = self.depth_beg + nff*self.depth_step #starting depth of each segment
+    t1 = self.timeconvert(d1) + self.tspinup #starting time for each segment
+    t2 = self.timeconvert(d1+self.depth_chunk) + self.tspinup #ending time for each segment
+    return t1, t2
+    
+    
+    
+#fit segments for all depth bins from nff0 onward that end before the last available (subsampled) data point
+def get_ready_fit_windows(self, nff0, tmax):
+    
+    #estimating the number of completed depth bins from the depth at tmax, then checking them
+    dmax = self.depthconvert(tmax - self.tspinup)
+    nmax = int(np.ceil((dmax - self.depth_beg - self.depth_chunk)/self.depth_step)) + 1
+    nff = np.arange(nff0, max(nmax, nff0) + 1)
+    t1, t2 = self.get_fit_windows(nff)
+    while t2[-1] <= tmax: #estimate fell short of the available data
+        nff = np.arange(nff0, nff[-1] + 11)
+        t1, t2 = self.get_fit_windows(nff)
+        
+    nready = np.argmax(t2 > tmax) #segments are processed in order, stopping at the first one that isn't complete
+    return t1[:nready], t2[:nready]
+    
+    
+    
+#pulls the subsampled data within each fit segment (t1 < tim < t2) into (# segments x max points per segment) arrays
+def get_fit_segments(self, t1, t2):
+    istart = np.searchsorted(self.tim, t1, side='right')
+    iend = np.searchsorted(self.tim, t2, side='left')
+    npts = np.max(iend - istart, initial=1)
+    inds = istart[:,np.newaxis] + np.arange(npts)
+    valid = inds < iend[:,np.newaxis] #False for padding at the end of shorter segments
+    inds = np.minimum(inds, len(self.tim)-1)
+    return istart, iend, inds, valid
+    
+    
+    
+#mean and standard deviation of the finite, valid values in each row
+def segment_stats(data, valid):
+    good = valid & np.isfinite(data)
+    n = np.sum(good, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = np.sum(np.where(good, data, 0), axis=1) / n
+        std = np.sqrt(np.sum(np.where(good, (data - avg[:,np.newaxis])**2, 0), axis=1) / n)
+    return avg, std
+    
+    
+    
+#calculates profile datapoints for a batch of fit segments (times t1 to t2) at once
+def calc_current_datapoints(self, t1, t2):
     
     # select data for fitting
-    current_inds = np.where((self.tim > t1) & (self.tim < t2))[0]
-    tss  = self.tim[current_inds]
-    ftss = self.fte[current_inds] #all temperature band peak frequencies in current range
-    fess = self.fef[current_inds] #all EF (current speed) band peak freqs in current range
-    fcss = self.fcc[current_inds] #all compass coil (direction/rotation) band peak freqs in current range
-    envxccss = self.envxcc[current_inds]
-    pkss     = self.pk[current_inds]
+    istart, iend, inds, valid = self.get_fit_segments(t1, t2)
+    tss  = self.tim[inds]
+    ftss = self.fte[inds] #all temperature band peak frequencies in current range
+    fess = self.fef[inds] #all EF (current speed) band peak freqs in current range
+    fcss = self.fcc[inds] #all compass coil (direction/rotation) band peak freqs in current range
+    envxccss = [self.envxcc[i1:i2] for (i1,i2) in zip(istart,iend)]
+    pkss     = [self.pk[i1:i2] for (i1,i2) in zip(istart,iend)]
     
-    tavg = np.round(np.nanmean(tss), 3)
-    # tbof = tss(end)
+    tavg = np.round(segment_stats(tss, valid)[0], 3)
     
     tchunk = t2 - t1
     nindep = np.round(tchunk * self.fzclp)
     
     # depth & fall rate, w
     timd = tavg - self.tspinup
-    depth =  np.round(dataconvert(timd,self.depth_poly), 1)
-    w     = - dataconvert(timd,[self.depth_poly[1],self.depth_poly[2]*2])
+    depth =  np.round(self.depthconvert(timd), 1)
+    w     = - self.fallrate(timd)
     
     # temperature frequency (mean)
-    ftbl = np.nanmean(ftss)
+    ftbl, _ = segment_stats(ftss, valid)
     
-    # frequency ftbl error for temperature
-    x = np.arange(0,len(ftss)) #1:length(ftss)
-    p = np.polyfit(x,ftss,deg=1) # linear fit
-    r = ftss - np.polyval(p,x)
-    ftbl_err = np.nanstd(r) / np.sqrt(nindep)
+    # frequency ftbl error for temperature- std of residuals from a linear fit vs. sample number
+    npts = np.sum(valid, axis=1)
+    x = np.where(valid, np.arange(inds.shape[1]) - (npts[:,np.newaxis]-1)/2, 0) #centered sample number
+    y = np.where(valid, ftss - ftbl[:,np.newaxis], 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.sum(x*y, axis=1) / np.sum(x**2, axis=1)
+        ftbl_err = np.sqrt(np.sum(np.where(valid, y - slope[:,np.newaxis]*x, 0)**2, axis=1) / npts) / np.sqrt(nindep)
     
     
     #temperature calculation
@@ -493,7 +586,7 @@ def calc_current_datapoint(self, t1, t2):
     
     
     #determining gain/phase info for current calculation
-    rotfavg, rotfrms, efbl, ccbl, fefr, fccr, vc0a, vc0p, ve0a, ve0p, gcca, gefa = self.calc_vel_components(fcss, fess, tss)
+    rotfavg, rotfrms, efbl, ccbl, fefr, fccr, vc0a, vc0p, ve0a, ve0p, gcca, gefa = self.calc_vel_components(fcss, fess, tss, valid)
         
     #calculate current U/V components, velocity error, coil area/error
     area, aerr, umag, vmag, verr = self.calc_currents(rotfavg, fccr, fefr, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep, w)
@@ -501,9 +594,66 @@ def calc_current_datapoint(self, t1, t2):
     
     return tavg, depth, temp, umag, vmag, area, rotfavg, rotfrms, ftbl, efbl, ccbl, fefr, fccr, terr, verr, aerr, w, envxccss, pkss, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep
         
-
-                
-                
+    
+    
+#calculates and appends profile points for all fit segments in t1/t2, returns calculated points and each segment's sigdata (columns after nff in the sigdata points table)
+def process_profile_points(self, t1, t2):
+    
+    #calculate profile information for all datapoints
+    tavg, depth, temp_zc, umag, vmag, area, rotfavg, rotfrms, ftbl, efbl, ccbl, fefr, fccr, terr, verr, aerr, w, envxccss, pkss, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep = self.calc_current_datapoints(t1, t2)
+    
+    utrue, vtrue = self.calculate_true_velocities(umag, vmag)
+    
+    #determining which temperature to use: zero crossing or FFT (depends on self.temp_mode and how they match)
+    if self.temp_mode == 2 and len(self.DEPTH_FFT) >= 2:
+        temp = np.round(np.interp(depth, self.DEPTH_FFT, self.TEMP_FFT), 2)
+    else:
+        temp = temp_zc
+        
+    #saving current profile points
+    self.PEAK = np.append(self.PEAK, [np.max(cpkss) for cpkss in pkss])
+    
+    self.TIME = np.append(self.TIME, tavg)
+    self.DEPTH = np.append(self.DEPTH, depth)
+    
+    self.FTBL = np.append(self.FTBL, ftbl)
+    self.TEMP = np.append(self.TEMP, temp)
+    self.TERR = np.append(self.TERR, terr)
+    
+    self.U_MAG = np.append(self.U_MAG, umag)
+    self.V_MAG = np.append(self.V_MAG, vmag)
+    self.U_TRUE = np.append(self.U_TRUE, utrue)
+    self.V_TRUE = np.append(self.V_TRUE, vtrue)
+    self.VERR = np.append(self.VERR, verr)
+    
+    self.ROTF = np.append(self.ROTF, rotfavg)
+    self.ROTFRMS = np.append(self.ROTFRMS, rotfrms)
+    self.AREA = np.append(self.AREA, area)
+    self.AERR = np.append(self.AERR, aerr)
+    
+    self.EFBL = np.append(self.EFBL, efbl)
+    self.CCBL = np.append(self.CCBL, ccbl)
+    self.FEFR = np.append(self.FEFR, fefr)
+    self.FCCR = np.append(self.FCCR, fccr)
+    self.W = np.append(self.W, w)
+    
+    self.ENVCC = np.append(self.ENVCC, [np.nanmean(cenvxccss) for cenvxccss in envxccss])
+    self.ENVCCRMS = np.append(self.ENVCCRMS, [np.nanstd(cenvxccss) for cenvxccss in envxccss])
+    
+    self.VC0A = np.append(self.VC0A, vc0a)
+    self.VC0P = np.append(self.VC0P, vc0p)
+    self.VE0A = np.append(self.VE0A, ve0a)
+    self.VE0P = np.append(self.VE0P, ve0p)
+    self.GCCA = np.append(self.GCCA, gcca)
+    self.GEFA = np.append(self.GEFA, gefa)
+    self.NINDEP = np.append(self.NINDEP, nindep)
+    
+    sigdata = (tavg, depth, temp_zc, umag, vmag, area, rotfavg, rotfrms, ftbl, efbl, ccbl, fefr, fccr, terr, verr, aerr, w, envxccss, pkss, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep) #columns for the sigdata points table
+    
+    return tavg, rotfavg, rotfrms, depth, temp, umag, vmag, utrue, vtrue, sigdata
+    
+    
+    
 #this function is called once per loop of the AXCP Processor and processes as much data as is available in the respective buffers 
 def iterate_AXCP_process(self, e): 
     
@@ -512,6 +662,7 @@ def iterate_AXCP_process(self, e):
     self.T = np.append(self.T, np.round(e/self.f_s,2)) #time at end of current PCM chunk
     self.PK = np.append(self.PK, np.max(np.abs(self.demod_buffer))) #peak audio value
     
+    self.stats.start("filters")
     xinlp, self.zxinlp = signal.sosfilt(self.sosxinlp, self.demod_buffer, zi=self.zxinlp) #lowpass filter input buffer
     
     #running first subsample, applying filters, pulling big three frequency band zerocrossing points
@@ -522,6 +673,7 @@ def iterate_AXCP_process(self, e):
     
     #running second subsample, pulling big three center frequencies for profile calculations
     pk_cur, envxcc_cur, fcc_cur, fef_cur, fte_cur, tim_cur, envfcclp, frotlp, envfrotlp = self.second_subsample(pklp, envxcclp, fcclp, feflp, ftelp)
+    self.stats.stop("filters")
     
     #saving rotation frequency info
     self.FCCDEV = np.append(self.FCCDEV, envfcclp[-1]*np.sqrt(2) )
@@ -550,7 +702,7 @@ def iterate_AXCP_process(self, e):
     if self.spindown_detect_rt and self.status and np.max(self.FROTLP[-10:]) >= 18 and np.min(self.FROTLP[-10:]) <= 12 and np.min(self.FROTDEV[-10:]) > 1:
         self.status = 0 #spun down
         self.keepgoing = False #stop processing new data, run spindown checks
-        self.txtfile.write(f"[+] Spindown (realtime) detected: {self.T[-1]:7.2f} seconds, cleaning up!\n")
+        self.sigdata.write(f"[+] Spindown (realtime) detected: {self.T[-1]:7.2f} seconds, cleaning up!\n")
     
         
     #checking to see if probe has spunup (update status to 1 if so)
@@ -594,134 +746,61 @@ def iterate_AXCP_process(self, e):
         else:
             self.tspinup = tspinup_rot
         
-        self.txtfile.write(f"[+] Spinup detected: {self.tspinup:7.2f} seconds\n")
+        self.sigdata.write(f"[+] Spinup detected: {self.tspinup:7.2f} seconds\n")
         
         
     
     #handle updated temperature FFT calculation outside of self.status - grab most recent data    
     if self.temp_mode > 1:
-        cpcm = self.demod_buffer[-self.N_temp:] #pull proper window length of most recent pcm data
-        fp,_,_ = self.dofft(cpcm) #get peak frequency in temperature band via FFT
-        
-        if self.status:
-            cdepth_fft = dataconvert(self.T[-1]-self.tspinup, self.depth_poly) #getting depth corresponding to most recent time
-        else:
-            cdepth_fft = -999 #leave depths as -999 until spinup time can be determined and used to process
-            
-        ctemp_fft = self.calc_temp_from_freq(fp,cdepth_fft) #convert peak frequency in temperature band to corresponding temperature
-        
-        self.TEMP_FFT = np.append(self.TEMP_FFT, ctemp_fft)
-        self.DEPTH_FFT = np.append(self.DEPTH_FFT, cdepth_fft)    
+        self.stats.start("fft_temps")
+        self.calc_fft_temps(e) #overlapping FFTs across the most recent pcm data
+        self.stats.stop("fft_temps")
         
-        fft_str = f"{self.DEPTH_FFT[-1]:6.1f},{self.TEMP_FFT[-1]:6.2f}"
+        depth_fft, temp_fft = self.DEPTH_FFT[-1], self.TEMP_FFT[-1]
         
     else:
-        fft_str = 'No_FFT_temps'
+        depth_fft, temp_fft = np.NaN, np.NaN #no FFT temperatures
     
     
-    self.txtfile.write(f"npp={self.npp},{self.T[-1]:9.3f},{self.PK[-1]},{self.CCENV[-1]},{self.FCCDEV[-1]},{self.FROTLP[-1]:6.2f},{self.FROTDEV[-1]:6.3f},{fft_str}\n")
+    self.stats.start("sigdata")
+    self.sigdata.append("iterations", self.npp, self.T[-1], self.PK[-1], self.CCENV[-1], self.FCCDEV[-1], self.FROTLP[-1], self.FROTDEV[-1], depth_fft, temp_fft)
+    self.stats.stop("sigdata")
     
     #if spinup has been detected but depths haven't been filled in, do that
     if self.status and self.temp_mode > 1 and -999 in self.DEPTH_FFT:
-        self.txtfile.write("Updating DEPTH_FFT pre spinup detect:\n")
-        for i,d in enumerate(self.DEPTH_FFT):
-            if d == -999:
-                cz = dataconvert(self.T[i]-self.tspinup, self.depth_poly)
-                self.DEPTH_FFT[i] = cz
-                self.txtfile.write(f" {i} = {cz:6.1f},")
-        self.txtfile.write("\n")
+        self.sigdata.write("Updating DEPTH_FFT pre spinup detect:\n")
+        missing = np.where(self.DEPTH_FFT == -999)[0]
+        self.DEPTH_FFT[missing] = self.depthconvert(self.TIME_FFT[missing] - self.tspinup)
+        self.sigdata.write("".join([f" {i} = {cz:6.1f}," for (i,cz) in zip(missing, self.DEPTH_FFT[missing])]) + "\n")
         
     
     #if the profile is spun up- iterate through all times available to process profile datapoints
     if self.status: 
         
-        #initializing arrays to be passed with iterated signal to GUI
-        cur_time = []
-        cur_rotf = []
-        cur_rotfrms = []
-        cur_depth = []
-        cur_temp = []
-        cur_Umag = []
-        cur_Vmag = []
-        cur_Utrue = []
-        cur_Vtrue = []
-        
-        process_new_depth = True
-        while process_new_depth:
+        #calculate profile information for all depth bins with complete data at once
+        t1, t2 = self.get_ready_fit_windows(self.nff, self.tim[-1])
+        
+        self.stats.start("profile")
+        cur_time, cur_rotf, cur_rotfrms, cur_depth, cur_temp, cur_Umag, cur_Vmag, cur_Utrue, cur_Vtrue, sigdata = self.process_profile_points(t1, t2)
+        self.stats.stop("profile")
+        self.stats.count("points", len(cur_time))
+        
+        self.stats.start("sigdata")
+        nff = np.arange(self.nff+1, self.nff+len(cur_time)+1) #profile datapoint counter for each point
+        self.nff += len(cur_time)
+        self.sigdata.append_rows("points", nff, *sigdata)
+        self.stats.stop("sigdata")
             
-            d1 = self.depth_beg + self.nff*self.depth_step #starting depth of current segment
-            t1 = dataconvert(d1, self.inv_depth_poly) + self.tspinup #starting time for current segment
-            t2 = dataconvert(d1+self.depth_chunk, self.inv_depth_poly) + self.tspinup #ending time for current segment
-                        
-            if t2 > self.tim[-1]:
-                process_new_depth = False #out of new data, wait to grab more AXCP data
-            else:
-                self.nff += 1 #iterate profile datapoint counter
-                
-                #calculate profile information for current datapoint
-                tavg, depth, temp_zc, umag, vmag, area, rotfavg, rotfrms, ftbl, efbl, ccbl, fefr, fccr, terr, verr, aerr, w, envxccss, pkss, vc0a, vc0p, ve0a, ve0p, gcca, gefa, nindep = self.calc_current_datapoint(t1, t2)
-                
-                utrue, vtrue = self.calculate_true_velocities(umag, vmag)
-                
-                
-                #determining which temperature to use: zero crossing or FFT (depends on self.temp_mode and how they match)
-                if self.temp_mode == 2 and len(self.DEPTH_FFT) >= 2:
-                    temp = np.round(np.interp(depth, self.DEPTH_FFT, self.TEMP_FFT), 2)
-                else:
-                    temp = temp_zc
-                    
-                #updating arrays with data to be passed with iterated signal to GUI
-                cur_time.append(tavg)
-                cur_rotf.append(rotfavg)
-                cur_rotfrms.append(rotfrms)
-                cur_depth.append(depth)
-                cur_temp.append(temp)
-                cur_Umag.append(umag)
-                cur_Vmag.append(vmag)
-                cur_Utrue.append(utrue)
-                cur_Vtrue.append(vtrue)
-                
-                
-                #saving current profile point
-                self.PEAK = np.append(self.PEAK, np.max(pkss))
-                
-                self.TIME = np.append(self.TIME, tavg)
-                self.DEPTH = np.append(self.DEPTH, depth)
-                
-                self.FTBL = np.append(self.FTBL, np.max(ftbl))
-                self.TEMP = np.append(self.TEMP, temp)
-                self.TERR = np.append(self.TERR, terr)
-                
-                self.U_MAG = np.append(self.U_MAG, umag)
-                self.V_MAG = np.append(self.V_MAG, vmag)
-                self.U_TRUE = np.append(self.U_TRUE, utrue)
-                self.V_TRUE = np.append(self.V_TRUE, vtrue)
-                self.VERR = np.append(self.VERR, verr)
-                
-                self.ROTF = np.append(self.ROTF, rotfavg)
-                self.ROTFRMS = np.append(self.ROTFRMS, rotfrms)
-                self.AREA = np.append(self.AREA, area)
-                self.AERR = np.append(self.AERR, aerr)
-                
-                self.EFBL = np.append(self.EFBL, efbl)
-                self.CCBL = np.append(self.CCBL, ccbl)
-                self.FEFR = np.append(self.FEFR, fefr)
-                self.FCCR = np.append(self.FCCR, fccr)
-                self.W = np.append(self.W, w)
-                
-                self.ENVCC = np.append(self.ENVCC, np.nanmean(envxccss))
-                self.ENVCCRMS = np.append(self.ENVCCRMS, np.nanstd(envxccss))
-                
-                self.VC0A = np.append(self.VC0A, np.max(vc0a))
-                self.VC0P = np.append(self.VC0P, np.max(vc0p))
-                self.VE0A = np.append(self.VE0A, np.max(ve0a))
-                self.VE0P = np.append(self.VE0P, np.max(ve0p))
-                self.GCCA = np.append(self.GCCA, np.max(gcca))
-                self.GEFA = np.append(self.GEFA, np.max(gefa))
-                self.NINDEP = np.append(self.GEFA, np.max(nindep))
-                
-                
-                self.txtfile.write(f"nff={self.nff},{tavg},{depth},{temp_zc},{umag},{vmag},{area},{rotfavg},{rotfrms},{ftbl},{efbl},{ccbl},{fefr},{fccr},{terr},{verr},{aerr},{w},{envxccss},{pkss},{vc0a},{vc0p},{ve0a},{ve0p},{gcca},{gefa},{nindep}\n")
+        #converting to lists to be passed with iterated signal to GUI
+        cur_time = cur_time.tolist()
+        cur_rotf = cur_rotf.tolist()
+        cur_rotfrms = cur_rotfrms.tolist()
+        cur_depth = cur_depth.tolist()
+        cur_temp = cur_temp.tolist()
+        cur_Umag = cur_Umag.tolist()
+        cur_Vmag = cur_Vmag.tolist()
+        cur_Utrue = cur_Utrue.tolist()
+        cur_Vtrue = cur_Vtrue.tolist()
                 
     else: #not triggered
         cur_time = [self.T[-1]]
@@ -790,7 +869,7 @@ def refine_spindown_prof(self):
         self.tspindown = tspindown_all
         
     
-    self.txtfile.write(f"Spindown refined: {self.tspindown}\n")
+    self.sigdata.write(f"Spindown refined: {self.tspindown}\n")
                 
     #truncating all profiles, converting to numpy arrays (already should be but just to be sure)
     self.TIME = np.asarray(self.TIME[:nffspindown])
@@ -829,7 +908,7 @@ def refine_spindown_prof(self):
         inset = int(np.ceil(0.1 * len(good_areas))) #ignore outer +/- 10% of areas in distribution
         self.amean_calc = np.nanmean(good_areas[inset:-inset])
         
-        self.txtfile.write(f"Area refined: {self.amean_calc}\n")
+        self.sigdata.write(f"Area refined: {self.amean_calc}\n")
         
         #updating profile meridional current velocities
         self.V_MAG = np.round(self.V_MAG - self.sfw * self.W * self.AREA * (1/self.amean_rough - 1/self.amean_calc), 3)
@@ -24,7 +24,11 @@
 
 
 import wave #WAV file writing
-import pyaudio
+import numpy as np
+try:
+    import pyaudio
+except ImportError: #headless installs (e.g. batch processing from audio files) don't need audio devices
+    pyaudio = None
 from traceback import print_exc as trace_error
 
 from ctypes import (Structure, pointer, c_int, c_ulong, c_char, c_uint32,
@@ -60,6 +64,7 @@ def define_callbacks(self, probetype, sourcetype):
                     self.nframes += bufferlength
                     self.audiostream.extend(bufferdata[:]) #append data to end
                     del self.audiostream[:bufferlength] #remove data from start
+                    self.notify_audio() #wakes the processor loop if it is waiting for this audio
                     
                     #recording to wav file: this terminates if the file exceeds a certain length
                     if self.isrecordingaudio and self.nframes > self.maxsavedframes:
@@ -89,6 +94,7 @@ def define_callbacks(self, probetype, sourcetype):
                     self.nframes += bufferlength
                     self.audiostream.extend(bufferdata[:]) #append data to end
                     #dont delete data from start, the AXCTD Processor thread will handle this as it is processed
+                    self.notify_audio() #wakes the processor loop if it is waiting for this audio
                     
                     #recording to wav file: this terminates if the file exceeds a certain length
                     if self.isrecordingaudio and self.nframes > self.maxsavedframes:
@@ -115,8 +121,11 @@ def define_callbacks(self, probetype, sourcetype):
                     #bytearray to signed int16 buffer
                     bufferdata = [int.from_bytes(bufferdata_bytes[i:i+2],"little")-32767 for i in range(0,len(bufferdata_bytes),2)]
                     
+                    self.numcontacts += 1 #note that the buffer has been pulled again
+                    self.nframes += nframes
                     self.audiostream.extend(bufferdata[:]) #append data to end
                     del self.audiostream[:nframes] #remove data from start
+                    self.notify_audio() #wakes the processor loop if it is waiting for this audio
                     returntype = pyaudio.paContinue
                     
                     #recording to wav file: this terminates if the file exceeds a certain length
@@ -142,7 +151,10 @@ def define_callbacks(self, probetype, sourcetype):
                     #bytearray to signed int16 buffer
                     bufferdata = [int.from_bytes(bufferdata_bytes[i:i+2],"little")-32767 for i in range(0,len(bufferdata_bytes),2)]
                     
+                    self.numcontacts += 1 #note that the buffer has been pulled again
+                    self.nframes += nframes
                     self.audiostream.extend(bufferdata[:]) #append data to end
+                    self.notify_audio() #wakes the processor loop if it is waiting for this audio
                     returntype = pyaudio.paContinue
                                             
                     #recording to wav file: this terminates if the file exceeds a certain length
@@ -165,10 +177,86 @@ def define_callbacks(self, probetype, sourcetype):
             receiver_callback = None
         
             
+    elif sourcetype == 'SM': #shared memory- audio received by another process (see sharedmemory_functions.py)
+        
+        if probetype in ["AXBT", "AXCTD", "AXCP"]:
+        
+            def receiver_callback(bufferdata):
+                try:
+                    #PCM data is stored as it was received, so PyAudio data is converted as in the PyAudio callbacks
+                    if self.hradio.origin == 'PA':
+                        bufferlist = (bufferdata.view('<u2').astype(int) - 32767).tolist()
+                    else:
+                        bufferlist = bufferdata.tolist()
+                    
+                    self.numcontacts += 1 #note that the buffer has been pulled again
+                    self.nframes += len(bufferlist)
+                    self.audiostream.extend(bufferlist) #append data to end
+                    if probetype == "AXBT": #AXCTD/AXCP Processor threads remove data from the start as it is processed
+                        del self.audiostream[:len(bufferlist)] #remove data from start
+                    self.notify_audio() #wakes the processor loop if it is waiting for this audio
+                    
+                    #recording to wav file: this terminates if the file exceeds a certain length
+                    if self.isrecordingaudio and self.nframes > self.maxsavedframes:
+                        self.isrecordingaudio = False
+                        self.killaudiorecording()
+                    elif self.isrecordingaudio:
+                        wave.Wave_write.writeframes(self.wavfile,bufferdata.tobytes())
+                        
+                except Exception: #error handling for callback
+                    trace_error()  
+                    self.kill(10)
+                    
+        else: #probe type not recognized
+            receiver_callback = None
+        
+            
     else: #not a recognized receiver (test, audio, or error)
         receiver_callback = None
         
     return receiver_callback
+    
+    
+    
+    
+    
+# =============================================================================
+#                 SHARED MEMORY (PROCESS BACKEND) CALLBACK FUNCTIONS
+# =============================================================================
+
+#callbacks for the GUI process side of a processor running in its own process (DAS_multiprocess.ProcessorHost):
+#writes audio from the receiver to the shared memory ring buffer (self.ring) read by the processor process
+def define_ring_callback(self, sourcetype):
+    
+    if sourcetype == 'WR':
+        
+        @CFUNCTYPE(None, c_void_p, c_void_p, c_ulong, c_ulong)
+        def receiver_callback(streampointer_int, bufferpointer_int, size, samplerate):
+            try:
+                bufferlength = int(size / 2)
+                bufferpointer = cast(bufferpointer_int, POINTER(c_int16 * bufferlength))
+                self.ring.write(np.ctypeslib.as_array(bufferpointer.contents))
+            except Exception:
+                trace_error()
+                
+                
+    elif sourcetype == 'PA':
+        
+        def receiver_callback(bufferdata_bytes, nframes, time_info, status):
+            try:
+                self.ring.write(np.frombuffer(bufferdata_bytes, dtype=np.int16))
+                returntype = pyaudio.paContinue
+            except Exception:
+                trace_error()
+                returntype = pyaudio.paAbort
+            finally:
+                return (None, returntype)
+                
+                
+    else: #not a recognized receiver
+        receiver_callback = None
+        
+    return receiver_callback
         
     
     
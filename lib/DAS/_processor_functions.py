@@ -22,7 +22,7 @@
 # radio receivers, opening audio files, initializing common variables and stopping
 # the processing thread.
 #
-# The functions in this file are all methods of AXBTProcessor/AXCTDProcessor/etc. thread
+# The functions in this file are all methods of AXBTEngine/AXCTDEngine/etc. processor
 # classes, any functions that are not methods in those classes go in common_DAS_functions.py
 # instead, except for radio receiver-specific functions which go in either DAS_callback.py 
 # (if it is a callback function to update the audio PCM data buffer for the thread) or 
@@ -33,15 +33,16 @@
 import numpy as np
 import wave #WAV file writing
 
-from PyQt5.QtCore import pyqtSlot
-
 import time as timemodule
+import threading
 
 from traceback import print_exc as trace_error
 
 from shutil import copy as shcopy
 
 import lib.DAS.common_DAS_functions as cdf
+from lib.DAS.DAS_stats import ProcessorStats
+from lib.DAS.DAS_sigdata import SigdataLog
 
 import os
 
@@ -56,25 +57,14 @@ import os
 #initialize variables common to all DAS tabs (AXCTD,AXBT,etc)
 def initialize_common_vars(self,tempdir,tabID,dll,settings,datasource,vhffreq,probetype):
     
-    self.common_vars_init = False #prevents AXCTD settings update function from running until necessary variables are initialized
-    self.probetype = probetype
-    
     self.dll = dll # saves DLL/API library
-    self.tabID = tabID #keeps track of which tab in GUI this thread corresponds to
-    
-    self.keepgoing = True  # signal connections
-    self.waittoterminate = False #whether to pause on termination of run loop for kill process to complete
-    
-    self.stream = None #stores stream object for PyAudio instances only
     
-    #settings
-    self.settings = {}
-    self.update_settings(settings)
-
     #output file names
-    self.txtfilename = os.path.join(tempdir, "sigdata_" + str(self.tabID) + '.txt')
-    self.txtfile = open(self.txtfilename, 'w')
-    self.wavfilename = os.path.join(tempdir, "tempwav_" + str(self.tabID) + '.WAV')
+    self.sigdatafilename = os.path.join(tempdir, "sigdata_" + str(tabID) + '.bin') #binary signal data log (see DAS_sigdata.py)
+    self.wavfilename = os.path.join(tempdir, "tempwav_" + str(tabID) + '.WAV')
+    statsfilename = os.path.join(tempdir, "stats_" + str(tabID) + '.txt') if settings.get("statslog", False) else None
+    
+    self.initialize_processor_state(tabID, settings, probetype, self.sigdatafilename, statsfilename)
     
     #to prevent ARES from consuming all computer's resources- this limits the size of WAV files used by the signal processor to a number of PCM datapoints corresponding to 1 hour of audio @ fs=64 kHz, that would produce a wav file of ~0.5 GB for 16-bit PCM data
     self.maxsavedframes = 2.5E8
@@ -88,9 +78,9 @@ def initialize_common_vars(self,tempdir,tabID,dll,settings,datasource,vhffreq,pr
     self.serial = 'none' #replaced with radio receiver identifier if used
     
     #initializing variables to check if receiver remains connected (unused for audio/test threads)
-    self.disconnectcount = 0
     self.numcontacts = 0
     self.lastcontacts = 0
+    self.lastcontacttime = timemodule.monotonic()
     self.nframes = 0
     
     self.sourcetype = datasource[:2] #AA for audio, TT for test, other two characters for receiver types
@@ -103,17 +93,18 @@ def initialize_common_vars(self,tempdir,tabID,dll,settings,datasource,vhffreq,pr
     elif self.sourcetype == 'TT': #test run- use included audio file
         self.chselect = 0 #sum over multiple channels
         if probetype == 'AXBT':
-            self.audiofile = 'data/testdata/AXBT_sample.WAV'
+            self.audiofile = cdf.resource_path('data','testdata','AXBT_sample.WAV')
         elif probetype == 'AXCTD':
-            self.audiofile = 'data/testdata/AXCTD_sample.WAV'
+            self.audiofile = cdf.resource_path('data','testdata','AXCTD_sample.WAV')
         elif probetype == 'AXCP':
-            self.audiofile = 'data/testdata/AXCP_sample.WAV'
+            self.audiofile = cdf.resource_path('data','testdata','AXCP_sample.WAV')
         self.isfromtest = True
     
     
     if self.isfromtest or self.isfromaudio: #either way, data comes from test file
         self.audiostream, self.f_s, self.threadstatus = cdf.read_audio_file(self.audiofile, self.chselect, self.maxsavedframes)
-        shcopy(self.audiofile, self.wavfilename) #copying audio file if datasource = Test or Audio
+        if not self.threadstatus: #audio file can't be copied if it couldn't be read
+            shcopy(self.audiofile, self.wavfilename) #copying audio file if datasource = Test or Audio
         
     else: #thread is to be connected to a radio receiver
     
@@ -135,21 +126,115 @@ def initialize_common_vars(self,tempdir,tabID,dll,settings,datasource,vhffreq,pr
         
     self.common_vars_init = True
     
-        
+    
+    
+#initialize the processor state that doesn't depend on the data source (loop control, settings, sigdata/stats logs)
+#called by initialize_common_vars, and directly by offline processors that are handed their audio (e.g. AXCP_sweep.py)
+def initialize_processor_state(self, tabID, settings, probetype, sigdatafilename, statsfilename=None):
+    
+    self.common_vars_init = False #prevents AXCTD settings update function from running until necessary variables are initialized
+    self.probetype = probetype
+    self.tabID = tabID #keeps track of which tab in GUI this thread corresponds to
+    
+    self.keepgoing = True  # signal connections
+    self.waittoterminate = False #whether to pause on termination of run loop for kill process to complete
+    
+    #wakes the processor loop when audio arrives, initialization finishes, or the processor is stopped (see wait_for_audio)
+    self.audiocondition = threading.Condition()
+    self.audiotarget = 0 #number of received audio points (self.nframes) the processor loop is waiting for
+    self.iterating = False #whether the processor loop is partway through an iteration
+    self.loopthread = None #thread running the processor loop
+    
+    self.stream = None #stores stream object for PyAudio instances only
+    
+    #settings
+    self.settings = {}
+    self.update_settings(settings)
+    
+    #binary signal data log (see DAS_sigdata.py)
+    self.sigdata = SigdataLog(sigdatafilename, probetype)
+    
+    #stage timing/processing lag statistics, written to statsfilename (the stats log) if it is specified
+    self.stats = ProcessorStats(self.tabID, probetype, logfile=statsfilename)
+    
+    #realtime backpressure (AXCTD/AXCP): 0=normal processing, 1-2=cheaper processing (see check_backpressure)
+    self.processinglevel = 0
+    
+    
         
 def wait_to_run(self):
-    #barrier to prevent signal processor loop from starting before __init__ finishes
-    counts = 0
-    while self.threadstatus != 100:
-        counts += 1
-        if counts > 100 or not self.keepgoing: #give up and terminate after 10 seconds waiting for __init__
-            self.kill(12)
-            return
-        elif self.threadstatus != 0 and self.threadstatus != 100: #if the audio file couldn't be read in properly
-            self.kill(self.threadstatus) #waits to run kill commands due to errors raised in __init__ until run() since slots+signals may not be connected to parent thread during init
-            return
-        timemodule.sleep(0.1)
-        #if the Run() method gets this far, __init__ has completed successfully (and set self.threadstatus = 100)
+    #barrier to prevent signal processor loop from starting before __init__ finishes (__init__ calls wake() after setting self.threadstatus)
+    self.loopthread = threading.get_ident()
+    with self.audiocondition:
+        self.audiocondition.wait_for(lambda: self.threadstatus != 0 or not self.keepgoing, 10)
+        
+    if self.threadstatus != 0 and self.threadstatus != 100: #if the audio file couldn't be read in properly
+        self.kill(self.threadstatus) #waits to run kill commands due to errors raised in __init__ until run() since slots+signals may not be connected to parent thread during init
+    elif self.threadstatus != 100: #give up and terminate after 10 seconds waiting for __init__
+        self.kill(12)
+    #if the Run() method gets this far, __init__ has completed successfully (and set self.threadstatus = 100)
+    
+    
+    
+# =============================================================================
+#         PROCESSOR LOOP WAITS/WAKEUPS
+# =============================================================================
+
+#wakes the processor loop if it is waiting (wait_to_run, wait_for_audio, pause, or for kill() to finish)
+def wake(self):
+    with self.audiocondition:
+        self.audiocondition.notify_all()
+        
+        
+#called by the receiver callbacks after each block of audio- wakes the processor loop once the audio it is waiting for has arrived
+def notify_audio(self):
+    if self.nframes >= self.audiotarget:
+        self.wake()
+        
+        
+#blocks the processor loop until the receiver callbacks have received target audio points (self.nframes), 
+#the processor is stopped, or timeout seconds elapse
+def wait_for_audio(self, target, timeout):
+    with self.audiocondition:
+        self.audiotarget = target
+        self.audiocondition.wait_for(lambda: self.nframes >= self.audiotarget or not self.keepgoing, timeout)
+        
+        
+#waits timeout seconds (e.g. pacing test runs to realtime), returning early if the processor is stopped
+def pause(self, timeout):
+    with self.audiocondition:
+        self.audiocondition.wait_for(lambda: not self.keepgoing, timeout)
+        
+        
+#called by the processor loop before/after each iteration: kill() waits for the current iteration to finish,
+#and iteration times/counts are recorded with the processor statistics. end_iteration returns the iteration duration
+def start_iteration(self):
+    self.iterating = True
+    self.stats.start("iteration")
+    
+    
+def end_iteration(self):
+    duration = self.stats.stop("iteration")
+    self.stats.count("iterations")
+    self.iterating = False
+    self.wake()
+    self.report_stats()
+    return duration
+    
+    
+#kills the processor (error 8) if the receiver hasn't sent any audio for 3 seconds and can't be contacted
+def check_receiver_contact(self):
+    if self.numcontacts != self.lastcontacts: #the audio stream is receiving new data
+        self.lastcontacts = self.numcontacts
+        self.lastcontacttime = timemodule.monotonic()
+    elif timemodule.monotonic() - self.lastcontacttime >= 3 and not cdf.check_connected(self.dll, self.sourcetype, self.hradio):
+        self.kill(8)
+        
+        
+#waits for a kill() call from another thread to finish before the processor loop exits, to avoid race conditions with the audio buffer callback
+def wait_for_termination(self):
+    with self.audiocondition:
+        self.audiocondition.wait_for(lambda: not self.waittoterminate)
 
 
 # =============================================================================
@@ -158,13 +243,17 @@ def wait_to_run(self):
 
 
 def kill(self,reason): #stop current thread
-    #NOTE: function contains 0.3 seconds of sleep to prevent race conditions between the processor loop, callback function and main GUI event loop
+    #NOTE: if called from another thread (e.g. the GUI), waits up to 0.3 seconds for the processor loop to finish its current
+    #iteration to prevent race conditions between the processor loop, callback function and main GUI event loop
     try:
         self.waittoterminate = True #keeps run method from terminating until kill process completes
         self.keepgoing = False  # kills while loop
         tabID = self.tabID
         
-        timemodule.sleep(0.3) #gives thread 0.1 seconds to finish current segment
+        with self.audiocondition:
+            self.audiocondition.notify_all() #wakes the processor loop if it is waiting for audio
+            if threading.get_ident() != self.loopthread:
+                self.audiocondition.wait_for(lambda: not self.iterating, 0.3)
         
         if reason != 0: #notify event loop that processor failed if non-zero exit code provided
             self.signals.failed.emit(self.tabID, reason)
@@ -176,16 +265,20 @@ def kill(self,reason): #stop current thread
             
         if self.probetype == "AXCP":
             self.on_axcp_terminate() #AXCP specific- refine spindown point/recalc area, calculate U/V in deg True
-            timemodule.sleep(0.1)
+        elif self.probetype == "AXCTD":
+            self.save_bitstream() #AXCTD specific- saves the demodulated bitstream for reparsing
             
+        self.report_stats(force=True) #final processor statistics
+        self.sigdata.close() #writes buffered signal data before the GUI can save the file
         self.signals.terminated.emit(tabID)  # emits signal that processor has been terminated
-        self.txtfile.close()
+        self.stats.close()
         
     except Exception:
         trace_error()
         self.signals.failed.emit(self.tabID, 10)
         
     self.waittoterminate = False #allow run method to terminate
+    self.wake()
     
     
 #terminate the audio file recording (for WINRADIO processor tabs) if it exceeds a certain length set by maxframenum
@@ -199,12 +292,73 @@ def killaudiorecording(self):
         self.kill(10)
     
     
-@pyqtSlot()
-def abort(self): #executed when user selects "Stop" button (passed via pyqtSlot)
+# =============================================================================
+#         BACKPRESSURE FOR REALTIME AXCTD/AXCP PROCESSING
+# =============================================================================
+
+#processing lags (seconds of received but unprocessed audio) at which realtime processing switches to
+#level 1 (cheaper processing), level 2 (cheapest processing), and starts dropping the oldest audio
+backpressure_lags = [5, 15, 30]
+
+
+#called each realtime loop after audio is pulled from the receiver buffer: adjusts the processing level
+#(probe-specific set_processing_level) for the current lag and returns the number of PCM points to drop
+#from the head of the demodulation buffer (nonzero once the lag exceeds backpressure_lags[2])
+def check_backpressure(self, lag):
+    
+    curlevel = self.processinglevel
+    newlevel = sum([lag >= clag for clag in backpressure_lags[:2]])
+    if newlevel < curlevel: #only step back down once the lag is well below the current level's threshold
+        newlevel = curlevel - 1 if lag < backpressure_lags[curlevel-1]/2 else curlevel
+        
+    if newlevel != curlevel:
+        self.processinglevel = newlevel
+        self.set_processing_level(newlevel)
+        self.stats.level = newlevel
+        self.sigdata.write(f"[!] Processing lag {lag:.1f} sec: changed processing level from {curlevel} to {newlevel}\n")
+        
+    #drop enough audio to get back to the level 1 lag
+    if lag >= backpressure_lags[2]:
+        return int((lag - backpressure_lags[0])*self.f_s)
+    return 0
+    
+    
+#drops the oldest ndrop points from the demodulation buffer, recording a gap (the audio is still written to the WAV file)
+#PCM indices (and therefore profile times/depths) skip over the dropped audio
+def drop_audio(self, ndrop):
+    
+    ndrop = min(ndrop, len(self.demod_buffer))
+    gapstart = self.demodbufferstartind/self.f_s
+    gaplength = ndrop/self.f_s
+    
+    self.demod_buffer = self.demod_buffer[ndrop:]
+    self.demodbufferstartind += ndrop
+    
+    if self.probetype == "AXCP": #temperature FFT windows can't span the gap
+        self.fft_tail = np.array([])
+        self.fft_last_end = self.demodbufferstartind
+    
+    self.stats.add_gap(gapstart, gaplength)
+    self.sigdata.write(f"[!] GAP: dropped {gaplength:.2f} sec of audio starting at {gapstart:.2f} sec (processing fell behind realtime)\n")
+    if len(self.stats.gaps) == 1: #warn once per processor
+        self.signals.failed.emit(self.tabID, 14)
+    
+    
+    
+#sends the processor stage timing/lag statistics to the GUI (and stats log, if enabled) if the report interval has elapsed or force=True
+def report_stats(self, force=False):
+    try:
+        if force or self.stats.report_due():
+            self.signals.updatestats.emit(self.tabID, self.stats.report())
+    except Exception:
+        trace_error()
+    
+    
+def abort(self): #executed when user selects "Stop" button
     self.kill(0) #tell processor to terminate with 0 (success) exit code
     
     
-@pyqtSlot(float) #called from the DAS GUI via a pyqtSlot
+#called from the DAS GUI
 def changecurrentfrequency(self, newfreq): #update VHF frequency for radio receiver
     # change frequency- kill if failed
     try:
@@ -217,7 +371,6 @@ def changecurrentfrequency(self, newfreq): #update VHF frequency for radio recei
         self.kill(4)
         
 
-@pyqtSlot(dict)
 def changethresholds(self, settings): #update data thresholds for FFT
     self.update_settings(settings)  
     
@@ -28,16 +28,23 @@
 # methods in common_DAS_functions.py
 
 import numpy as np
-from scipy.io import wavfile #for wav file reading
 import wave #WAV file writing
-import numpy as np
+import os
 
 import lib.DAS.winradio_functions as wr
 import lib.DAS.pyaudio_functions as pa
+import lib.DAS.sharedmemory_functions as sm
+from lib.DAS.DAS_conversions import get_polynomial
 
 from traceback import print_exc as trace_error
 
-from PyQt5.QtCore import QObject, pyqtSignal
+
+#AXBPS root directory, so resource files are found regardless of the working directory
+AXBPS_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#absolute path to a file distributed with AXBPS, e.g. resource_path('lib','DAS','WMM.COF')
+def resource_path(*parts):
+    return os.path.join(AXBPS_dir, *parts)
 
         
 # =============================================================================
@@ -86,7 +93,8 @@ def channelandfrequencylookup(value,direction):
         
         
         
-def read_audio_file(audiofile, chselect, maxsavedframes):
+#mmap=True memory maps the file instead of reading it (for sharing one copy of the audio across processes)
+def read_audio_file(audiofile, chselect, maxsavedframes, mmap=False):
     
     #initializing values to return
     audiostream = [0]*10000
@@ -104,7 +112,8 @@ def read_audio_file(audiofile, chselect, maxsavedframes):
             startthread = 9
     
     if not startthread:
-        f_s, snd = wavfile.read(audiofile) #reading file
+        from scipy.io import wavfile #imported here since scipy.io is slow to import and only needed for audio files
+        f_s, snd = wavfile.read(audiofile, mmap=mmap) #reading file
     
     #if multiple channels, sum them together
     if not startthread:
@@ -129,46 +138,52 @@ def read_audio_file(audiofile, chselect, maxsavedframes):
     
     
 #conversion: coefficients=C,  D_out = C[0] + C[1]*D_in + C[2]*D_in^2 + C[3]*D_in^3 + ...
+#data_in may be an int/float, list, or numpy array (output is the same type, see DAS_conversions.py)
 def dataconvert(data_in,coefficients):
-    
-    datatype = 1 #integer or float
-    if type(data_in) == list:
-        datatype = 2
-    elif type(data_in) == np.ndarray: #numpy array
-        dataype = 3
-        
-    if datatype == 1:
-        data_in = [data_in]
-        
-    output = []
-    for cur_data_in in data_in:
-        cur_output = 0
-        for (i,c) in enumerate(coefficients):
-            cur_output += c*cur_data_in**i
-        output.append(cur_output)
-        
-    if datatype == 1: #convert back from list to int/float
-        output = output[0]
-    elif datatype == 3: #convert to np array
-        output = np.asarray(output)
-            
-    return output
+    return get_polynomial(coefficients)(data_in)
         
     
     
 # =============================================================================
-# PyQt Signals for processor threads
+# Callback signals for processor engines (no Qt required)
 # =============================================================================
-class ProcessorSignals(QObject): 
-    iterated = pyqtSignal(int,list) #signal to add another entry to raw data arrays
-    triggered = pyqtSignal(int,int,float) #signal that the first tone has been detected
-    terminated = pyqtSignal(int) #signal that the loop has been terminated (by user input or program error)
-    failed = pyqtSignal(int,int)
-    updateprogress = pyqtSignal(int,int) #signal to update audio file progress bar
-    
-    #following signals used for AXCP processing only
-    emit_profile_update = pyqtSignal(int,list) #replace all profile data with updated info 
-    update_spindown_index = pyqtSignal(int,int) #send refined index to truncate profiles in GUI/replot
+
+#mimics the connect/emit interface of a pyqtSignal so engine code is identical with or without Qt
+#connected callbacks are called directly in the processor's thread when emit() is called
+class CallbackSignal:
+    def __init__(self):
+        self.callbacks = []
+        
+    def connect(self, callback):
+        self.callbacks.append(callback)
+        
+    def disconnect(self, callback=None):
+        if callback is None:
+            self.callbacks = []
+        else:
+            self.callbacks.remove(callback)
+        
+    def emit(self, *args):
+        for callback in self.callbacks:
+            callback(*args)
+            
+            
+#same signals (and arguments) as the Qt ProcessorSignals in qt_processors.py
+class EngineSignals: 
+    def __init__(self):
+        self.iterated = CallbackSignal() #(tabID, data) add another entry to raw data arrays
+        self.triggered = CallbackSignal() #(tabID, event, time) the first tone has been detected
+        self.terminated = CallbackSignal() #(tabID) the loop has been terminated (by user input or program error)
+        self.failed = CallbackSignal() #(tabID, error code)
+        self.updateprogress = CallbackSignal() #(tabID, percent) audio file progress
+        self.updatestats = CallbackSignal() #(tabID, stats) processor stage timing/lag statistics (see DAS_stats.py)
+        
+        #following signal used for AXBT processing only
+        self.reevaluated = CallbackSignal() #(tabID, [istriggered, firstpointtime, temperatures, depths, frequencies, Sps, Rps, times, reevaluations]) replace the whole profile after AXBTEngine.reevaluate_profile
+        
+        #following signals used for AXCP processing only
+        self.emit_profile_update = CallbackSignal() #(tabID, [Umag, Vmag, Utrue, Vtrue]) replace all profile data with updated info 
+        self.update_spindown_index = CallbackSignal() #(tabID, index) refined index to truncate profiles
     
     
     
@@ -224,6 +239,9 @@ def get_fs(dll,rtype,hradio=None): #identify sampling frequency of demodulated d
         
     elif rtype == 'PA' and hradio is not None: #pyaudio requires device index for sampling frequency
         f_s = int(np.round(dll['PA'].get_device_info_by_index(hradio)['defaultSampleRate']))    
+        
+    elif rtype == 'SM' and hradio is not None: #shared memory audio has the sampling frequency of the receiver writing it
+        f_s = hradio.f_s
     
     else:
         raise ReceiverTypeNotRecognized(rtype)
@@ -241,6 +259,9 @@ def activate_receiver(dll,rtype,serial,vhffreq): #power on/configure radio recei
     elif rtype == 'PA':
         hradio,status = pa.activate_receiver(dll['PA'], serial)
         
+    elif rtype == 'SM': #serial is the shared memory block name
+        hradio,status = sm.activate_receiver(serial)
+        
     else:
         raise ReceiverTypeNotRecognized(rtype)
         
@@ -258,6 +279,9 @@ def change_receiver_freq(dll,rtype,hradio,freq): #switch VHF frequency being dem
     elif rtype == 'PA':
         pass #computer audio devices aren't demodulating so they dont have an RF frequency to change
         
+    elif rtype == 'SM':
+        status = sm.change_receiver_freq(hradio,freq)
+        
     else:
         raise ReceiverTypeNotRecognized(rtype)
     
@@ -274,6 +298,9 @@ def check_connected(dll,rtype,hradio): #verify that specified receiver is active
     elif rtype == 'PA':
         status = pa.check_receiver_connected(dll['PA'],hradio)
         
+    elif rtype == 'SM':
+        status = sm.check_receiver_connected(hradio)
+        
     else:
         raise ReceiverTypeNotRecognized(rtype)
     
@@ -290,6 +317,12 @@ def stop_receiver(dll,rtype,hradio,stream=None):
     elif rtype == 'PA' and stream is not None: #pyaudio requires a stream object to be passed
         pa.stop_receiver(stream)
         
+    elif rtype == 'SM': #stops the thread reading shared memory (if started) and detaches from the shared memory
+        if stream is not None:
+            sm.stop_receiver(stream)
+        elif hradio is not None:
+            hradio.close()
+        
     else:
         raise ReceiverTypeNotRecognized(rtype)
     
@@ -302,6 +335,9 @@ def initialize_receiver_callback(dll, rtype, hradio, destination, tabID): #speci
     elif rtype == 'PA': #for PyAudio, status is an object containing the stream information
         status = pa.setup_receiver_stream(dll['PA'], hradio, destination, tabID)
         
+    elif rtype == 'SM': #status is the thread passing audio from shared memory to the callback
+        status = sm.setup_receiver_stream(hradio, destination, tabID)
+        
     else:
         raise ReceiverTypeNotRecognized(rtype)
         
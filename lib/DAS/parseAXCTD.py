@@ -49,10 +49,8 @@ def parse_bitstream_to_profile(bitstream, times, r400_in, r7500_in, tempLUT, tco
     
     hexframes = [] # hexadecimal representation of frame
     proftime = [] #time (post-profile start) corresponding to each ob
-    z = [] #depth
-    T = [] #temperature
-    C = [] #conductivity
-    S = [] #salinity
+    Tints = [] #integer temperature/conductivity fields of each frame
+    Cints = []
     r400 = []
     r7500 = []
     
@@ -76,28 +74,60 @@ def parse_bitstream_to_profile(bitstream, times, r400_in, r7500_in, tempLUT, tco
             s += 1
             
         else: #good profile point
-            ctime = times[s] #current profile time
             
-            #converting frame to T/C/S/z
+            #storing frame/time/integer data fields
             Tint, Cint = convertFrameToInt(frame)
-            cT, cC, cS, cz = convertIntsToFloats(Tint, Cint, ctime, tempLUT, tcoeff, ccoeff, zcoeff)
-            
-            #storing frame/time/profile data
+            Tints.append(Tint)
+            Cints.append(Cint)
             hexframes.append(binListToHex(frame))
-            proftime.append(ctime)
-            z.append(cz)
-            T.append(cT)
-            C.append(cC)
-            S.append(cS)
+            proftime.append(times[s])
             
             r400.append(r400_in[s])
             r7500.append(r7500_in[s])
             
             s += 32 #increase start bit by 32 to search for next frame
+            
+    #converting all frames to T/C/S/z at once
+    T, C, S, z = convertIntsToFloats(Tints, Cints, proftime, tempLUT, tcoeff, ccoeff, zcoeff)
 
     # End parse bitstream
     return hexframes, proftime, z, T, C, S, r400, r7500, s
-    
+
+
+
+# is_good = parse.screen_profile_points(temps, psals, r400, r7500, minR400, mindR7500, tlims, slims)
+# returns a mask of the good points from one batch of parsed frames: points with in-profile 400 Hz/7.5 kHz signal levels
+# below minR400/mindR7500 or temperatures/salinities outside of tlims/slims are excluded, then spikes are removed from
+# the remaining points (beyond 10x the difference between the median and 15th/85th percentiles of the batch)
+def screen_profile_points(temps, psals, r400, r7500, minR400, mindR7500, tlims, slims):
+
+    temps = np.asarray(temps, dtype=float)
+    psals = np.asarray(psals, dtype=float)
+    r400 = np.asarray(r400, dtype=float)
+    r7500 = np.asarray(r7500, dtype=float)
+
+    #if R400, dR7500, temp, or psal are outside of preset bounds, exclude datapoint
+    is_good = ~((r7500 < mindR7500) | (r400 < minR400) | (temps < tlims[0]) | (temps > tlims[1]) | (psals < slims[0]) | (psals > slims[1]))
+
+    #identifying and removing spikes
+    if is_good.any():
+        goodtemps = temps[is_good]
+        goodpsals = psals[is_good]
+
+        #median and percentile value based thresholds
+        thresh = 10
+        pct_offset = 35
+        T_median = np.percentile(goodtemps,50)
+        T_low_diff_thresh = T_median - thresh*(T_median - np.percentile(goodtemps,50-pct_offset))
+        T_high_diff_thresh = T_median + thresh*(np.percentile(goodtemps,50+pct_offset) - T_median)
+        S_median = np.percentile(goodpsals,50)
+        S_low_diff_thresh = S_median - thresh*(S_median - np.percentile(goodpsals,50-pct_offset))
+        S_high_diff_thresh = S_median + thresh*(np.percentile(goodpsals,50+pct_offset) - S_median)
+
+        is_good &= ~((temps < T_low_diff_thresh) | (temps > T_high_diff_thresh) | (psals < S_low_diff_thresh) | (psals > S_high_diff_thresh))
+
+    return is_good
+
 
     
     
@@ -118,28 +148,31 @@ def convertFrameToInt(frame):
 
     
 def convertIntsToFloats(Tint, Cint, time, tempLUT, tcoeff, ccoeff, zcoeff):
-    """ Convert a list of integer data fields to observations (floats) """
+    """ Convert integer data fields to observations (floats)
+    Tint, Cint, and time may be scalars or arrays (for all frames in a batch) """
+    
+    Tint = np.asarray(Tint, dtype=int)
+    Cint = np.asarray(Cint, dtype=int)
+    tempLUT = np.asarray(tempLUT, dtype=float)
     
     #depth from time
-    z = cdf.dataconvert(time, zcoeff)
+    z = cdf.get_polynomial(zcoeff)(np.asarray(time, dtype=float))
     
     #uncalibrated temperature and conductivity from integers
-    if Tint >= 0 and Tint <= len(tempLUT)-1:
-        Tuncal = tempLUT[Tint]
-    else:
-        Tuncal = np.NaN
-        
+    goodT = (Tint >= 0) & (Tint <= len(tempLUT)-1)
+    Tuncal = np.where(goodT, tempLUT[np.clip(Tint, 0, len(tempLUT)-1)], np.NaN)
+    
     Cuncal = Cint * 60 / 4096
     
     #calibrated temperature and conductivity from uncalibrated
-    T = cdf.dataconvert(Tuncal, tcoeff)
-    C = cdf.dataconvert(Cuncal, ccoeff)
+    T = cdf.get_polynomial(tcoeff)(Tuncal)
+    C = cdf.get_polynomial(ccoeff)(Cuncal)
     
     #salinity from temperature/conductivity/depth
     if USE_GSW:
         S = gsw.SP_from_C(C,T,z) #assumes pressure (mbar) approx. equals depth (m)
     else:
-        S = float('nan')
+        S = np.NaN * np.ones(np.shape(T))
     
     return T, C, S, z
         
@@ -154,7 +187,7 @@ def read_temp_LUT(filename):
             if len(cline) >= 2:
                 tempLUT.append(float(cline[1]))
                 
-    return tempLUT
+    return np.asarray(tempLUT)
     
     
     
@@ -30,7 +30,10 @@
 
                     
 import time as timemodule
-import pyaudio
+try:
+    import pyaudio
+except ImportError: #headless installs (e.g. batch processing from audio files) don't need audio devices
+    pyaudio = None
 from sys import platform
 from traceback import print_exc as trace_error
 import numpy as np
@@ -0,0 +1,215 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains the thin Qt adapters the GUI uses to run the processor engines
+# (DAS_AXBT.py, DAS_AXCTD.py, DAS_AXCP.py) in a QThreadPool. The adapters only swap the
+# engine's callback signals for pyqtSignals (so GUI slots are called in the GUI thread)
+# and mark run() as a slot- all signal processing stays in the Qt-free engines.
+# RemoteProcessor does the same for a processor running in its own process.
+#
+# The pyqtSignals are wrapped in CoalescingSignals: data emitted through iterated (once per AXBT point) is collected in
+# the processor's thread and passed to the GUI as one batch (a list of the data the engine emitted) about every
+# batchinterval seconds, either by the processor's thread or by a timer in the GUI thread (so data isn't held while the
+# processor is idle). Every other signal except updateprogress (e.g. triggered, terminated) sends the collected data
+# first, so the GUI receives everything in the order it was emitted, and the last batch is sent when the processor terminates.
+
+
+from collections import deque
+import time as timemodule
+import threading
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal, pyqtSlot
+from PyQt5.Qt import QRunnable #base for Processor class
+
+from lib.DAS.DAS_AXBT import AXBTEngine
+from lib.DAS.DAS_AXCTD import AXCTDEngine
+from lib.DAS.DAS_AXCP import AXCPEngine
+from lib.DAS.DAS_multiprocess import ProcessorHost
+
+
+
+
+# =============================================================================
+# PyQt Signals for processor threads
+# =============================================================================
+class ProcessorSignals(QObject):
+    iterated = pyqtSignal(int,list) #signal to add entries to raw data arrays (batch of data emitted by the engine, see CoalescingSignals)
+    triggered = pyqtSignal(int,int,float) #signal that the first tone has been detected
+    terminated = pyqtSignal(int) #signal that the loop has been terminated (by user input or program error)
+    failed = pyqtSignal(int,int)
+    updateprogress = pyqtSignal(int,int) #signal to update audio file progress bar
+    updatestats = pyqtSignal(int,dict) #processor stage timing/lag statistics
+
+    #following signal used for AXBT processing only
+    reevaluated = pyqtSignal(int,list) #replace the whole profile after it is reevaluated with new settings
+
+    #following signals used for AXCP processing only
+    emit_profile_update = pyqtSignal(int,list) #replace all profile data with updated info
+    update_spindown_index = pyqtSignal(int,int) #send refined index to truncate profiles in GUI/replot
+
+
+#batches of iterated data sent by the CoalescedSignal timer- always queued, so they reach the GUI after batches
+#the processor's thread already sent
+class TimerBatchSignal(QObject):
+    iterated = pyqtSignal(int,list)
+
+
+
+
+batchinterval = 0.25 #seconds between batches of data emitted through iterated (data is held about this long, longer only if the GUI thread is busy)
+
+
+#collects data emitted (tabID, data) by the processor and emits it through qtsignal as (tabID, [data, data, ...]). The
+#batch is emitted once interval seconds have passed since the last one or when flush is called, and a timer in the
+#thread that created the signal (the GUI thread) sends anything still held every interval seconds
+class CoalescedSignal:
+    def __init__(self, qtsignal, interval=batchinterval, parent=None):
+        self.qtsignal = qtsignal
+        self.interval = interval
+        self.pending = deque() #appended to by the processor's thread, can be flushed from any thread
+        self.tabID = 0
+        self.lastflush = timemodule.monotonic()
+        self.lock = threading.Lock() #batches are sent in the order they are collected
+
+        self.timerbatch = TimerBatchSignal(parent)
+        self.timer = QTimer(parent)
+        self.timer.timeout.connect(self.timerflush)
+        self.timer.start(int(interval*1000))
+
+    def connect(self, slot):
+        self.qtsignal.connect(slot)
+        self.timerbatch.iterated.connect(slot, Qt.QueuedConnection)
+
+    def disconnect(self, *args):
+        self.qtsignal.disconnect(*args)
+        self.timerbatch.iterated.disconnect(*args)
+
+    def emit(self, tabID, data):
+        self.tabID = tabID
+        self.pending.append(data)
+        if timemodule.monotonic() - self.lastflush >= self.interval:
+            self.flush()
+
+    def flush(self, qtsignal=None):
+        with self.lock:
+            self.lastflush = timemodule.monotonic()
+            batch = []
+            while len(self.pending) > 0:
+                batch.append(self.pending.popleft())
+            if len(batch) > 0:
+                if qtsignal is None:
+                    qtsignal = self.qtsignal
+                qtsignal.emit(self.tabID, batch)
+
+    #called by the timer (GUI thread) every interval seconds
+    def timerflush(self):
+        self.flush(self.timerbatch.iterated)
+
+
+
+#emits data collected by a CoalescedSignal before emitting its own signal
+class FlushingSignal:
+    def __init__(self, qtsignal, coalesced):
+        self.qtsignal = qtsignal
+        self.coalesced = coalesced
+
+    def connect(self, slot):
+        self.qtsignal.connect(slot)
+
+    def disconnect(self, *args):
+        self.qtsignal.disconnect(*args)
+
+    def emit(self, *args):
+        self.coalesced.flush()
+        self.qtsignal.emit(*args)
+
+
+
+#signals passed to the processors: same signals as ProcessorSignals, with iterated data batched for the GUI
+class CoalescingSignals:
+    def __init__(self, interval=batchinterval):
+        self.qtsignals = ProcessorSignals()
+        self.iterated = CoalescedSignal(self.qtsignals.iterated, interval, parent=self.qtsignals)
+        self.qtsignals.terminated.connect(self.iterated.timer.stop) #last batch is sent by terminated
+        self.triggered = FlushingSignal(self.qtsignals.triggered, self.iterated)
+        self.terminated = FlushingSignal(self.qtsignals.terminated, self.iterated)
+        self.failed = FlushingSignal(self.qtsignals.failed, self.iterated)
+        self.updateprogress = self.qtsignals.updateprogress #progress carries no ordered data, so it doesn't flush the batch
+        self.updatestats = FlushingSignal(self.qtsignals.updatestats, self.iterated)
+        self.reevaluated = FlushingSignal(self.qtsignals.reevaluated, self.iterated)
+        self.emit_profile_update = FlushingSignal(self.qtsignals.emit_profile_update, self.iterated)
+        self.update_spindown_index = FlushingSignal(self.qtsignals.update_spindown_index, self.iterated)
+
+
+
+
+# =============================================================================
+# QRunnable processor adapters
+# =============================================================================
+class AXBTProcessor(AXBTEngine, QRunnable):
+
+    def __init__(self, *args, **kwargs):
+        QRunnable.__init__(self)
+        AXBTEngine.__init__(self, *args, signals=CoalescingSignals(), **kwargs)
+
+    @pyqtSlot()
+    def run(self):
+        AXBTEngine.run(self)
+
+
+
+class AXCTDProcessor(AXCTDEngine, QRunnable):
+
+    def __init__(self, *args, **kwargs):
+        QRunnable.__init__(self)
+        AXCTDEngine.__init__(self, *args, signals=CoalescingSignals(), **kwargs)
+
+    @pyqtSlot()
+    def run(self):
+        AXCTDEngine.run(self)
+
+
+
+class AXCPProcessor(AXCPEngine, QRunnable):
+
+    def __init__(self, *args, **kwargs):
+        QRunnable.__init__(self)
+        AXCPEngine.__init__(self, *args, signals=CoalescingSignals(), **kwargs)
+
+    @pyqtSlot()
+    def run(self):
+        AXCPEngine.run(self)
+
+
+
+#in-process adapters by probe type
+processors = {"AXBT":AXBTProcessor, "AXCTD":AXCTDProcessor, "AXCP":AXCPProcessor}
+
+
+
+#runs any processor type in its own process (see DAS_multiprocess.py), signals are emitted from the threadpool thread
+class RemoteProcessor(ProcessorHost, QRunnable):
+
+    def __init__(self, *args, **kwargs):
+        QRunnable.__init__(self)
+        ProcessorHost.__init__(self, *args, signals=CoalescingSignals(), **kwargs)
+
+    @pyqtSlot()
+    def run(self):
+        ProcessorHost.run(self)
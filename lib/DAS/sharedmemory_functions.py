@@ -0,0 +1,197 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+
+# This file contains functions for the shared memory audio "receiver" (receiver type SM), which passes audio to
+# processors running in their own process (see DAS_multiprocess.py). The GUI process activates the actual receiver
+# (WiNRADIO or audio device) and writes its audio to an AudioRingBuffer in shared memory, and the processor reads it
+# with the same receiver functions as any other receiver type. See pyaudio_functions.py for the required functions.
+#
+# Ring buffer layout: int64 header [number of points written, receiver connected (1/0), sampling frequency, original
+# receiver type, ring length], followed by a ring of int16 PCM data as received (unsigned for PyAudio, see _DAS_callbacks.py).
+# The datasource for a processor reading the ring is 'SM' + the shared memory block name.
+
+
+import time as timemodule
+import threading
+from multiprocessing import shared_memory
+from traceback import print_exc as trace_error
+import numpy as np
+
+
+
+#header fields
+WRITECOUNT = 0
+CONNECTED = 1
+SAMPLERATE = 2
+ORIGIN = 3
+CAPACITY = 4
+headerlength = 5
+
+origintypes = ['WR','PA'] #receiver types that can write to a ring buffer
+
+pollinterval = 0.02 #sec between checks for new audio by the stream thread
+
+
+
+class AudioRingBuffer:
+
+    #create a new ring buffer (capacity = number of PCM points) or attach to an existing one by name
+    def __init__(self, name=None, capacity=0, f_s=0, origin='WR'):
+
+        if name is None: #creating the buffer (GUI process)
+            self.shm = shared_memory.SharedMemory(create=True, size=8*headerlength + 2*capacity)
+            self.owner = True
+        else: #attaching to the buffer (processor process)
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False #processes started by multiprocessing share the creator's resource tracker, so it is only unlinked once
+
+        self.name = self.shm.name
+        self.header = np.ndarray(headerlength, dtype=np.int64, buffer=self.shm.buf)
+
+        if self.owner:
+            self.header[:] = [0, 1, f_s, origintypes.index(origin), capacity]
+
+        self.capacity = int(self.header[CAPACITY]) #shared memory size may be rounded up to a full page
+        self.data = np.ndarray(self.capacity, dtype=np.int16, buffer=self.shm.buf, offset=8*headerlength)
+
+        self.f_s = int(self.header[SAMPLERATE])
+        self.origin = origintypes[int(self.header[ORIGIN])]
+
+
+    #appends PCM data (int16 array) to the ring- only the GUI process writes
+    def write(self, block):
+        n = len(block)
+        if n > self.capacity: #only the most recent data fits
+            block = block[-self.capacity:]
+
+        count = int(self.header[WRITECOUNT])
+        s = count % self.capacity
+        e = min(s + len(block), self.capacity)
+        self.data[s:e] = block[:e-s]
+        self.data[:len(block)-(e-s)] = block[e-s:]
+
+        self.header[WRITECOUNT] = count + n #count is updated after the data so readers never see a partial block
+
+
+    #returns (PCM data written since point start, current write count, number of points lost because the reader fell
+    #more than the ring capacity behind)
+    def read(self, start):
+        count = int(self.header[WRITECOUNT])
+        nlost = max(count - start - self.capacity, 0)
+        start += nlost
+
+        s = start % self.capacity
+        e = s + count - start
+        if e <= self.capacity:
+            block = self.data[s:e].copy()
+        else:
+            block = np.concatenate((self.data[s:], self.data[:e-self.capacity]))
+
+        return block, count, nlost
+
+
+    def set_connected(self, connected):
+        self.header[CONNECTED] = int(connected)
+
+    def is_connected(self):
+        return bool(self.header[CONNECTED])
+
+
+    def close(self):
+        self.header = None #numpy views must be released before the shared memory can be closed
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+
+# =============================================================================
+# CONTROL SHARED MEMORY SOURCES
+# =============================================================================
+
+#no receiver to list- shared memory sources are created by DAS_multiprocess.ProcessorHost
+def list_radios():
+    return []
+
+
+
+def activate_receiver(name):
+    hradio = None
+    startthread = 1
+
+    try:
+        hradio = AudioRingBuffer(name=name)
+        startthread = 0
+    except Exception:
+        trace_error()
+
+    return hradio, startthread
+
+
+
+#the receiver frequency is changed by the GUI process that owns the actual receiver
+def change_receiver_freq(hradio, newfreq):
+    return True
+
+
+
+def check_receiver_connected(hradio):
+    return hradio.is_connected()
+
+
+
+#starts a thread that passes new audio in the ring to the processor callback as it arrives- returns the thread so
+#the processor can stop it
+def setup_receiver_stream(hradio, receiver_callback, tabID):
+    stream = RingStream(hradio, receiver_callback, tabID)
+    stream.start()
+    return stream
+
+
+
+def stop_receiver(stream):
+    stream.stop()
+
+
+
+class RingStream(threading.Thread):
+
+    def __init__(self, hradio, receiver_callback, tabID):
+        super().__init__(daemon=True, name=f"AXBPS shared memory audio {tabID}")
+        self.hradio = hradio
+        self.receiver_callback = receiver_callback
+        self.count = 0 #the ring is created for this processor, so audio written while the processor process started is kept
+        self.nlost = 0
+        self.keepgoing = True
+
+    def run(self):
+        while self.keepgoing:
+            block, self.count, nlost = self.hradio.read(self.count)
+            self.nlost += nlost
+            if len(block) > 0:
+                self.receiver_callback(block)
+            else:
+                timemodule.sleep(pollinterval)
+
+    def stop(self):
+        self.keepgoing = False
+        if threading.current_thread() is not self: #stop can be called from the callback (e.g. on error)
+            self.join(1)
+        self.hradio.close()
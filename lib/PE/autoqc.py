@@ -23,7 +23,7 @@ import numpy as np
 def autoqc(rawdata,rawdepth,smoothlev,profres,maxdev,checkforgaps):
     
     #remove NaNs
-    isgood = [False if (np.isnan(rd*rz)) else True for rd,rz in zip(rawdata,rawdepth)]
+    isgood = ~np.isnan(rawdata*rawdepth)
     rawdepth = rawdepth[isgood]
     rawdata = rawdata[isgood]
     
@@ -68,26 +68,23 @@ def autoqc(rawdata,rawdepth,smoothlev,profres,maxdev,checkforgaps):
     
     
 #function to identify and remove gaps due to false starts from interference
+#a gap is a jump of at least maxgapdiff meters starting in the upper maxcheckdepth meters of the profile. The deepest gap
+#becomes the new surface, and the rest of the (shifted) profile is checked again for gaps
 def removegaps(rawdepth,rawdata):
-    donegapcheck = False
-    while not donegapcheck:
-        maxcheckdepth = 50 #only checks the upper 50m of the profile
-        maxgapdiff = 10 #if gap is larger than this range (m), correct profile
-        isgap = [0]
-        for i in range(1,len(rawdepth)):
-            if (rawdepth[i] >= rawdepth[i-1]+ maxgapdiff) and (rawdepth[i-1] <= maxcheckdepth): #if there is a gap of sufficient size to correct
-                isgap.append(1) #NOTE: the logical 1 is placed at the first depth AFTER the gap
-            else:
-                isgap.append(0)
+    maxcheckdepth = 50 #only checks the upper 50m of the profile
+    maxgapdiff = 10 #if gap is larger than this range (m), correct profile
+    
+    while len(rawdepth) > 1:
+        #NOTE: gaps are flagged at the first depth AFTER the gap
+        isgap = (rawdepth[1:] >= rawdepth[:-1] + maxgapdiff) & (rawdepth[:-1] <= maxcheckdepth)
+        if not isgap.any(): #no gaps, done
+            break
         
-        #if there are gaps, find the deepest one and correct t/d profile with that depth as the surface (only works with linear fall rate equation)
-        if np.sum(isgap) > 0:
-            lastgap = np.max(np.argwhere(isgap))
-            realstartdepth = rawdepth[lastgap]
-            rawdata = rawdata[lastgap:]
-            rawdepth = rawdepth[lastgap:]-realstartdepth
-        else: #otherwise, exit loop
-            donegapcheck = True
+        #find the deepest gap and correct t/d profile with that depth as the surface (only works with linear fall rate equation)
+        lastgap = np.flatnonzero(isgap)[-1] + 1
+        realstartdepth = rawdepth[lastgap]
+        rawdata = rawdata[lastgap:]
+        rawdepth = rawdepth[lastgap:]-realstartdepth
         
     return rawdepth,rawdata
     
@@ -95,93 +92,167 @@ def removegaps(rawdepth,rawdata):
     
     
 #removes spikes from profile with depth-based standard deviation filter
+#each point is compared to the mean/standard deviation of all points within +/- depthwin meters of it (or the top/bottom
+#depthwin meters of the profile near the surface/bottom). Window bounds are found in the depth-sorted profile with
+#searchsorted and window sums from cumulative sums of the data and data^2, so the filter is O(n log n)
 def rundespiker(rawdepth,rawdata,maxdev):
-    data_despike = np.array([])
-    depth_despike = np.array([])
     
-    depthwin = 30 #range of spiker is +/- 5 meters
+    depthwin = 30 #range of spiker is +/- 30 meters
+    rawdepth = np.asarray(rawdepth, dtype=float)
+    rawdata = np.asarray(rawdata, dtype=float)
     maxdepth = np.max(rawdepth)
     
-    for n,cdepth in enumerate(rawdepth):
-        
-        #assigning region for running standard deviation filter
-        if cdepth <= depthwin:
-            goodindex = np.less_equal(rawdepth,depthwin)
-        elif cdepth >= maxdepth - depthwin:
-            goodindex = np.greater_equal(rawdepth, maxdepth-depthwin)
-        else:
-            ge = np.greater_equal(rawdepth, cdepth - depthwin) #all depths above bottom threshold
-            le = np.less_equal(rawdepth, cdepth + depthwin) #all depths below top threshold
-            goodindex = np.all([ge,le],axis=0) #all depths with both requirements satisfied
-            
-        #pulling subset
-        dataspike = rawdata[goodindex]
-        
-        #mean and standard deviation of current range
-        curmean = np.mean(dataspike)
-        curstd = np.std(dataspike)
-        
-        #only retain values within +/- 1 standard deviation of running mean or top 10 m
-        if abs(rawdata[n]-curmean) <= maxdev*curstd or rawdepth[n] < 10:
-            depth_despike = np.append(depth_despike,rawdepth[n])
-            data_despike = np.append(data_despike,rawdata[n])
-
-    return depth_despike,data_despike    
+    #assigning region for running standard deviation filter
+    lower = rawdepth - depthwin
+    upper = rawdepth + depthwin
+    istop = rawdepth <= depthwin
+    isbottom = ~istop & (rawdepth >= maxdepth - depthwin)
+    lower[istop] = -np.inf
+    upper[istop] = depthwin
+    lower[isbottom] = maxdepth - depthwin
+    upper[isbottom] = np.inf
+    
+    #window indices in the depth-sorted profile
+    order = np.argsort(rawdepth, kind='stable')
+    sorteddepth = rawdepth[order]
+    s = np.searchsorted(sorteddepth, lower, side='left')
+    e = np.searchsorted(sorteddepth, upper, side='right')
+    npts = e - s
+    
+    #mean and standard deviation of each window (data offset by its mean to limit roundoff in the sums)
+    offset = np.mean(rawdata)
+    sorteddata = rawdata[order] - offset
+    sum1 = np.concatenate(([0.], np.cumsum(sorteddata)))
+    sum2 = np.concatenate(([0.], np.cumsum(sorteddata**2)))
+    curmean = (sum1[e] - sum1[s])/npts
+    curvar = np.maximum((sum2[e] - sum2[s])/npts - curmean**2, 0)
+    curstd = np.sqrt(curvar)
+    
+    #only retain values within +/- maxdev standard deviations of running mean or top 10 m
+    margin = np.abs(rawdata - offset - curmean) - maxdev*curstd
+    isgood = margin <= 0
+    
+    #points too close to the limit to decide given the roundoff in the cumulative sums (bounds for the window mean,
+    #variance, and standard deviation) are checked with the window's mean and standard deviation calculated directly,
+    #so results match a point by point check exactly (e.g. ties from data rounded to a few decimals)
+    eps = np.finfo(float).eps
+    errmean = 4*eps*(len(rawdata)*np.sum(np.abs(sorteddata))/npts + np.abs(offset) + np.abs(curmean))
+    errvar = 4*eps*len(rawdata)*np.sum(sorteddata**2)/npts + 3*np.abs(curmean)*errmean + errmean**2
+    with np.errstate(divide='ignore'):
+        errstd = np.minimum(np.sqrt(errvar), errvar/curstd)
+    uncertain = np.abs(margin) <= errmean + maxdev*errstd + 4*eps*(np.abs(rawdata) + np.abs(offset))
+    for i in np.flatnonzero(uncertain & (rawdepth >= 10)):
+        dataspike = rawdata[np.sort(order[s[i]:e[i]])] #window in profile order
+        isgood[i] = abs(rawdata[i]-np.mean(dataspike)) <= maxdev*np.std(dataspike)
+    isgood |= rawdepth < 10
+    
+    return rawdepth[isgood],rawdata[isgood]
             
             
     
             
 #run depth-based smoother- ensures that first and last datapoints match original profile
+#data_despike can be a single profile or a 2D array with one profile per row (e.g. T/S/U/V on the same depths), which
+#are all smoothed with the same depth windows
 def runsmoother(depth_despike,data_despike,smoothlev):
     
-    data_smooth = np.array([])
-    depth_smooth = depth_despike.copy()
-    mindepth = np.min(depth_despike)
-    maxdepth = np.max(depth_despike)
-
-    for n,cdepth in enumerate(depth_despike):
-        if cdepth == mindepth or cdepth == maxdepth: #if first or last point in profile, append current dataerature
-            data_smooth = np.append(data_smooth,data_despike[n])
-            
-        else: #otherwise- average a range of points
-            if cdepth <= smoothlev/2: #in top of profile
-                cursmoothlev = 2*cdepth
-            elif cdepth >= maxdepth - smoothlev/2: #in bottom of profile
-                cursmoothlev = 2*(maxdepth - cdepth)
-            else: #in middle of profile
-                cursmoothlev = smoothlev
-                
-            ge = np.greater_equal(depth_despike, cdepth - cursmoothlev/2)
-            le = np.less_equal(depth_despike,cdepth + cursmoothlev/2)            
-            goodindex = np.all([ge,le],axis=0)
-                
-            #append mean of all points in range as next datapoint
-            data_smooth = np.append(data_smooth,np.mean(data_despike[goodindex]))
+    depth_smooth = np.asarray(depth_despike, dtype=float).copy()
+    data_despike = np.asarray(data_despike, dtype=float)
+    order, s, e, isend = smoothing_windows(depth_smooth, smoothlev)
+    npts = e - s
+    
+    #window sums from cumulative sums of the depth-sorted data (each profile offset by its mean to limit roundoff)
+    offset = np.mean(data_despike, axis=-1, keepdims=True)
+    sorteddata = data_despike[..., order] - offset
+    cumdata = np.concatenate((np.zeros(sorteddata.shape[:-1] + (1,)), np.cumsum(sorteddata, axis=-1)), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        data_smooth = np.where(npts > 0, (cumdata[..., e] - cumdata[..., s])/npts, np.nan) + offset
+    
+    #first and last datapoints aren't smoothed
+    data_smooth[..., isend] = data_despike[..., isend]
             
     return depth_smooth,data_smooth
     
+    
+    
+#depth window to average for each point: smoothlev meters centered on the point, narrowed near the top (window starts
+#at 0 m) and bottom (window ends at the deepest point). Returns the depth sort order, the start/end (exclusive) of each
+#window in the sorted profile, and whether each point is the shallowest/deepest point (which isn't smoothed)
+def smoothing_windows(depth, smoothlev):
+    mindepth = np.min(depth)
+    maxdepth = np.max(depth)
+    
+    istop = depth <= smoothlev/2 #in top of profile
+    isbottom = ~istop & (depth >= maxdepth - smoothlev/2) #in bottom of profile
+    cursmoothlev = np.full(len(depth), smoothlev, dtype=float) #in middle of profile
+    cursmoothlev[istop] = 2*depth[istop]
+    cursmoothlev[isbottom] = 2*(maxdepth - depth[isbottom])
+    
+    order = np.argsort(depth, kind='stable')
+    sorteddepth = depth[order]
+    s = np.searchsorted(sorteddepth, depth - cursmoothlev/2, side='left')
+    e = np.searchsorted(sorteddepth, depth + cursmoothlev/2, side='right')
+    isend = (depth == mindepth) | (depth == maxdepth)
+    
+    return order, s, e, isend
+    
 
     
     
-#subsample profile
+#subsample profile: keeps points where the slope (dtdz) is realistic, with each kept point at least profres meters below
+#the previous kept point (note- returned variables are lists)
 def subsample_profile(depth_smooth,data_smooth,profres):
     
-    dtdz = [] #calculating profile slope (append 0 at start and end so length matches that of depth_smooth)
-    dtdz.append(0)
-    for i in range(1,len(data_smooth)-1): #need to use range here because we are only interested in a subset of indices
-        #dtdz = (t3 - t1)/(z3 - z1): centered on z2
-        dtdz.append(((data_smooth[i+1] - data_smooth[i-1])/ 
-              (depth_smooth[i+1]-depth_smooth[i-1])))
-    dtdz.append(0)
-
-    depth = []
-    dataerature = []
+    depth_smooth = np.asarray(depth_smooth, dtype=float)
+    data_smooth = np.asarray(data_smooth, dtype=float)
+    
+    #calculating profile slope (0 at start and end so length matches that of depth_smooth)
+    #dtdz = (t3 - t1)/(z3 - z1): centered on z2
+    dtdz = np.zeros(len(depth_smooth))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dtdz[1:-1] = (data_smooth[2:] - data_smooth[:-2])/(depth_smooth[2:] - depth_smooth[:-2])
+    
+    #constraint on first derivative of data with depth (no unrealistic spikes)
+    candidates = np.flatnonzero(dtdz <= 0.5)
+    keep = select_resolution(depth_smooth[candidates], profres)
+    
+    return depth_smooth[candidates[keep]].tolist(),data_smooth[candidates[keep]].tolist()
+    
+    
+    
+#indices of points to keep so that each kept depth is at least profres meters below the last kept depth, starting with
+#the first point deeper than -100000 m + profres. For increasing depths, the next kept point after each point is found
+#for all points at once with searchsorted, so only the chain of kept points is followed in a loop
+def select_resolution(depth, profres):
     lastdepth = -100000 #large enough value so subsampler will always grab first datapoint
-    for i,cdepth in enumerate(depth_smooth):
-        #constraint on first derivative of data with depth (no unrealistic spikes), if the point is a critical value given the selected resolution level, append to output profile
-        if dtdz[i] <= 0.5 and cdepth-lastdepth >= profres:
-            depth.append(cdepth)
-            dataerature.append(data_smooth[i])
-            lastdepth = cdepth
-    
-    return depth,dataerature
\ No newline at end of file
+    npoints = len(depth)
+    
+    if np.any(np.diff(depth) < 0): #depths aren't sorted, check each point in order
+        keep = []
+        for i,cdepth in enumerate(depth):
+            if cdepth-lastdepth >= profres:
+                keep.append(i)
+                lastdepth = cdepth
+        return np.array(keep, dtype=int)
+        
+    first = np.flatnonzero(depth - lastdepth >= profres)
+    if len(first) == 0:
+        return np.array([], dtype=int)
+    
+    #next[i] = first point after i with depth[next] - depth[i] >= profres (npoints if none), starting from the searchsorted
+    #estimate and adjusted until it satisfies the same (roundoff-sensitive) test as the point-by-point check
+    ind = np.arange(npoints)
+    nextind = np.maximum(np.searchsorted(depth, depth + profres, side='left'), ind + 1)
+    while True:
+        back = (nextind - 1 > ind) & (depth[np.minimum(nextind - 1, npoints - 1)] - depth >= profres)
+        ahead = ~back & (nextind < npoints) & (depth[np.minimum(nextind, npoints - 1)] - depth < profres)
+        if not (back.any() or ahead.any()):
+            break
+        nextind[back] -= 1
+        nextind[ahead] += 1
+    
+    nextind = nextind.tolist()
+    keep = [first[0]]
+    while nextind[keep[-1]] < npoints:
+        keep.append(nextind[keep[-1]])
+    return np.array(keep, dtype=int)
\ No newline at end of file
@@ -20,29 +20,43 @@
 
 import scipy.io as sio
 import numpy as np
-from shapely.geometry import Point
-from shapely.geometry.polygon import Polygon
 import scipy.interpolate as sint
 
 
 
 #apply a box smoothing filter to dataset with specified window length
+#each point is the mean of data[i-halfwindow:i+halfwindow], with the window cut off at the start/end of the dataset
+#(data[:i+halfwindow] and data[i-halfwindow:]). Window sums are from cumulative sums at the edges and a convolution
+#in between, so a NaN/inf only affects the windows containing it
 def runningsmooth(data,halfwindow): 
     
+    data = np.asarray(data, dtype=float)
+    npts = len(data)
+    
     #if the running filter is longer than the dataset, return an array with same length as dataset containing dataset mean
-    if halfwindow*2+1 >= len(data): 
-        smoothdata = np.ones(len(data))*np.mean(data)
+    if halfwindow*2+1 >= npts: 
+        return np.ones(npts)*np.mean(data)
         
     #otherwise apply smoothing filter
-    else:
-        smoothdata = np.array([])
-        for i in range(len(data)):
-            if i <= halfwindow:
-                smoothdata = np.append(smoothdata,np.mean(data[:i+halfwindow]))
-            elif i >= len(data) - halfwindow:
-                smoothdata = np.append(smoothdata,np.mean(data[i-halfwindow:]))
-            else:
-                smoothdata = np.append(smoothdata,np.mean(data[i-halfwindow:i+halfwindow]))
+    windowsum = np.zeros(npts)
+    windowlen = np.full(npts, 2*halfwindow)
+    
+    #top (i <= halfwindow): data[:i+halfwindow]
+    topsum = np.concatenate(([0.], np.cumsum(data[:2*halfwindow])))
+    windowsum[:halfwindow+1] = topsum[halfwindow:]
+    windowlen[:halfwindow+1] = np.arange(halfwindow, 2*halfwindow+1)
+    
+    #bottom (i >= npts - halfwindow): data[i-halfwindow:]
+    if halfwindow > 0:
+        bottomsum = np.cumsum(data[::-1][:2*halfwindow])[::-1]
+        windowsum[npts-halfwindow:] = bottomsum[:halfwindow]
+        windowlen[npts-halfwindow:] = np.arange(2*halfwindow, halfwindow, -1)
+        
+        #middle: data[i-halfwindow:i+halfwindow]
+        windowsum[halfwindow+1:npts-halfwindow] = np.convolve(data, np.ones(2*halfwindow), mode='valid')[1:-1]
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smoothdata = np.where(windowlen > 0, windowsum/windowlen, np.nan)
             
     return smoothdata
     
@@ -154,20 +168,12 @@ def comparetoclimo(data,depth,climodatas,climodepths,climodatafill,climodepthfil
             maxd = climobottomcutoff
         
         #check to see if climatology generally matches profile (is 90% of profile within climatology fill window?)
-        isinclimo = []
-        climopolylist = []
-        for i in range(len(climodatafill)):
-            climopolylist.append([climodatafill[i],climodepthfill[i]])
-        climopolygon = Polygon(climopolylist)    
-        
         depth[0] = 0.1
-        for i in range(len(data)):
-            if depth[i] <= maxd:
-                curpoint = Point(data[i], depth[i])
-                isinclimo.append(int(climopolygon.contains(curpoint)))
+        iscompared = np.less_equal(depth,maxd)
+        isinclimo = isinclimofill(data[iscompared],depth[iscompared],climodatafill,climodepthfill)
             
         minpctmatch = 0.5 #checks if prof matches climo: more than (minpctmatch*100) percent of profile must be within +/1 one standard deviation of climatology profile to be considered a match (0 <= minpctmatch <= 1)
-        if sum(isinclimo)/len(isinclimo) >= minpctmatch: 
+        if np.sum(isinclimo)/len(isinclimo) >= minpctmatch: 
             matchclimo = 1
         else:
             matchclimo = 0
@@ -178,6 +184,32 @@ def comparetoclimo(data,depth,climodatas,climodepths,climodatafill,climodepthfil
         
         
     return matchclimo,climobottomcutoff
+
+
+
+#checks whether each (data, depth) point is inside the climatology fill polygon (from getclimatologyprofile: lower bound
+#going down, then upper bound going back up). If the fill depths increase, the lower and upper bounds are interpolated
+#to the profile depths, otherwise each point is checked against the polygon with shapely
+def isinclimofill(data,depth,climodatafill,climodepthfill):
+    
+    climodatafill = np.asarray(climodatafill, dtype=float)
+    climodepthfill = np.asarray(climodepthfill, dtype=float)
+    nfill = len(climodepthfill)//2
+    filldepth = climodepthfill[:nfill]
+    lower = climodatafill[:nfill]
+    upper = climodatafill[nfill:][::-1]
+    
+    #bounds as functions of depth (points on the polygon edge aren't inside, matching Polygon.contains)
+    if nfill > 0 and len(climodepthfill) == 2*nfill and np.all(np.isfinite(climodatafill)) and np.all(np.diff(filldepth) > 0) and np.array_equal(climodepthfill[nfill:], filldepth[::-1]) and np.all(lower <= upper):
+        isindepth = (depth > filldepth[0]) & (depth < filldepth[-1])
+        return isindepth & (data > np.interp(depth, filldepth, lower)) & (data < np.interp(depth, filldepth, upper))
+    
+    #non-monotonic fill- point in polygon checks with shapely (imported here as it's only needed for this case)
+    from shapely.geometry import Point
+    from shapely.geometry.polygon import Polygon
+    from shapely.prepared import prep
+    climopolygon = prep(Polygon(np.column_stack((climodatafill, climodepthfill))))
+    return np.array([climopolygon.contains(Point(cdata, cdepth)) for (cdata,cdepth) in zip(data,depth)], dtype=bool)
         
 
 
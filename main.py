@@ -18,49 +18,53 @@
 # =============================================================================
 #
 
-#import and run splash screen
-from sys import exit
+import multiprocessing
 
-from platform import system as cursys
+#processor processes (lib/DAS/DAS_multiprocess.py) import this file as __mp_main__, so the GUI only starts when run directly
+if __name__ == "__main__":
+    multiprocessing.freeze_support() #starts processor processes in PyInstaller bundles
+    
+    #import and run splash screen
+    from sys import exit
+
+    from platform import system as cursys
 
-#add splash screen on Windows because of SLOW import speed due to drivers
-if cursys() == 'Windows':
+    #add splash screen on Windows because of SLOW import speed due to drivers
+    if cursys() == 'Windows':
     
-    #basic Qt5 bindings for app + splash screen
-    from PyQt5.QtWidgets import QApplication, QSplashScreen
-    from PyQt5.QtGui import QPixmap
-    from PyQt5.QtCore import QCoreApplication, Qt
+        #basic Qt5 bindings for app + splash screen
+        from PyQt5.QtWidgets import QApplication, QSplashScreen
+        from PyQt5.QtGui import QPixmap
+        from PyQt5.QtCore import QCoreApplication, Qt
     
-    #fixing QtWebEngine plugin issue
-    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+        #fixing QtWebEngine plugin issue
+        QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     
-    #making splash screen
-    app = QApplication([])
-    splash = QSplashScreen(QPixmap("lib/dropicon.png"))
-    splash.show()
+        #making splash screen
+        app = QApplication([])
+        splash = QSplashScreen(QPixmap("lib/dropicon.png"))
+        splash.show()
     
-    #Imports necessary for main program
-    import gui 
+        #Imports necessary for main program
+        import gui 
     
-    #creates main program instance
-    ex = gui.RunProgram()
+        #creates main program instance
+        ex = gui.RunProgram()
     
-    #kill splash screen
-    splash.close()
+        #kill splash screen
+        splash.close()
     
-else:
-    #Qt5 binding for app only
-    from PyQt5.QtWidgets import QApplication
+    else:
+        #Qt5 binding for app only
+        from PyQt5.QtWidgets import QApplication
         
-    #Imports necessary for main program
-    import gui 
+        #Imports necessary for main program
+        import gui 
     
-    #creates main program instance
-    app = QApplication([])
-    ex = gui.RunProgram()
-
-
-#executes main program (identical regardless of splash screen)
-exit(app.exec_())
+        #creates main program instance
+        app = QApplication([])
+        ex = gui.RunProgram()
 
 
+    #executes main program (identical regardless of splash screen)
+    exit(app.exec_())
@@ -0,0 +1,134 @@
+# =============================================================================
+#     Author: Casey R. Densmore, 12FEB2022
+#
+#    This file is part of the Airborne eXpendable Buoy Processing System (AXBPS)
+#
+#    AXBPS is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AXBPS is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AXBPS.  If not, see <https://www.gnu.org/licenses/>.
+# =============================================================================
+#
+# Command line processor for AXBT/AXCTD/AXCP audio (WAV) files- does not require PyQt5
+# or a display, so recordings can be reprocessed on servers/compute nodes. Files are
+# processed in parallel (one file per worker process, see lib/DAS/DAS_batch.py).
+#
+# Examples:
+#   python process_audio.py -p AXBT drop1.WAV drop2.WAV --lat 25.2 --lon -85.1 --date 20220212 --time 1530 --outdir processed
+#   python process_audio.py -p AXCP recordings/ --outdir processed --workers 8
+#   python process_audio.py --manifest deployment.csv --outdir processed --summary processed/summary.csv
+#
+# Processor settings default to the AXBPS defaults, and can be overridden with a JSON file
+# of {setting: value} pairs (--settings), e.g. {"minsiglev": 60, "zcoeff_axbt": [0, 1.524, 0, 0]}
+
+import argparse
+import json
+import os
+import datetime as dt
+from sys import exit
+
+import lib.DAS.DAS_outputs as das_out
+import lib.DAS.DAS_batch as batch
+
+
+#error messages for processor failure codes (see gui/_DASfunctions.failedWRmessage)
+errormessages = {9:"audio file is too large", 10:"unspecified processing error", 11:"unable to read audio file", 12:"processor initialization timed out", 13:"audio file is too long"}
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Process AXBT/AXCTD/AXCP audio files to AXBPS raw data files without the GUI")
+    parser.add_argument("inputs", nargs="*", help="WAV file(s) and/or directories of WAV files to process")
+    parser.add_argument("-p", "--probetype", choices=["AXBT","AXCTD","AXCP"], type=str.upper, default=None, help="probe type for all files/directories (required unless --manifest is used)")
+    parser.add_argument("-m", "--manifest", default=None, help="CSV file listing files to process with their probe type and channel (see lib/DAS/DAS_batch.py)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="include WAV files in subdirectories of input directories")
+    parser.add_argument("-c", "--channel", type=int, default=0, help="audio channel to process (1 = first channel, 0 = sum all channels)")
+    parser.add_argument("--lat", type=float, default=None, help="drop latitude (degrees N)")
+    parser.add_argument("--lon", type=float, default=None, help="drop longitude (degrees E)")
+    parser.add_argument("--date", default=None, help="drop date (YYYYMMDD)")
+    parser.add_argument("--time", default="0000", help="drop time (HHMM UTC)")
+    parser.add_argument("--id", default="NNNNN", help="platform identifier (DAT files)")
+    parser.add_argument("-o", "--outdir", default=None, help="output directory (default is the directory of each audio file)")
+    parser.add_argument("-f", "--filetypes", nargs="+", default=["EDF","sigdata"], help="files to write: any of EDF, sigdata (binary signal data log), sigtxt (signal data as text), stats (processor timing/lag statistics), bits (AXCTD demodulated bitstream), DTA, DAT, NVO")
+    parser.add_argument("-s", "--settings", default=None, help="JSON file with processor settings to override")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--summary", default=None, help="write a CSV table of results for each file")
+    args = parser.parse_args()
+
+    if not args.inputs and args.manifest is None:
+        parser.error("no audio files, directories, or manifest provided")
+    if args.inputs and args.probetype is None:
+        parser.error("--probetype is required to process audio files/directories")
+
+    settings = das_out.default_processor_settings()
+    if args.settings is not None:
+        with open(args.settings) as f_in:
+            settings.update(json.load(f_in))
+    if "STATS" in [cf.upper() for cf in args.filetypes]: #processor statistics are only logged if requested
+        settings["statslog"] = True
+
+    dropdatetime = None
+    if args.date is not None:
+        try:
+            dropdatetime = dt.datetime.strptime(args.date + args.time.zfill(4), "%Y%m%d%H%M")
+        except ValueError:
+            parser.error(f"Invalid drop date/time {args.date} {args.time}, must be YYYYMMDD and HHMM")
+
+    #building list of files to process
+    jobs = []
+    metadata = {"lat":args.lat, "lon":args.lon, "dropdatetime":dropdatetime, "identifier":args.id}
+    for cinput in args.inputs:
+        if os.path.isdir(cinput):
+            jobs.extend(batch.find_audio_files(cinput, args.probetype, args.channel, recursive=args.recursive, **metadata))
+        else:
+            jobs.append(batch.make_job(cinput, args.probetype, args.channel, **metadata))
+    if args.manifest is not None:
+        jobs.extend(batch.read_manifest(args.manifest))
+
+    if not jobs:
+        parser.error("no audio files found")
+    if any([job["dropdatetime"] is None or job["lat"] is None or job["lon"] is None for job in jobs]):
+        print("WARNING: drop date/time or position not provided for some files- only sigdata files will be written for them")
+
+    lastprogress = [0]*len(jobs) #printing progress every 25% for each file
+    def progress(jobID, audiofile, percent):
+        if percent >= 100:
+            print(f"[{jobID+1}/{len(jobs)}] finished {audiofile}")
+        elif percent // 25 > lastprogress[jobID] // 25:
+            print(f"[{jobID+1}/{len(jobs)}] {audiofile}: {percent}%")
+        lastprogress[jobID] = percent
+
+    results = batch.run_batch(jobs, outdir=args.outdir, filetypes=args.filetypes, settings=settings, maxworkers=args.workers, progress=progress)
+
+    nfailed = 0
+    for result in results:
+        print(f"{result['file']} ({result['probetype']}): {result['npoints']} profile points, output: {result['output']}")
+        for cerror in result["errors"]:
+            print(f"    ERROR: {errormessages.get(cerror, f'processor failed with error code {cerror}')}")
+        if result["error"]:
+            print(f"    ERROR: {result['error']}")
+        if result["failed"]:
+            print(f"    Unable to save: {', '.join(result['failed'])}")
+        if result["status"] or result["failed"]:
+            nfailed += 1
+
+    if args.summary is not None:
+        batch.write_batch_summary(results, args.summary)
+
+    print(f"Processed {len(jobs)-nfailed} of {len(jobs)} files successfully")
+    return 1 if nfailed else 0
+
+
+
+if __name__ == "__main__":
+    exit(main())
+